@@ -4,9 +4,13 @@
 # This code is licensed under MIT license (see LICENSE.MIT for details)
 
 import re
+import io
 import os
 import sys
+import json
+import hashlib
 import argparse
+import concurrent.futures
 
 
 C_TOKEN_RE_STR = r'[A-Za-z_][A-Za-z_0-9]*'
@@ -31,6 +35,8 @@ class Project:
         self.include_root = include_root
         self._include_once_set = set()
         self._undef_macros = {}
+        self._config_macros = []
+        self._deps = {}
 
     def require_name(self):
         if self.name is None:
@@ -60,6 +66,22 @@ class Project:
     def get_undef_macros(self):
         return self._undef_macros.items()
 
+    def add_config_macro(self, macro_name):
+        self._config_macros.append(macro_name)
+
+    def get_config_macros(self):
+        return self._config_macros
+
+    def open_source(self, path):
+        # Files are read whole, so that the hash recorded for the cache is the hash of what has been preprocessed.
+        with open(path, 'rb') as f:
+            data = f.read()
+        self._deps[os.path.abspath(path)] = _sha256(data)
+        return FileReader(io.StringIO(data.decode(), newline=None))
+
+    def get_deps(self):
+        return self._deps.items()
+
 
 class Preprocessor:
     EXPANSIONS = {
@@ -222,6 +244,7 @@ class Preprocessor:
         self._emitter.emit(f'#endif')
 
         self._add_to_undef(macro.name, must_be_defined=False)
+        self._project.add_config_macro(macro.name)
 
     def _handle_config_save(self, args):
         if len(args) != 1:
@@ -243,6 +266,7 @@ class Preprocessor:
 
         self._add_to_undef(macro.name, must_be_defined=False)
         self._add_to_undef(save_into_ppvar, must_be_defined=False)
+        self._project.add_config_macro(macro.name)
 
     def _handle_temp(self, args):
         if args:
@@ -285,14 +309,12 @@ class Preprocessor:
 
         path = os.path.join(self._project.include_root, path)
 
-        with open(path, 'r') as f:
-            new_reader = FileReader(f)
-            pp = Preprocessor(
-                mode=self._mode,
-                reader=new_reader,
-                emitter=self._emitter,
-                project=self._project)
-            pp.preprocess(finalize=False)
+        pp = Preprocessor(
+            mode=self._mode,
+            reader=self._project.open_source(path),
+            emitter=self._emitter,
+            project=self._project)
+        pp.preprocess(finalize=False)
 
     def _handle_include(self, args):
         if len(args) != 1:
@@ -331,6 +353,17 @@ class FileEmitter:
         print(line, file=self._f)
 
 
+class ListEmitter:
+    def __init__(self):
+        self.lines = []
+
+    def emit(self, line):
+        self.lines.append(line)
+
+    def get_text(self):
+        return ''.join(line + '\n' for line in self.lines)
+
+
 class FileReader:
     def __init__(self, f):
         self._f = f
@@ -344,32 +377,687 @@ class FileReader:
         return None
 
 
+DIRECTIVE_RE = re.compile(r'^\s*#\s*([a-z_]+)\b\s*(.*)$', re.DOTALL)
+
+DEFINE_RE = re.compile(r'(' + C_TOKEN_RE_STR + r')(\(?)(.*)$', re.DOTALL)
+
+INCLUDE_INC_RE = re.compile(r'"([^"]+\.inc)"')
+
+COMMENT_RE = re.compile(r'/\*.*?\*/|//.*$', re.DOTALL)
+
+EXPR_TOKEN_RE = re.compile(
+    r'\s*(?:(0[xX][0-9a-fA-F]+|[0-9]+)[uUlL]*|(' + C_TOKEN_RE_STR + r')|(&&|\|\||<<|>>|<=|>=|==|!=|[-+*/%<>&|^!~?:()]))')
+
+
+# Evaluates a "#if" expression. Any sub-expression that depends on a macro with unknown state evaluates to None,
+# and so does everything that depends on it, except where "&&", "||" and "?:" make it irrelevant.
+class ExprEvaluator:
+    BINARY_OPS = [
+        ['||'],
+        ['&&'],
+        ['|'],
+        ['^'],
+        ['&'],
+        ['==', '!='],
+        ['<', '>', '<=', '>='],
+        ['<<', '>>'],
+        ['+', '-'],
+        ['*', '/', '%'],
+    ]
+
+    def __init__(self, text, lookup, depth=0):
+        self._tokens = ExprEvaluator._tokenize(text)
+        self._pos = 0
+        self._lookup = lookup
+        self._depth = depth
+
+    @staticmethod
+    def _tokenize(text):
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = EXPR_TOKEN_RE.match(text, pos)
+            if not m:
+                raise ValueError(f'cannot parse expression "{text}"')
+            if m.group(1) is not None:
+                tokens.append(('num', ExprEvaluator._parse_int(m.group(1))))
+            elif m.group(2) is not None:
+                tokens.append(('id', m.group(2)))
+            else:
+                tokens.append(('op', m.group(3)))
+            pos = m.end()
+        return tokens
+
+    @staticmethod
+    def _parse_int(s):
+        if s[:2] in ('0x', '0X'):
+            return int(s, 16)
+        if s.startswith('0'):
+            return int(s, 8)
+        return int(s)
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _next(self):
+        tok = self._peek()
+        if tok[0] is None:
+            raise ValueError('unexpected end of expression')
+        self._pos += 1
+        return tok
+
+    def _expect(self, op):
+        if self._next() != ('op', op):
+            raise ValueError(f'expected "{op}" in expression')
+
+    def evaluate(self):
+        v = self._conditional()
+        if self._peek()[0] is not None:
+            raise ValueError('trailing tokens in expression')
+        return v
+
+    def _conditional(self):
+        c = self._binary(0)
+        if self._peek() != ('op', '?'):
+            return c
+        self._next()
+        x = self._conditional()
+        self._expect(':')
+        y = self._conditional()
+        if c is None:
+            return x if x == y else None
+        return x if c else y
+
+    def _binary(self, level):
+        if level == len(ExprEvaluator.BINARY_OPS):
+            return self._unary()
+        a = self._binary(level + 1)
+        while True:
+            kind, op = self._peek()
+            if kind != 'op' or op not in ExprEvaluator.BINARY_OPS[level]:
+                return a
+            self._next()
+            b = self._binary(level + 1)
+            a = ExprEvaluator._apply(op, a, b)
+
+    @staticmethod
+    def _apply(op, a, b):
+        if op == '&&':
+            if a == 0 or b == 0:
+                return 0
+            return None if a is None or b is None else 1
+        if op == '||':
+            if a or b:
+                return 1
+            return None if a is None or b is None else 0
+        if a is None or b is None:
+            return None
+        if op in ('/', '%'):
+            if b == 0:
+                raise ValueError('division by zero in expression')
+            q = abs(a) // abs(b) * (1 if (a < 0) == (b < 0) else -1)
+            return q if op == '/' else a - q * b
+        return {
+            '|': lambda: a | b,
+            '^': lambda: a ^ b,
+            '&': lambda: a & b,
+            '==': lambda: int(a == b),
+            '!=': lambda: int(a != b),
+            '<': lambda: int(a < b),
+            '>': lambda: int(a > b),
+            '<=': lambda: int(a <= b),
+            '>=': lambda: int(a >= b),
+            '<<': lambda: a << b,
+            '>>': lambda: a >> b,
+            '+': lambda: a + b,
+            '-': lambda: a - b,
+            '*': lambda: a * b,
+        }[op]()
+
+    def _unary(self):
+        kind, tok = self._next()
+        if kind == 'num':
+            return tok
+        if kind == 'op':
+            if tok == '(':
+                v = self._conditional()
+                self._expect(')')
+                return v
+            if tok in ('!', '~', '-', '+'):
+                v = self._unary()
+                if v is None:
+                    return None
+                return {'!': lambda: int(not v), '~': lambda: ~v, '-': lambda: -v, '+': lambda: v}[tok]()
+            raise ValueError(f'unexpected "{tok}" in expression')
+        if tok == 'defined':
+            paren = self._peek() == ('op', '(')
+            if paren:
+                self._next()
+            kind, name = self._next()
+            if kind != 'id':
+                raise ValueError('expected macro name after "defined"')
+            if paren:
+                self._expect(')')
+            state = self._lookup(name)
+            if state is Specializer.UNKNOWN:
+                return None
+            return int(state is not Specializer.UNDEFINED)
+        if self._peek() == ('op', '('):
+            # An invocation of a function-like macro; skip the arguments.
+            nesting = 0
+            while True:
+                kind, op = self._next()
+                if op == '(':
+                    nesting += 1
+                elif op == ')':
+                    nesting -= 1
+                    if not nesting:
+                        break
+            return None
+        state = self._lookup(tok)
+        if state is Specializer.UNKNOWN or state is Specializer.FUNCTION_LIKE:
+            return None
+        if state is Specializer.UNDEFINED:
+            return 0
+        if self._depth > 32:
+            return None
+        try:
+            return ExprEvaluator(state, self._lookup, depth=self._depth + 1).evaluate()
+        except ValueError:
+            return None
+
+
+class CondFrame:
+    def __init__(self, dead=False):
+        # Whether the enclosing region is not emitted at all.
+        self.dead = dead
+        # Whether the lines of the current branch are emitted.
+        self.active = False
+        # Whether some branch has been found to be taken for sure; all the following ones are dropped.
+        self.taken = dead
+        # Whether an "#if" for this chain has been emitted (so that it needs an "#endif").
+        self.emitted_open = False
+
+
+# Removes the conditional blocks of the generated code that are dead in a given configuration.
+#
+# The state of each macro is either known (defined with some body, function-like, or undefined) or unknown, i.e.
+# left to be decided at the time the result is compiled. Initially, the macros given in 'defines' are known to be
+# defined, configuration macros ("@@config") that are not given are known to be undefined, and all the others are
+# unknown. Then "#define"s and "#undef"s are tracked as the lines are processed. Conditions that can be evaluated
+# select their branch, and the directives themselves are dropped; the others are emitted as they are. The result
+# "#error"s if any configuration macro, given or not, is already defined when it is included.
+#
+# Quoted includes of ".inc" files are inlined, so that the conditionals in them get resolved too.
+class Specializer:
+    UNKNOWN = object()
+    UNDEFINED = object()
+    FUNCTION_LIKE = object()
+
+    def __init__(self, project, defines):
+        self._project = project
+        self._defines = defines
+        self._macros = {}
+        for name in project.get_config_macros():
+            self._macros[name] = Specializer.UNDEFINED
+        for name, value in defines.items():
+            self._macros[name] = value
+        self._stack = []
+        self._out = []
+
+    def _lookup(self, name):
+        return self._macros.get(name, Specializer.UNKNOWN)
+
+    def _is_active(self):
+        return all(frame.active for frame in self._stack)
+
+    def _is_certain(self):
+        return not any(frame.emitted_open for frame in self._stack)
+
+    def _eval(self, expr):
+        return ExprEvaluator(COMMENT_RE.sub(' ', expr), self._lookup).evaluate()
+
+    def _eval_defined(self, expr):
+        state = self._lookup(COMMENT_RE.sub(' ', expr).strip())
+        if state is Specializer.UNKNOWN:
+            return None
+        return int(state is not Specializer.UNDEFINED)
+
+    def _set_macro(self, name, state):
+        self._macros[name] = state if self._is_certain() else Specializer.UNKNOWN
+
+    def _branch(self, frame, value, lines, directive):
+        if frame.taken:
+            frame.active = False
+            return
+        if value == 0:
+            frame.active = False
+            return
+        frame.active = True
+        if value is None:
+            if not frame.emitted_open and directive == 'elif':
+                lines = [re.sub(r'^(\s*#\s*)elif', r'\1if', lines[0])] + lines[1:]
+            self._out.extend(lines)
+            frame.emitted_open = True
+        else:
+            if frame.emitted_open:
+                self._out.append(re.sub(r'^(\s*#\s*)(elif|else).*$', r'\1else', lines[0]))
+            frame.taken = True
+
+    def _process_directive(self, directive, arg, lines):
+        if directive in ('if', 'ifdef', 'ifndef'):
+            if not self._is_active():
+                self._stack.append(CondFrame(dead=True))
+                return
+            frame = CondFrame()
+            self._stack.append(frame)
+            if directive == 'if':
+                value = self._eval(arg)
+            else:
+                value = self._eval_defined(arg)
+                if directive == 'ifndef' and value is not None:
+                    value = 1 - value
+            self._branch(frame, value, lines, directive)
+        elif directive in ('elif', 'else'):
+            if not self._stack:
+                raise ValueError(f'"#{directive}" without "#if"')
+            frame = self._stack[-1]
+            if frame.dead:
+                return
+            frame.active = False
+            self._branch(frame, self._eval(arg) if directive == 'elif' else 1, lines, directive)
+        elif directive == 'endif':
+            if not self._stack:
+                raise ValueError('"#endif" without "#if"')
+            frame = self._stack.pop()
+            if frame.emitted_open:
+                self._out.extend(lines)
+        elif not self._is_active():
+            pass
+        elif directive == 'define':
+            m = DEFINE_RE.match(arg)
+            if m.group(2):
+                self._set_macro(m.group(1), Specializer.FUNCTION_LIKE)
+            else:
+                self._set_macro(m.group(1), COMMENT_RE.sub(' ', m.group(3)).strip() or '1')
+            self._out.extend(lines)
+        elif directive == 'undef':
+            self._set_macro(arg.split()[0], Specializer.UNDEFINED)
+            self._out.extend(lines)
+        elif directive == 'include' and INCLUDE_INC_RE.match(arg):
+            path = os.path.join(self._project.include_root, INCLUDE_INC_RE.match(arg).group(1))
+            if not os.path.exists(path):
+                self._out.extend(lines)
+                return
+            reader = self._project.open_source(path)
+            inc_lines = []
+            while True:
+                line = reader.read_line()
+                if line is None:
+                    break
+                inc_lines.append(line)
+            self.process(inc_lines)
+        elif directive == 'error':
+            if self._is_certain():
+                raise ValueError(f'configuration is rejected by the code: #error {arg}')
+            self._out.extend(lines)
+        else:
+            self._out.extend(lines)
+
+    def process(self, lines):
+        it = iter(lines)
+        for line in it:
+            m = DIRECTIVE_RE.match(line)
+            if not m:
+                if self._is_active():
+                    self._out.append(line)
+                continue
+            physical = [line]
+            while physical[-1].endswith('\\'):
+                physical.append(next(it))
+            logical = ' '.join(l[:-1] if l.endswith('\\') else l for l in physical)
+            m = DIRECTIVE_RE.match(logical)
+            self._process_directive(m.group(1), m.group(2), physical)
+
+    def specialize(self, text):
+        # The configuration macros that are not given have been resolved to their defaults, so defining any of them
+        # before including the result would be silently ignored.
+        for name in dict.fromkeys(self._project.get_config_macros()):
+            if name not in self._defines:
+                self._out.append(f'#ifdef {name}')
+                self._out.append(f'#error "This header has been specialized for the default {name}; do not define it."')
+                self._out.append(f'#endif')
+        for name, value in self._defines.items():
+            self._out.append(f'#ifdef {name}')
+            self._out.append(f'#error "This header has been specialized for {name}={value}; do not define it."')
+            self._out.append(f'#endif')
+            self._out.append(f'#define {name} {value}')
+        lines = text.split('\n')
+        if not lines[-1]:
+            lines.pop()
+        self.process(lines)
+        if self._stack:
+            raise ValueError('unterminated "#if"')
+        return ''.join(line + '\n' for line in self._out)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_sha256(path):
+    try:
+        with open(path, 'rb') as f:
+            return _sha256(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomically(path, text):
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Writes 'text' into 'path' unless it already has exactly this content, so that its mtime (and thus whatever
+# depends on it) is kept. Returns True if the file has been written.
+def write_if_changed(path, text):
+    try:
+        with open(path, 'r') as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    _write_atomically(path, text)
+    return True
+
+
+# Bump this to invalidate all existing cache entries.
+CACHE_FORMAT = 1
+
+
+def _cache_key(path, project_name, include_root, namespace_mode, finalize, defines):
+    opts = {
+        'defines': None if defines is None else sorted(defines.items()),
+        'format': CACHE_FORMAT,
+        'ato': _file_sha256(os.path.abspath(__file__)),
+        'path': os.path.abspath(path),
+        'project_name': project_name,
+        'include_root': os.path.abspath(include_root),
+        'namespace_mode': namespace_mode,
+        'finalize': finalize,
+    }
+    return _sha256(json.dumps(opts, sort_keys=True).encode())
+
+
+# Returns None on a miss. A malformed entry (e.g. a truncated or hand-edited one) is a miss too; it gets overwritten.
+def _cache_lookup(entry_path):
+    try:
+        with open(entry_path, 'r') as f:
+            entry = json.load(f)
+        output = entry['output']
+        for dep_path, dep_hash in entry['deps']:
+            if _file_sha256(dep_path) != dep_hash:
+                return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(output, str):
+        return None
+    return output
+
+
+# Preprocesses the file at 'path' and returns the result as a string.
+#
+# The result is cached in 'cache_dir' (".ato_cache" in 'include_root' by default), keyed by the options; a cache
+# entry records the hashes of the input file and of every file it includes, and is only used if none of them has
+# changed since.
+#
+# If 'defines' (a dict from macro names to their bodies) is given, the result is specialized for this configuration
+# (see Specializer).
+def preprocess(path, project_name=None, include_root='.', namespace_mode=False, finalize=True, defines=None,
+               cache_dir=None, use_cache=True):
+    if namespace_mode and project_name is not None:
+        raise ValueError('Option "namespace_mode" is incompatible with "project_name"')
+
+    if use_cache:
+        if cache_dir is None:
+            cache_dir = os.path.join(include_root, '.ato_cache')
+        key = _cache_key(path, project_name, include_root, namespace_mode, finalize, defines)
+        entry_path = os.path.join(cache_dir, key + '.json')
+        output = _cache_lookup(entry_path)
+        if output is not None:
+            return output
+
+    project = Project(name=project_name, include_root=include_root)
+    emitter = ListEmitter()
+    pp = Preprocessor(
+        mode='n' if namespace_mode else 'p',
+        reader=project.open_source(path),
+        emitter=emitter,
+        project=project,
+    )
+    pp.preprocess(finalize=finalize)
+    output = emitter.get_text()
+    if defines is not None:
+        output = Specializer(project, defines).specialize(output)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomically(entry_path, json.dumps({
+            'deps': sorted(project.get_deps()),
+            'output': output,
+        }))
+
+    return output
+
+
+class Variant:
+    def __init__(self, input_file, output_file, project_name=None, namespace_mode=False, finalize=True, defines=None,
+                 prune=False):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.project_name = project_name
+        self.namespace_mode = namespace_mode
+        self.finalize = finalize
+        self.defines = defines or {}
+        self.prune = prune
+
+    def preprocess_args(self):
+        spec = tuple(sorted(self.defines.items())) if self.prune else None
+        return (self.input_file, self.project_name, self.namespace_mode, self.finalize, spec)
+
+
+# A manifest is a JSON or TOML (by extension) file like
+#
+#   {
+#       "include_root": ".",
+#       "variants": [
+#           {"input": "glass_prevnext.ato", "output": "glass_prevnext.h"},
+#           {"input": "glass.ato", "output": "glass_bid.h", "defines": {"GLASS_PREFIX": "bid", "GLASS_N": "32"}},
+#           {"input": "glass.ato", "output": "glass_ask.h", "defines": {"GLASS_PREFIX": "ask", "GLASS_N": "32"}}
+#       ]
+#   }
+#
+# Each variant may also have "project_name", "namespace_mode" and "finalize" (see the options of the same names).
+# The "defines" of a variant are emitted as "#define" lines before the generated code; if the variant also has
+# "prune": true, the code is specialized for them instead (see Specializer). Relative paths are relative to the
+# directory of the manifest.
+#
+# Returns (include_root, list of Variant).
+def load_manifest(path):
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError('TOML manifests require Python 3.11 or newer') from None
+        with open(path, 'rb') as f:
+            manifest = tomllib.load(f)
+    else:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+
+    base_dir = os.path.dirname(path)
+    include_root = os.path.join(base_dir, manifest.get('include_root', '.'))
+
+    variants = []
+    for v in manifest['variants']:
+        unknown = set(v) - {'input', 'output', 'project_name', 'namespace_mode', 'finalize', 'defines', 'prune'}
+        if unknown:
+            raise ValueError(f'unknown variant key(s) in manifest: {", ".join(sorted(unknown))}')
+        variants.append(Variant(
+            input_file=os.path.join(base_dir, v['input']),
+            output_file=os.path.join(base_dir, v['output']),
+            project_name=v.get('project_name'),
+            namespace_mode=v.get('namespace_mode', False),
+            finalize=v.get('finalize', True),
+            defines={name: str(value) for name, value in v.get('defines', {}).items()},
+            prune=v.get('prune', False),
+        ))
+
+    outputs = [v.output_file for v in variants]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError('manifest has several variants with the same output file')
+
+    return include_root, variants
+
+
+def _render_variant(variant, text):
+    if variant.prune:
+        return text
+    prologue = ''.join(f'#define {name} {value}\n' for name, value in variant.defines.items())
+    return prologue + text
+
+
+def _preprocess_pass(args, include_root, cache_dir, use_cache):
+    input_file, project_name, namespace_mode, finalize, spec = args
+    return preprocess(
+        input_file,
+        project_name=project_name,
+        include_root=include_root,
+        namespace_mode=namespace_mode,
+        finalize=finalize,
+        defines=None if spec is None else dict(spec),
+        cache_dir=cache_dir,
+        use_cache=use_cache)
+
+
+# Generates all 'variants'. Variants that differ only in their (not pruned) "defines" share one preprocessing pass; distinct
+# passes run in parallel in up to 'jobs' processes. Returns the list of the output files that have been written.
+def generate_variants(variants, include_root='.', cache_dir=None, use_cache=True, jobs=None):
+    passes = list(dict.fromkeys(v.preprocess_args() for v in variants))
+
+    if jobs == 1 or len(passes) <= 1:
+        texts = {args: _preprocess_pass(args, include_root, cache_dir, use_cache) for args in passes}
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                args: executor.submit(_preprocess_pass, args, include_root, cache_dir, use_cache)
+                for args in passes
+            }
+            texts = {args: fut.result() for args, fut in futures.items()}
+
+    written = []
+    for v in variants:
+        if write_if_changed(v.output_file, _render_variant(v, texts[v.preprocess_args()])):
+            written.append(v.output_file)
+    return written
+
+
+# Reads the object-like macros defined in a configuration header such as "example/glass_def.h"; everything else in
+# it (includes, conditionals, ...) is ignored.
+def read_config_header(path):
+    defines = {}
+    with open(path, 'r') as f:
+        for line in f:
+            m = DIRECTIVE_RE.match(line.rstrip('\n'))
+            if not m or m.group(1) != 'define':
+                continue
+            m = DEFINE_RE.match(m.group(2))
+            if m and not m.group(2):
+                defines[m.group(1)] = COMMENT_RE.sub(' ', m.group(3)).strip() or '1'
+    return defines
+
+
+def parse_define(s):
+    name, sep, value = s.partition('=')
+    if not re.fullmatch(C_TOKEN_RE_STR, name):
+        raise argparse.ArgumentTypeError(f'expected NAME[=VALUE], got {s!r}')
+    return name, value if sep else '1'
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument('input_file', type=lambda path: open(path, 'r'), default=sys.stdin, nargs='?')
-    ap.add_argument('output_file', type=lambda path: open(path, 'w'), default=sys.stdout, nargs='?')
+    ap.add_argument('input_file', default=None, nargs='?')
+    ap.add_argument('output_file', default=None, nargs='?')
     ap.add_argument('--namespace-mode', action='store_true')
     ap.add_argument('--project-name', default=None)
     ap.add_argument('--include-root', default='.')
     ap.add_argument('--no-finalize', action='store_true')
+    ap.add_argument('--cache-dir', default=None, help='default: ".ato_cache" in the include root')
+    ap.add_argument('--no-cache', action='store_true')
+    ap.add_argument('--manifest', default=None, help='generate all variants listed in this JSON or TOML file')
+    ap.add_argument('--jobs', type=int, default=None, help='number of parallel processes for "--manifest"')
+    ap.add_argument(
+        '--config-header', default=None,
+        help='specialize the output for the configuration defined in this header (e.g. "example/glass_def.h")')
+    ap.add_argument(
+        '--define', '-D', type=parse_define, action='append', default=[],
+        help='NAME[=VALUE]: specialize the output for this macro (overrides "--config-header")')
 
     args = ap.parse_args()
 
     if args.namespace_mode and args.project_name is not None:
         raise ValueError('Option "--namespace-mode" is incompatible with "--project-name"')
 
-    reader = FileReader(args.input_file)
-    emitter = FileEmitter(args.output_file)
-    pp = Preprocessor(
-        mode='n' if args.namespace_mode else 'p',
-        reader=reader,
-        emitter=emitter,
-        project=Project(
-            name=args.project_name,
-            include_root=args.include_root,
-        ),
+    defines = None
+    if args.config_header is not None or args.define:
+        defines = read_config_header(args.config_header) if args.config_header is not None else {}
+        defines.update(args.define)
+
+    if args.manifest is not None:
+        if args.input_file is not None or args.output_file is not None:
+            raise ValueError('Option "--manifest" is incompatible with input and output files')
+        if defines is not None:
+            raise ValueError('Option "--manifest" is incompatible with "--define" and "--config-header"')
+        include_root, variants = load_manifest(args.manifest)
+        generate_variants(
+            variants,
+            include_root=include_root,
+            cache_dir=args.cache_dir,
+            use_cache=not args.no_cache,
+            jobs=args.jobs)
+        return
+
+    if args.input_file is None:
+        # Standard input can not be hashed before it is read, so it is never cached.
+        if defines is not None:
+            raise ValueError('Options "--define" and "--config-header" require an input file')
+        project = Project(name=args.project_name, include_root=args.include_root)
+        pp = Preprocessor(
+            mode='n' if args.namespace_mode else 'p',
+            reader=FileReader(sys.stdin),
+            emitter=FileEmitter(sys.stdout),
+            project=project,
+        )
+        pp.preprocess(finalize=not args.no_finalize)
+        return
+
+    output = preprocess(
+        args.input_file,
+        project_name=args.project_name,
+        include_root=args.include_root,
+        namespace_mode=args.namespace_mode,
+        finalize=not args.no_finalize,
+        defines=defines,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
     )
-    pp.preprocess(finalize=not args.no_finalize)
+    if args.output_file is None:
+        sys.stdout.write(output)
+    else:
+        write_if_changed(args.output_file, output)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Picks the glass configuration that replays a given text trace (see "optrace.py") the fastest.
+#
+# Every combination of the candidate values of the knobs below is a configuration. Configurations that can not
+# hold the peak size of the largest book of the trace are pruned; the rest are compiled into separate "bench"
+# executables (in parallel), and each is run "--repeats" times on the trace. Prints a table ranked by the mean
+# time per operation, with 95% confidence intervals. A configuration whose build or run fails is reported and left
+# out.
+
+import argparse
+import concurrent.futures
+import itertools
+import math
+import os
+import random
+import shlex
+import statistics
+import subprocess
+import sys
+
+import optrace
+import plan_mem
+import run
+
+
+# (macro, candidate values). Knobs with a single candidate are not varied by default; it is the repo default.
+KNOBS = [
+    ('GLASS_N', ['16', '32', '64']),
+    ('GLASS_SIZE', ['uint16_t', 'uint32_t']),
+    ('GLASS_WITH_SSIZE', ['0', '1']),
+    ('GLASS_WITH_CACHE', ['0', '1']),
+    ('GLASS_WITH_HT', ['0', '1']),
+    ('GLASS_WITH_HT_OPEN', ['0', '1']),
+    ('GLASS_HT_MAX_LOOKUP_LEN', ['5']),
+    ('GLASS_WITH_TRASH_ENCODING', ['0', '1']),
+    ('GLASS_WITH_FIRST_LAST_PTRS', ['0', '1']),
+    ('GLASS_WITH_FIRST_LAST_PTRS_LAZY', ['1']),
+    ('GLASS_WITH_ADD_NODE_MULTIPLE', ['1']),
+]
+
+SSIZE_OF = {
+    'uint8_t': 'int8_t',
+    'uint16_t': 'int16_t',
+    'uint32_t': 'int32_t',
+    'uint64_t': 'int64_t',
+}
+
+# Two-sided 95% quantiles of Student's t-distribution, by the number of degrees of freedom.
+T95 = [
+    None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+class TraceInfo:
+    def __init__(self, path):
+        self.nops = 0
+        self.max_key = 0
+        self.peak_size = 0
+
+        books = {}
+        with open(path, 'r') as f:
+            for op in optrace.read_text_trace(f):
+                self.nops += 1
+                self.max_key = max(self.max_key, op.key)
+                live = books.setdefault(op.book(), set())
+                if op.op == 'i':
+                    live.add(op.key)
+                    self.peak_size = max(self.peak_size, len(live))
+                elif op.op == 'e':
+                    live.discard(op.key)
+
+
+def parse_knob(s):
+    name, sep, values = s.partition('=')
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f'expected NAME=VALUE[,VALUE...], got {s!r}')
+    return name, values.split(',')
+
+
+def normalize(cfg):
+    # Knobs that have no effect in this configuration are reset, so that such duplicates collapse into one.
+    cfg = dict(cfg)
+    if cfg.get('GLASS_WITH_HT') == '0':
+        cfg.pop('GLASS_HT_MAX_LOOKUP_LEN', None)
+        cfg.pop('GLASS_WITH_HT_OPEN', None)
+    if cfg.get('GLASS_WITH_FIRST_LAST_PTRS') == '0':
+        cfg.pop('GLASS_WITH_FIRST_LAST_PTRS_LAZY', None)
+    if cfg.get('GLASS_WITH_SSIZE') == '1':
+        cfg['GLASS_SSIZE'] = SSIZE_OF[cfg['GLASS_SIZE']]
+    return cfg
+
+
+def enumerate_configs(knobs):
+    names = [name for name, _ in knobs]
+    seen = set()
+    res = []
+    for values in itertools.product(*(vals for _, vals in knobs)):
+        cfg = normalize(zip(names, values))
+        key = frozenset(cfg.items())
+        if key not in seen:
+            seen.add(key)
+            res.append(cfg)
+    return res
+
+
+def fits(cfg, info, k):
+    plan = plan_mem.Config(
+        n=int(cfg['GLASS_N']),
+        size=cfg['GLASS_SIZE'],
+        k=k,
+        with_ssize=cfg.get('GLASS_WITH_SSIZE') == '1')
+    return plan_mem.size_to_max_capacity(plan, info.peak_size) <= plan.max_capacity
+
+
+def cfg_to_str(cfg):
+    short = {
+        'GLASS_N': 'N',
+        'GLASS_SIZE': 'SIZE',
+        'GLASS_SSIZE': None,
+        'GLASS_HT_MAX_LOOKUP_LEN': 'HT_LEN',
+    }
+    words = []
+    for name, value in cfg.items():
+        label = short.get(name, name.removeprefix('GLASS_WITH_'))
+        if label is None:
+            continue
+        words.append(f'{label}={value}')
+    return ' '.join(words)
+
+
+def build_one(cxx, cxxflags, k, cfg, exe):
+    argv = [
+        cxx,
+        *cxxflags,
+        f'-DGLASS_K={k}',
+        '-DBENCH_WITH_MAPS=0',
+        *(f'-D{name}={value}' for name, value in cfg.items()),
+        '-o', exe,
+        os.path.join(run.BENCH_DIR, 'bench.cc'),
+        os.path.join(run.ROOT_DIR, 'common.c'),
+    ]
+    out = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if out.returncode != 0:
+        return out.stdout
+    return None
+
+
+# Returns (time, None), or (None, error message) if the run has failed.
+def run_one(exe, ncopies, niters, trace):
+    try:
+        t_glass, _, _ = run.run_bench(exe, 'DATA', ncopies, niters, trace)
+    except subprocess.CalledProcessError as e:
+        if e.returncode < 0:
+            return None, f'killed by signal {-e.returncode}'
+        return None, f'exited with status {e.returncode}'
+    except ValueError as e:
+        return None, f'unexpected output: {e}'
+    return t_glass, None
+
+
+def confidence_interval(samples):
+    mean = statistics.mean(samples)
+    if len(samples) < 2:
+        return mean, math.nan
+    df = len(samples) - 1
+    t = T95[df] if df < len(T95) else 1.96
+    return mean, t * statistics.stdev(samples) / math.sqrt(len(samples))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Find the fastest glass configuration for a text trace.')
+    ap.add_argument('trace', help='text trace (see optrace.py)')
+    ap.add_argument('--build-dir', default=os.path.join(run.BENCH_DIR, 'build', 'autotune'))
+    ap.add_argument('--cxx', default='g++')
+    ap.add_argument('--cxxflags', default='-std=gnu++17 -O3 -march=native -DNDEBUG')
+    ap.add_argument('--k', type=int, default=50, help='GLASS_K to use (keys of the trace must fit)')
+    ap.add_argument(
+        '--knob', type=parse_knob, action='append', default=[],
+        help='NAME=VALUE[,VALUE...]: candidate values of a knob (replaces the default ones, or adds a new knob)')
+    ap.add_argument('--limit', type=int, default=None, help='benchmark at most this many random configurations')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of parallel compilations')
+    ap.add_argument(
+        '--run-jobs', type=int, default=1,
+        help='number of parallel benchmark runs (more than 1 makes the timings noisier)')
+    ap.add_argument('--repeats', type=int, default=5)
+    ap.add_argument('--ncopies', type=int, default=1)
+    ap.add_argument('--niters', type=int, default=10)
+    ap.add_argument('--top', type=int, default=None, help='only print this many best configurations')
+    args = ap.parse_args()
+
+    knobs = dict(KNOBS)
+    for name, values in args.knob:
+        knobs[name] = values
+
+    info = TraceInfo(args.trace)
+    log(f'trace: {info.nops} operations, peak book size {info.peak_size}, max key {info.max_key}')
+    if info.max_key >> args.k:
+        log(f'FATAL: max key {info.max_key} does not fit into GLASS_K={args.k} bits.')
+        sys.exit(1)
+    if not info.nops:
+        log('FATAL: empty trace.')
+        sys.exit(1)
+
+    configs = enumerate_configs(list(knobs.items()))
+    fitting = [cfg for cfg in configs if fits(cfg, info, args.k)]
+    log(f'{len(configs)} configurations, {len(configs) - len(fitting)} pruned as too small for the peak size')
+    if args.limit is not None and len(fitting) > args.limit:
+        fitting = random.Random(args.seed).sample(fitting, args.limit)
+
+    os.makedirs(args.build_dir, exist_ok=True)
+    run.gen_headers()
+
+    cxxflags = shlex.split(args.cxxflags)
+    exes = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {}
+        for i, cfg in enumerate(fitting):
+            exe = os.path.join(args.build_dir, f'bench_{i}')
+            futures[pool.submit(build_one, args.cxx, cxxflags, args.k, cfg, exe)] = (i, exe)
+        for fut in concurrent.futures.as_completed(futures):
+            i, exe = futures[fut]
+            err = fut.result()
+            if err is not None:
+                log(f'build failed for [{cfg_to_str(fitting[i])}]:\n{err}')
+                continue
+            exes[i] = exe
+            log(f'built {len(exes)}/{len(fitting)}')
+
+    # Each round runs every configuration once, in a random order, so that slow drifts of the machine state
+    # spread evenly over all of them.
+    samples = {i: [] for i in exes}
+    rng = random.Random(args.seed)
+    nops_total = info.nops * args.ncopies * args.niters
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.run_jobs) as pool:
+        for r in range(args.repeats):
+            order = list(exes)
+            rng.shuffle(order)
+            futures = {pool.submit(run_one, exes[i], args.ncopies, args.niters, args.trace): i for i in order}
+            for fut in concurrent.futures.as_completed(futures):
+                i = futures[fut]
+                t, err = fut.result()
+                if err is not None:
+                    log(f'run failed for [{cfg_to_str(fitting[i])}] ({exes[i]}): {err}; skipping it')
+                    del exes[i]
+                    del samples[i]
+                    continue
+                samples[i].append(t / nops_total)
+            log(f'round {r + 1}/{args.repeats} done')
+
+    rows = []
+    for i, xs in samples.items():
+        mean, ci = confidence_interval(xs)
+        rows.append((mean, ci, fitting[i]))
+    rows.sort(key=lambda row: row[0])
+    if args.top is not None:
+        rows = rows[:args.top]
+
+    if not rows:
+        log('FATAL: nothing was benchmarked.')
+        sys.exit(1)
+
+    best = rows[0][0]
+    print(f'{"rank":>4} {"ns/op":>10} {"±95%":>8} {"vs best":>8}  configuration')
+    for rank, (mean, ci, cfg) in enumerate(rows, start=1):
+        print(f'{rank:>4} {mean:>10.3f} {ci:>8.3f} {mean / best:>7.3f}x  {cfg_to_str(cfg)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,480 @@
+// (c) 2025 shdown
+// This code is licensed under MIT license (see LICENSE.MIT for details)
+
+// Usage: bench <workload> <number of copies> <number of iterations> <data file>
+//
+// Workloads:
+//  * INSERT, ERASE, FIND_E, FIND_NE: the data file is generated by "gen_data.py synth";
+//  * DATA: the data file is a text trace (see "optrace.py");
+//  * BIN: the data file is a binary trace (see "bintrace.h"); it is mapped into memory and replayed in place.
+//
+// Prints three numbers: total time (in nanoseconds, or in TSC ticks if BENCH_WITH_RDTSC is enabled)
+// spent by glass, by std::map, and by std::map with a slot allocator. If BENCH_WITH_MAPS is disabled, only glass
+// is run, and the last two numbers are zeros.
+
+#include "glass_def.h"
+#include "bintrace.h"
+
+#include <cstddef>
+#include <map>
+#include <vector>
+#include <utility>
+#include <new>
+
+#ifndef BENCH_WITH_RDTSC
+# define BENCH_WITH_RDTSC 0
+#endif
+
+#ifndef BENCH_WITH_MAPS
+# define BENCH_WITH_MAPS 1
+#endif
+
+typedef bench_Key Key;
+typedef bench_Value Value;
+
+static volatile uint64_t sink;
+
+static uint64_t now(void)
+{
+#if BENCH_WITH_RDTSC
+    uint32_t lo, hi;
+    __asm__ __volatile__ ("mfence; lfence; rdtsc; lfence" : "=a" (lo), "=d" (hi) :: "memory");
+    return (((uint64_t) hi) << 32) | lo;
+#else
+    struct timespec ts;
+    if (clock_gettime(CLOCK_MONOTONIC, &ts) < 0) {
+        perror("clock_gettime");
+        abort();
+    }
+    return ((uint64_t) ts.tv_sec) * 1000000000 + ts.tv_nsec;
+#endif
+}
+
+// Slot allocator shared by all the std::map copies (see the "Benchmarks" section of the paper).
+template<size_t Size>
+struct SlotPool
+{
+    union Slot
+    {
+        Slot *next;
+        alignas(alignof(std::max_align_t)) char data[Size];
+    };
+
+    enum { ARENA_NSLOTS = 4096 };
+
+    Slot *first_free = nullptr;
+
+    void *allocate()
+    {
+        if (unlikely(!first_free)) {
+            Slot *arena = (Slot *) malloc_or_die(ARENA_NSLOTS, sizeof(Slot));
+            for (size_t i = 0; i < ARENA_NSLOTS - 1; ++i) {
+                arena[i].next = &arena[i + 1];
+            }
+            arena[ARENA_NSLOTS - 1].next = nullptr;
+            first_free = arena;
+        }
+        Slot *res = first_free;
+        first_free = res->next;
+        return res;
+    }
+
+    void deallocate(void *p)
+    {
+        Slot *s = (Slot *) p;
+        s->next = first_free;
+        first_free = s;
+    }
+
+    static SlotPool &instance()
+    {
+        static SlotPool pool;
+        return pool;
+    }
+};
+
+template<class T>
+struct SlotAllocator
+{
+    typedef T value_type;
+
+    SlotAllocator() = default;
+
+    template<class U>
+    SlotAllocator(const SlotAllocator<U> &) {}
+
+    T *allocate(size_t n)
+    {
+        if (n != 1) {
+            return (T *) ::operator new(n * sizeof(T));
+        }
+        return (T *) SlotPool<sizeof(T)>::instance().allocate();
+    }
+
+    void deallocate(T *p, size_t n)
+    {
+        if (n != 1) {
+            ::operator delete(p);
+            return;
+        }
+        SlotPool<sizeof(T)>::instance().deallocate(p);
+    }
+
+    template<class U>
+    bool operator ==(const SlotAllocator<U> &) const { return true; }
+
+    template<class U>
+    bool operator !=(const SlotAllocator<U> &) const { return false; }
+};
+
+typedef std::map<Key, Value> Map;
+typedef std::map<Key, Value, std::less<Key>, SlotAllocator<std::pair<const Key, Value>>> SlotMap;
+
+struct GlassBook
+{
+    glass_Glass g;
+
+    GlassBook() { glass_create(&g, 0); }
+    ~GlassBook() { glass_destroy(&g); }
+
+    GlassBook(const GlassBook &) = delete;
+    GlassBook &operator =(const GlassBook &) = delete;
+
+    void insert(Key k, Value v) { glass_insert(&g, k, v); }
+
+    void erase(Key k) { glass_erase(&g, k); }
+
+    uint64_t find(Key k)
+    {
+        glass_Iter it = glass_find(&g, k);
+        return glass_iter_is_end(it) ? 0 : glass_iter_get_value(&g, it);
+    }
+
+    void replace(Key k, Value v) { glass_replace(&g, k, v); }
+
+    uint64_t iter(bool is_bid, unsigned n)
+    {
+        uint64_t res = 0;
+        glass_Iter it = is_bid ? glass_last(&g) : glass_begin(&g);
+        for (unsigned i = 0; i < n && !glass_iter_is_end(it); ++i) {
+            res += glass_iter_get_value(&g, it);
+            it = is_bid ? glass_iter_prev(&g, it) : glass_iter_next(&g, it);
+        }
+        return res;
+    }
+
+    void clear() { glass_clear(&g, false); }
+};
+
+template<class M>
+struct MapBook
+{
+    M m;
+
+    void insert(Key k, Value v) { m[k] = v; }
+
+    void erase(Key k) { m.erase(k); }
+
+    uint64_t find(Key k)
+    {
+        auto it = m.find(k);
+        return it == m.end() ? 0 : it->second;
+    }
+
+    void replace(Key k, Value v)
+    {
+        auto it = m.find(k);
+        if (it != m.end()) {
+            it->second = v;
+        }
+    }
+
+    uint64_t iter(bool is_bid, unsigned n)
+    {
+        uint64_t res = 0;
+        unsigned i = 0;
+        if (is_bid) {
+            for (auto it = m.rbegin(); i < n && it != m.rend(); ++it, ++i) {
+                res += it->second;
+            }
+        } else {
+            for (auto it = m.begin(); i < n && it != m.end(); ++it, ++i) {
+                res += it->second;
+            }
+        }
+        return res;
+    }
+
+    void clear() { m.clear(); }
+};
+
+struct SynthData
+{
+    std::vector<Key> keys;
+    std::vector<Key> queries;
+};
+
+struct TraceOp
+{
+    char op;
+    bool is_bid;
+    uint32_t book;
+    Key key;
+    uint32_t arg;
+};
+
+struct TraceData
+{
+    std::vector<TraceOp> ops;
+    size_t nbooks = 0;
+};
+
+static void read_keys(FILE *f, std::vector<Key> &out)
+{
+    size_t n;
+    if (fscanf(f, "%zu", &n) != 1) {
+        fputs("FATAL: bench: cannot read the number of keys.\n", stderr);
+        abort();
+    }
+    out.resize(n);
+    for (size_t i = 0; i < n; ++i) {
+        if (fscanf(f, "%" SCNu64, &out[i]) != 1) {
+            fputs("FATAL: bench: cannot read a key.\n", stderr);
+            abort();
+        }
+    }
+}
+
+static SynthData read_synth(FILE *f)
+{
+    SynthData res;
+    read_keys(f, res.keys);
+    read_keys(f, res.queries);
+    return res;
+}
+
+static TraceData read_trace(FILE *f)
+{
+    TraceData res;
+    std::map<std::pair<uint32_t, char>, uint32_t> books;
+
+    char line[256];
+    while (fgets(line, sizeof(line), f)) {
+        if (line[0] == '#' || line[0] == '\n') {
+            continue;
+        }
+        uint64_t ts;
+        char op;
+        uint32_t instrument;
+        char side;
+        Key key;
+        uint32_t arg;
+        if (sscanf(line, "%" SCNu64 " %c %" SCNu32 " %c %" SCNu64 " %" SCNu32,
+                   &ts, &op, &instrument, &side, &key, &arg) != 6)
+        {
+            fprintf(stderr, "FATAL: bench: cannot parse trace line: %s", line);
+            abort();
+        }
+        auto ins = books.insert({{instrument, side}, (uint32_t) books.size()});
+        res.ops.push_back(TraceOp{op, side == 'b', ins.first->second, key, arg});
+    }
+    res.nbooks = books.size();
+    return res;
+}
+
+template<class Book>
+static uint64_t run_synth(const char *workload, const SynthData &data, size_t ncopies, size_t niters)
+{
+    std::vector<Book> books(ncopies);
+    const std::vector<Key> &keys = data.keys;
+
+    bool is_insert = strcmp(workload, "INSERT") == 0;
+    bool is_erase = strcmp(workload, "ERASE") == 0;
+    bool is_find_ne = strcmp(workload, "FIND_NE") == 0;
+
+    const std::vector<Key> &lookups = is_find_ne ? data.queries : keys;
+
+    uint64_t total = 0;
+    uint64_t acc = 0;
+    for (size_t iter = 0; iter < niters; ++iter) {
+        if (!is_insert) {
+            for (Key k : keys) {
+                for (Book &b : books) {
+                    b.insert(k, (Value) k);
+                }
+            }
+        }
+
+        uint64_t t0 = now();
+        if (is_insert) {
+            for (Key k : keys) {
+                for (Book &b : books) {
+                    b.insert(k, (Value) k);
+                }
+            }
+        } else if (is_erase) {
+            for (Key k : keys) {
+                for (Book &b : books) {
+                    b.erase(k);
+                }
+            }
+        } else {
+            for (Key k : lookups) {
+                for (Book &b : books) {
+                    acc += b.find(k);
+                }
+            }
+        }
+        total += now() - t0;
+
+        for (Book &b : books) {
+            b.clear();
+        }
+    }
+    sink = acc;
+    return total;
+}
+
+template<class Book>
+static inline void apply_op(Book &b, char op, bool is_bid, Key key, uint32_t arg, uint64_t &acc)
+{
+    switch (op) {
+    case 'i':
+        b.insert(key, (Value) arg);
+        break;
+    case 'e':
+        b.erase(key);
+        break;
+    case 'f':
+        acc += b.find(key);
+        break;
+    case 'r':
+        b.replace(key, (Value) arg);
+        break;
+    case 't':
+        acc += b.iter(is_bid, arg);
+        break;
+    }
+}
+
+template<class Book>
+static uint64_t run_trace(const TraceData &data, size_t ncopies, size_t niters)
+{
+    size_t nbooks = data.nbooks;
+    std::vector<Book> books(ncopies * nbooks);
+
+    uint64_t total = 0;
+    uint64_t acc = 0;
+    for (size_t iter = 0; iter < niters; ++iter) {
+        uint64_t t0 = now();
+        for (const TraceOp &op : data.ops) {
+            for (size_t c = 0; c < ncopies; ++c) {
+                apply_op(books[c * nbooks + op.book], op.op, op.is_bid, op.key, op.arg, acc);
+            }
+        }
+        total += now() - t0;
+
+        for (Book &b : books) {
+            b.clear();
+        }
+    }
+    sink = acc;
+    return total;
+}
+
+// Book index of a record is 2 * instrument + (side == 'a').
+template<class Book>
+static uint64_t run_bin(const bintrace_Map &m, size_t ncopies, size_t niters)
+{
+    size_t nbooks = 2 * (size_t) m.h->ninstruments;
+    std::vector<Book> books(ncopies * nbooks);
+
+    const bintrace_Record *begin = m.records;
+    const bintrace_Record *end = m.records + m.h->nrecords;
+
+    uint64_t total = 0;
+    uint64_t acc = 0;
+    for (size_t iter = 0; iter < niters; ++iter) {
+        uint64_t t0 = now();
+        for (const bintrace_Record *r = begin; r != end; ++r) {
+            size_t book = 2 * (size_t) r->instrument + (r->side == 'a');
+            for (size_t c = 0; c < ncopies; ++c) {
+                apply_op(books[c * nbooks + book], (char) r->op, r->side == 'b', (Key) r->key, r->arg, acc);
+            }
+        }
+        total += now() - t0;
+
+        for (Book &b : books) {
+            b.clear();
+        }
+    }
+    sink = acc;
+    return total;
+}
+
+int main(int argc, char **argv)
+{
+    if (argc != 5) {
+        fprintf(stderr, "USAGE: %s <workload> <number of copies> <number of iterations> <data file>\n", argv[0]);
+        return 2;
+    }
+
+    const char *workload = argv[1];
+    size_t ncopies = strtoull(argv[2], NULL, 10);
+    size_t niters = strtoull(argv[3], NULL, 10);
+
+    uint64_t t_glass, t_map = 0, t_slot_map = 0;
+
+    if (strcmp(workload, "BIN") == 0) {
+        bintrace_Map m;
+        if (bintrace_map(&m, argv[4]) < 0) {
+            perror(argv[4]);
+            return 1;
+        }
+        t_glass = run_bin<GlassBook>(m, ncopies, niters);
+#if BENCH_WITH_MAPS
+        t_map = run_bin<MapBook<Map>>(m, ncopies, niters);
+        t_slot_map = run_bin<MapBook<SlotMap>>(m, ncopies, niters);
+#endif
+        bintrace_unmap(&m);
+        printf("%" PRIu64 " %" PRIu64 " %" PRIu64 "\n", t_glass, t_map, t_slot_map);
+        return 0;
+    }
+
+    FILE *f = fopen(argv[4], "r");
+    if (!f) {
+        perror(argv[4]);
+        return 1;
+    }
+
+    if (strcmp(workload, "DATA") == 0) {
+        TraceData data = read_trace(f);
+        t_glass = run_trace<GlassBook>(data, ncopies, niters);
+#if BENCH_WITH_MAPS
+        t_map = run_trace<MapBook<Map>>(data, ncopies, niters);
+        t_slot_map = run_trace<MapBook<SlotMap>>(data, ncopies, niters);
+#endif
+
+    } else if (
+            strcmp(workload, "INSERT") == 0 ||
+            strcmp(workload, "ERASE") == 0 ||
+            strcmp(workload, "FIND_E") == 0 ||
+            strcmp(workload, "FIND_NE") == 0)
+    {
+        SynthData data = read_synth(f);
+        t_glass = run_synth<GlassBook>(workload, data, ncopies, niters);
+#if BENCH_WITH_MAPS
+        t_map = run_synth<MapBook<Map>>(workload, data, ncopies, niters);
+        t_slot_map = run_synth<MapBook<SlotMap>>(workload, data, ncopies, niters);
+#endif
+
+    } else {
+        fprintf(stderr, "Unknown workload: %s\n", workload);
+        return 2;
+    }
+
+    fclose(f);
+
+    printf("%" PRIu64 " %" PRIu64 " %" PRIu64 "\n", t_glass, t_map, t_slot_map);
+    return 0;
+}
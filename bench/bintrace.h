@@ -0,0 +1,201 @@
+// (c) 2025 shdown
+// This code is licensed under MIT license (see LICENSE.MIT for details)
+
+// Binary operation trace format: the binary counterpart of the text format described in "optrace.py".
+//
+// The file is a 32-byte header followed by fixed-size 24-byte records, all little-endian:
+//
+//   header: magic "GLTRACE1", uint32 record size (24), uint32 number of instruments (max instrument + 1),
+//           uint64 number of records, uint64 zero;
+//   record: uint64 timestamp, uint64 key, uint32 arg, uint8 op, uint8 side, uint16 instrument;
+//
+// where <op> and <side> are the same characters as in the text format.
+//
+// A recording process writes records with "bintrace_recorder_*"; a reader maps the whole file with "bintrace_map"
+// and walks the records in place.
+
+#pragma once
+
+#if __cplusplus
+extern "C" {
+#endif
+
+#include "../common.h"
+
+#if __cplusplus
+}
+#endif
+
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <fcntl.h>
+
+#define BINTRACE_MAGIC "GLTRACE1"
+
+typedef struct {
+    char magic[8];
+    uint32_t record_size;
+    uint32_t ninstruments;
+    uint64_t nrecords;
+    uint64_t reserved;
+} bintrace_Header;
+
+typedef struct {
+    uint64_t ts;
+    uint64_t key;
+    uint32_t arg;
+    uint8_t op;
+    uint8_t side;
+    uint16_t instrument;
+} bintrace_Record;
+
+#ifdef __cplusplus
+# define BINTRACE_STATIC_ASSERT static_assert
+#else
+# define BINTRACE_STATIC_ASSERT _Static_assert
+#endif
+
+BINTRACE_STATIC_ASSERT(sizeof(bintrace_Header) == 32, "bintrace_Header must be 32 bytes");
+BINTRACE_STATIC_ASSERT(sizeof(bintrace_Record) == 24, "bintrace_Record must be 24 bytes");
+BINTRACE_STATIC_ASSERT(__BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__, "bintrace only supports little-endian hosts");
+
+enum { BINTRACE_RECORDER_BUF = 4096 };
+
+typedef struct {
+    FILE *f;
+    bintrace_Header h;
+    size_t nbuf;
+    bintrace_Record buf[BINTRACE_RECORDER_BUF];
+} bintrace_Recorder;
+
+in_header int bintrace_recorder_flush(bintrace_Recorder *r)
+{
+    if (r->nbuf && fwrite(r->buf, sizeof(bintrace_Record), r->nbuf, r->f) != r->nbuf) {
+        return -1;
+    }
+    r->nbuf = 0;
+    return 0;
+}
+
+// Returns 0 on success, or -1 on error (with 'errno' set).
+in_header int bintrace_recorder_open(bintrace_Recorder *r, const char *path)
+{
+    r->f = fopen(path, "wb");
+    if (!r->f) {
+        return -1;
+    }
+    r->h = (bintrace_Header) {0};
+    memcpy(r->h.magic, BINTRACE_MAGIC, sizeof(r->h.magic));
+    r->h.record_size = sizeof(bintrace_Record);
+    r->nbuf = 0;
+    // The header is rewritten with the final counts on close.
+    if (fwrite(&r->h, sizeof(r->h), 1, r->f) != 1) {
+        fclose(r->f);
+        return -1;
+    }
+    return 0;
+}
+
+in_header int bintrace_record(
+        bintrace_Recorder *r,
+        uint64_t ts,
+        char op,
+        uint16_t instrument,
+        char side,
+        uint64_t key,
+        uint32_t arg)
+{
+    if (r->nbuf == BINTRACE_RECORDER_BUF && bintrace_recorder_flush(r) < 0) {
+        return -1;
+    }
+    r->buf[r->nbuf++] = (bintrace_Record) {
+        .ts = ts,
+        .key = key,
+        .arg = arg,
+        .op = (uint8_t) op,
+        .side = (uint8_t) side,
+        .instrument = instrument,
+    };
+    ++r->h.nrecords;
+    if (instrument >= r->h.ninstruments) {
+        r->h.ninstruments = (uint32_t) instrument + 1;
+    }
+    return 0;
+}
+
+// Returns 0 on success, or -1 on error (with 'errno' set). The file is closed in either case.
+in_header int bintrace_recorder_close(bintrace_Recorder *r)
+{
+    int res = 0;
+    if (bintrace_recorder_flush(r) < 0 ||
+        fseek(r->f, 0, SEEK_SET) < 0 ||
+        fwrite(&r->h, sizeof(r->h), 1, r->f) != 1)
+    {
+        res = -1;
+    }
+    if (fclose(r->f) != 0) {
+        res = -1;
+    }
+    return res;
+}
+
+typedef struct {
+    void *base;
+    size_t len;
+    const bintrace_Header *h;
+    const bintrace_Record *records;
+} bintrace_Map;
+
+// Maps the trace at 'path' read-only. Returns 0 on success, or -1 on error (with 'errno' set; EINVAL means that
+// the file is not a binary trace).
+in_header int bintrace_map(bintrace_Map *m, const char *path)
+{
+    int fd = open(path, O_RDONLY);
+    if (fd < 0) {
+        return -1;
+    }
+    struct stat st;
+    if (fstat(fd, &st) < 0) {
+        int saved_errno = errno;
+        close(fd);
+        errno = saved_errno;
+        return -1;
+    }
+    size_t len = st.st_size;
+    if (len < sizeof(bintrace_Header)) {
+        close(fd);
+        errno = EINVAL;
+        return -1;
+    }
+    void *base = mmap(NULL, len, PROT_READ, MAP_PRIVATE, fd, 0);
+    int saved_errno = errno;
+    close(fd);
+    if (base == MAP_FAILED) {
+        errno = saved_errno;
+        return -1;
+    }
+
+    const bintrace_Header *h = (const bintrace_Header *) base;
+    if (memcmp(h->magic, BINTRACE_MAGIC, sizeof(h->magic)) != 0 ||
+        h->record_size != sizeof(bintrace_Record) ||
+        h->nrecords != (len - sizeof(bintrace_Header)) / sizeof(bintrace_Record) ||
+        (len - sizeof(bintrace_Header)) % sizeof(bintrace_Record) != 0)
+    {
+        munmap(base, len);
+        errno = EINVAL;
+        return -1;
+    }
+    // The records are only read sequentially.
+    madvise(base, len, MADV_SEQUENTIAL);
+
+    m->base = base;
+    m->len = len;
+    m->h = h;
+    m->records = (const bintrace_Record *) (h + 1);
+    return 0;
+}
+
+in_header void bintrace_unmap(bintrace_Map *m)
+{
+    munmap(m->base, m->len);
+}
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import argparse
+import os
+import random
+import sys
+
+import optrace
+
+
+PAPER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'paper')
+
+# Keep prices in the middle of the [0; 2^50) range so that they never underflow.
+BASE_PRICE = 1 << 40
+
+
+def read_histogram(path):
+    res = {}
+    with open(path, 'r') as f:
+        for line in f:
+            words = line.split()
+            if not words:
+                continue
+            diff, count = words
+            res[int(diff)] = int(count)
+    return res
+
+
+class DiffDistribution:
+    def __init__(self, histogram, allow_zero):
+        self.diffs = []
+        self.weights = []
+        for diff, count in sorted(histogram.items()):
+            if diff == 0 and not allow_zero:
+                continue
+            self.diffs.append(diff)
+            self.weights.append(count)
+
+    def sample(self, rng):
+        return rng.choices(self.diffs, weights=self.weights)[0]
+
+    def sample_signed(self, rng):
+        d = self.sample(rng)
+        return d if rng.random() < 0.5 else -d
+
+
+def gen_unique_prices(rng, dist, n, start, exclude):
+    res = []
+    seen = set(exclude)
+    cur = start
+    while len(res) < n:
+        nxt = cur + dist.sample_signed(rng)
+        if nxt in seen:
+            # Zero difference is prohibited, and so is a repeating price; just walk further.
+            cur = nxt
+            continue
+        seen.add(nxt)
+        res.append(nxt)
+        cur = nxt
+    return res
+
+
+def write_synth(f, keys, queries):
+    print(len(keys), file=f)
+    for k in keys:
+        print(k, file=f)
+    print(len(queries), file=f)
+    for k in queries:
+        print(k, file=f)
+
+
+def cmd_synth(args):
+    rng = random.Random(args.seed)
+    dist = DiffDistribution(read_histogram(args.seq_histogram), allow_zero=False)
+
+    keys = gen_unique_prices(rng, dist, args.nkeys, BASE_PRICE, exclude=())
+    queries = gen_unique_prices(rng, dist, args.nkeys, BASE_PRICE, exclude=keys)
+
+    write_synth(sys.stdout, keys, queries)
+
+
+class Book:
+    def __init__(self, is_bid):
+        self.is_bid = is_bid
+        self.levels = set()
+
+
+def cmd_book(args):
+    rng = random.Random(args.seed)
+    seq_dist = DiffDistribution(read_histogram(args.seq_histogram), allow_zero=False)
+    edge_dist = DiffDistribution(read_histogram(args.edge_histogram), allow_zero=True)
+
+    mids = [BASE_PRICE] * args.ninstruments
+    books = {}
+    for instrument in range(args.ninstruments):
+        books[(instrument, 'b')] = Book(is_bid=True)
+        books[(instrument, 'a')] = Book(is_bid=False)
+
+    ts = 0
+    out = sys.stdout
+
+    def emit(op, instrument, side, key, arg):
+        print(optrace.format_op(optrace.Op(ts, op, instrument, side, key, arg)), file=out)
+
+    for _ in range(args.nevents):
+        ts += 1 + int(rng.expovariate(1 / 1000))
+
+        instrument = rng.randrange(args.ninstruments)
+
+        if rng.random() < args.p_move:
+            mid = mids[instrument] + seq_dist.sample_signed(rng)
+            mids[instrument] = mid
+            # Remove the levels that are now crossed.
+            for side in optrace.SIDES:
+                book = books[(instrument, side)]
+                crossed = [
+                    p for p in book.levels
+                    if (p >= mid if book.is_bid else p <= mid)
+                ]
+                for p in sorted(crossed):
+                    book.levels.remove(p)
+                    emit('e', instrument, side, p, 0)
+
+        side = rng.choice(optrace.SIDES)
+        book = books[(instrument, side)]
+        d = 1 + edge_dist.sample(rng)
+        price = mids[instrument] - d if book.is_bid else mids[instrument] + d
+
+        if price in book.levels:
+            if rng.random() < 0.5:
+                book.levels.remove(price)
+                emit('e', instrument, side, price, 0)
+            else:
+                emit('r', instrument, side, price, rng.randrange(1, 1000))
+        else:
+            book.levels.add(price)
+            emit('i', instrument, side, price, rng.randrange(1, 1000))
+
+        if rng.random() < args.p_find:
+            emit('f', instrument, side, price + rng.randrange(-3, 4), 0)
+
+        if rng.random() < args.p_iter:
+            emit('t', instrument, side, 0, args.iter_n)
+
+
+def cmd_amplify(args):
+    ops = optrace.read_text_trace(sys.stdin)
+    res = []
+    for op in ops:
+        if op.op == 'f' and args.drop_finds:
+            continue
+        if op.op == 't':
+            res.extend([op] * args.factor)
+        else:
+            res.append(op)
+    optrace.write_text_trace(sys.stdout, res)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--seq-histogram', default=os.path.join(PAPER_DIR, 'moex-seq.txt'))
+    ap.add_argument('--edge-histogram', default=os.path.join(PAPER_DIR, 'moex-edge.txt'))
+
+    sub = ap.add_subparsers(dest='cmd', required=True)
+
+    ap_synth = sub.add_parser(
+        'synth',
+        help='generate a sequence of unique prices and a sequence of non-existing ones')
+    ap_synth.add_argument('--nkeys', type=int, default=10000)
+    ap_synth.set_defaults(func=cmd_synth)
+
+    ap_book = sub.add_parser(
+        'book',
+        help='generate a text trace of order book events (stand-in for recorded market data)')
+    ap_book.add_argument('--ninstruments', type=int, default=1)
+    ap_book.add_argument('--nevents', type=int, default=100000)
+    ap_book.add_argument('--p-move', type=float, default=0.02)
+    ap_book.add_argument('--p-find', type=float, default=0.3)
+    ap_book.add_argument('--p-iter', type=float, default=0.1)
+    ap_book.add_argument('--iter-n', type=int, default=25)
+    ap_book.set_defaults(func=cmd_book)
+
+    ap_amplify = sub.add_parser(
+        'amplify',
+        help='amplify iteration operations of a text trace read from stdin')
+    ap_amplify.add_argument('--factor', type=int, default=100)
+    ap_amplify.add_argument('--drop-finds', action='store_true')
+    ap_amplify.set_defaults(func=cmd_amplify)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+// (c) 2025 shdown
+// This code is licensed under MIT license (see LICENSE.MIT for details)
+
+#pragma once
+
+#if __cplusplus
+extern "C" {
+#endif
+
+#include "../common.h"
+
+#if __cplusplus
+}
+#endif
+
+// The defaults below are the configuration used in the paper.
+// Any of them (as well as any optional configuration macro) can be overridden with "-D".
+
+#ifndef GLASS_N
+# define GLASS_N 32
+#endif
+
+#ifndef GLASS_WITH_ASM
+# define GLASS_WITH_ASM 1
+#endif
+
+#ifndef GLASS_SIZE
+# define GLASS_SIZE uint16_t
+#endif
+
+#ifndef GLASS_KEY
+# define GLASS_KEY uint64_t
+#endif
+
+#ifndef GLASS_K
+# define GLASS_K 50
+#endif
+
+#define GLASS_PREFIX glass
+
+// Configuration macros are undefined by glass.h, so save the types we need afterwards.
+typedef GLASS_KEY bench_Key;
+typedef GLASS_SIZE bench_Value;
+
+#include "../glass.h"
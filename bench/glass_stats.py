@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Reads the counters written by "@stats_dump" (GLASS_WITH_COUNTERS), and pretty-prints or diffs them.
+# The last bucket of each channel also counts all the values that are greater than its index.
+
+import argparse
+import sys
+
+
+BAR_WIDTH = 40
+
+
+class Stats:
+    def __init__(self, nbuckets):
+        self.nbuckets = nbuckets
+        self.channels = {}
+
+
+def read_stats(path):
+    res = None
+    with open(path, 'r') as f:
+        for line in f:
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'glass-stats':
+                if res is not None:
+                    raise ValueError(f'{path}: more than one snapshot')
+                if words[1] != '1':
+                    raise ValueError(f'{path}: unsupported version {words[1]}')
+                res = Stats(int(words[2]))
+                continue
+            if res is None:
+                raise ValueError(f'{path}: no "glass-stats" header')
+            counts = [int(w) for w in words[1:]]
+            if len(counts) != res.nbuckets:
+                raise ValueError(f'{path}: channel {words[0]}: expected {res.nbuckets} buckets, got {len(counts)}')
+            res.channels[words[0]] = counts
+    if res is None:
+        raise ValueError(f'{path}: empty file')
+    return res
+
+
+def fmt_bucket(b, nbuckets):
+    return f'{b}+' if b == nbuckets - 1 else str(b)
+
+
+def total(counts):
+    return sum(counts)
+
+
+def mean(counts):
+    n = total(counts)
+    if not n:
+        return 0.0
+    return sum(b * c for b, c in enumerate(counts)) / n
+
+
+def percentile(counts, p):
+    n = total(counts)
+    if not n:
+        return 0
+    acc = 0
+    for b, c in enumerate(counts):
+        acc += c
+        if acc * 100 >= n * p:
+            return b
+    return len(counts) - 1
+
+
+def summary(counts):
+    nb = len(counts)
+    return (
+        f'n={total(counts)} mean={mean(counts):.3f} '
+        f'p50={fmt_bucket(percentile(counts, 50), nb)} p99={fmt_bucket(percentile(counts, 99), nb)}')
+
+
+def cmd_show(args):
+    s = read_stats(args.file)
+    for name, counts in s.channels.items():
+        if not total(counts) and not args.all:
+            continue
+        print(f'{name}: {summary(counts)}')
+        top = max(counts)
+        n = total(counts)
+        for b, c in enumerate(counts):
+            if not c:
+                continue
+            bar = '#' * max(1, round(c * BAR_WIDTH / top))
+            print(f'  {fmt_bucket(b, s.nbuckets):>4} {c:>12} {100 * c / n:6.2f}% {bar}')
+
+
+def cmd_diff(args):
+    a = read_stats(args.old)
+    b = read_stats(args.new)
+    if a.nbuckets != b.nbuckets:
+        raise ValueError(f'different number of buckets: {a.nbuckets} vs {b.nbuckets}')
+    names = list(a.channels) + [name for name in b.channels if name not in a.channels]
+    for name in names:
+        ca = a.channels.get(name, [0] * a.nbuckets)
+        cb = b.channels.get(name, [0] * b.nbuckets)
+        if ca == cb and not args.all:
+            continue
+        print(f'{name}:')
+        print(f'  old: {summary(ca)}')
+        print(f'  new: {summary(cb)}')
+        na = total(ca)
+        nb = total(cb)
+        for q in range(a.nbuckets):
+            if not ca[q] and not cb[q]:
+                continue
+            sa = 100 * ca[q] / na if na else 0.0
+            sb = 100 * cb[q] / nb if nb else 0.0
+            print(f'  {fmt_bucket(q, a.nbuckets):>4} {ca[q]:>12} -> {cb[q]:>12}  {sa:6.2f}% -> {sb:6.2f}% ({sb - sa:+.2f})')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Pretty-print or diff the output of @stats_dump.')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+
+    ap_show = sub.add_parser('show', help='print the histograms of a snapshot')
+    ap_show.add_argument('file')
+    ap_show.add_argument('--all', action='store_true', help='also print channels without events')
+    ap_show.set_defaults(func=cmd_show)
+
+    ap_diff = sub.add_parser('diff', help='compare two snapshots channel by channel')
+    ap_diff.add_argument('old')
+    ap_diff.add_argument('new')
+    ap_diff.add_argument('--all', action='store_true', help='also print channels that did not change')
+    ap_diff.set_defaults(func=cmd_diff)
+
+    args = ap.parse_args()
+    try:
+        args.func(args)
+    except ValueError as e:
+        print(f'glass_stats.py: {e}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
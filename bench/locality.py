@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Measures the locality of a trace (text, see "optrace.py", or binary, see "bintrace.h"), reading it in chunks,
+# so that memory usage does not depend on the length of the trace.
+#
+# Writes the histograms in the format of "paper/moex-seq.txt" and "paper/moex-edge.txt" (which "gen_data.py" can
+# take back as "--seq-histogram" and "--edge-histogram"):
+#  * sequential locality: |price - price of the previous event of the same book|;
+#  * edge locality: |price - best price of the book before the event| (events on an empty book are skipped).
+# Iterations ("t") have no price and are not counted.
+#
+# For every GLASS_N given, also prints the distribution of the number of leading chunks that the key of an event
+# shares with the key of the previous event of the same book. This is what @_from_cache returns if every operation
+# leaves the cached path at its key; since erasures may truncate the cached path, it is an upper bound.
+
+import argparse
+import heapq
+import os
+import sys
+
+import numpy as np
+
+import optrace
+
+
+BIN_DTYPE = np.dtype([
+    ('ts', '<u8'),
+    ('key', '<u8'),
+    ('arg', '<u4'),
+    ('op', 'u1'),
+    ('side', 'u1'),
+    ('instrument', '<u2'),
+])
+assert BIN_DTYPE.itemsize == optrace.BIN_RECORD.size
+
+
+class Chunk:
+    def __init__(self, op, book, key):
+        self.op = op      # uint8 array of op characters
+        self.book = book  # int64 array of 2 * instrument + (side == 'a')
+        self.key = key    # uint64 array
+
+
+def book_name(book):
+    return f'{book >> 1}{"ab"[(book & 1) ^ 1]}'
+
+
+def read_bin_chunks(path, chunk_size):
+    with open(path, 'rb') as f:
+        header = f.read(optrace.BIN_HEADER.size)
+    magic, record_size, _, nrecords, _ = optrace.BIN_HEADER.unpack(header)
+    if magic != optrace.BIN_MAGIC or record_size != BIN_DTYPE.itemsize:
+        raise ValueError(f'{path}: not a binary trace')
+    records = np.memmap(path, dtype=BIN_DTYPE, mode='r', offset=optrace.BIN_HEADER.size, shape=(nrecords,))
+    for lo in range(0, nrecords, chunk_size):
+        r = records[lo:lo + chunk_size]
+        book = r['instrument'].astype(np.int64) * 2 + (r['side'] == ord('a'))
+        yield Chunk(np.array(r['op']), book, np.array(r['key']))
+
+
+def read_text_chunks(path, chunk_size):
+    def flush(ops, books, keys):
+        return Chunk(
+            np.frombuffer(bytes(ops), dtype=np.uint8),
+            np.array(books, dtype=np.int64),
+            np.array(keys, dtype=np.uint64))
+
+    ops, books, keys = bytearray(), [], []
+    with open(path, 'r') as f:
+        for op in optrace.read_text_trace(f):
+            ops.append(ord(op.op))
+            books.append(op.instrument * 2 + (op.side == 'a'))
+            keys.append(op.key)
+            if len(keys) == chunk_size:
+                yield flush(ops, books, keys)
+                ops, books, keys = bytearray(), [], []
+    if keys:
+        yield flush(ops, books, keys)
+
+
+def read_chunks(path, chunk_size):
+    with open(path, 'rb') as f:
+        is_bin = f.read(len(optrace.BIN_MAGIC)) == optrace.BIN_MAGIC
+    return read_bin_chunks(path, chunk_size) if is_bin else read_text_chunks(path, chunk_size)
+
+
+# Live keys of a book, with the best one; a heap with lazy deletion. Erased keys stay in the heap until they reach
+# its top, so it is rebuilt from the live keys whenever it gets more than twice as big: its size then depends on the
+# number of live keys rather than on the length of the trace.
+class BookState:
+    def __init__(self, is_bid):
+        self.sign = -1 if is_bid else 1
+        self.heap = []
+        self.live = set()
+
+    def best(self):
+        while self.heap and self.sign * self.heap[0] not in self.live:
+            heapq.heappop(self.heap)
+        return self.sign * self.heap[0] if self.heap else None
+
+    def insert(self, key):
+        if key not in self.live:
+            self.live.add(key)
+            heapq.heappush(self.heap, self.sign * key)
+            if len(self.heap) > 2 * len(self.live):
+                self.heap = [self.sign * k for k in self.live]
+                heapq.heapify(self.heap)
+
+    def erase(self, key):
+        self.live.discard(key)
+
+
+# Number of leading equal chunks of 'a' and 'b' (arrays), as in @_bitter_common_chunks.
+def common_chunks(a, b, n, k):
+    c = n.bit_length() - 1
+    nchunks = k // c + (1 if k % c else 0)
+    x = a ^ b
+    # Position of the highest differing bit, plus one (zero if equal).
+    hi = np.zeros(x.shape, dtype=np.int64)
+    for shift in [32, 16, 8, 4, 2, 1]:
+        m = (x >> np.uint64(shift)) != 0
+        hi += np.where(m, shift, 0)
+        x = np.where(m, x >> np.uint64(shift), x)
+    hi += (x != 0)
+    return np.where(hi == 0, nchunks, nchunks - 1 - (hi - 1) // c), nchunks
+
+
+class Analyzer:
+    def __init__(self, max_diff, ns, k, per_book):
+        self.max_diff = max_diff
+        self.ns = ns
+        self.k = k
+        self.per_book = per_book
+        self.last_key = {}
+        self.states = {}
+        # book (or None for all books) -> histogram
+        self.seq = {None: np.zeros(max_diff, dtype=np.int64)}
+        self.edge = {None: np.zeros(max_diff, dtype=np.int64)}
+        self.depths = {n: np.zeros(65, dtype=np.int64) for n in ns}
+        self.nevents = 0
+        self.niters = 0
+
+    def add_hist(self, hists, book, diffs):
+        diffs = diffs[diffs < self.max_diff].astype(np.int64)
+        h = np.bincount(diffs, minlength=self.max_diff)
+        hists[None] += h
+        if self.per_book:
+            hists.setdefault(book, np.zeros(self.max_diff, dtype=np.int64))
+            hists[book] += h
+
+    def feed(self, chunk):
+        is_iter = chunk.op == ord('t')
+        self.niters += int(is_iter.sum())
+        op = chunk.op[~is_iter]
+        book = chunk.book[~is_iter]
+        key = chunk.key[~is_iter]
+        self.nevents += len(key)
+        if (key >> np.uint64(self.k)).any():
+            raise ValueError(f'a key does not fit into GLASS_K={self.k} bits')
+
+        order = np.argsort(book, kind='stable')
+        book_sorted = book[order]
+        bounds = np.flatnonzero(np.diff(book_sorted)) + 1
+        for idx in np.split(order, bounds):
+            if not len(idx):
+                continue
+            b = int(book[idx[0]])
+            self.feed_book(b, op[idx], key[idx])
+
+    def feed_book(self, b, op, key):
+        # Sequential locality and cache depths: vectorized, with the last key carried over from the previous chunk.
+        prev_key = self.last_key.get(b)
+        if prev_key is None:
+            prev = key[:-1]
+            cur = key[1:]
+        else:
+            prev = np.concatenate([np.array([prev_key], dtype=np.uint64), key[:-1]])
+            cur = key
+        self.last_key[b] = int(key[-1])
+        if len(cur):
+            diff = np.where(cur > prev, cur - prev, prev - cur)
+            self.add_hist(self.seq, b, diff)
+            for n in self.ns:
+                d, _ = common_chunks(prev, cur, n, self.k)
+                self.depths[n] += np.bincount(d, minlength=65)
+
+        # Edge locality: the best price only changes on insertions and erasures, which have to be applied in order.
+        state = self.states.get(b)
+        if state is None:
+            state = self.states[b] = BookState(is_bid=not (b & 1))
+        best = np.zeros(len(key), dtype=np.uint64)
+        has_best = np.zeros(len(key), dtype=bool)
+        ins, era = ord('i'), ord('e')
+        cur_best = state.best()
+        for i, (o, kk) in enumerate(zip(op.tolist(), key.tolist())):
+            if cur_best is not None:
+                best[i] = cur_best
+                has_best[i] = True
+            if o == ins:
+                state.insert(kk)
+                if cur_best is None or (kk > cur_best if state.sign < 0 else kk < cur_best):
+                    cur_best = kk
+            elif o == era:
+                state.erase(kk)
+                if kk == cur_best:
+                    cur_best = state.best()
+        k = key[has_best]
+        bb = best[has_best]
+        self.add_hist(self.edge, b, np.where(k > bb, k - bb, bb - k))
+
+
+def write_hist(path, h):
+    with open(path, 'w') as f:
+        for diff, count in enumerate(h.tolist()):
+            print(diff, count, file=f)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Measure sequential and edge locality of a trace.')
+    ap.add_argument('trace', help='text or binary trace')
+    ap.add_argument('--out-prefix', default='locality', help='write <prefix>-seq.txt and <prefix>-edge.txt')
+    ap.add_argument('--per-book', action='store_true', help='also write <prefix>-<instrument><side>-{seq,edge}.txt')
+    ap.add_argument('--max-diff', type=int, default=100, help='number of histogram entries')
+    ap.add_argument('--n', type=lambda s: [int(w) for w in s.split(',')], default=[16, 32, 64],
+                    help='GLASS_N values to estimate the cache depths for')
+    ap.add_argument('--k', type=int, default=50, help='GLASS_K')
+    ap.add_argument('--chunk-size', type=int, default=1 << 20)
+    args = ap.parse_args()
+
+    an = Analyzer(args.max_diff, args.n, args.k, args.per_book)
+    try:
+        for chunk in read_chunks(args.trace, args.chunk_size):
+            an.feed(chunk)
+    except ValueError as e:
+        print(f'locality.py: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    out_dir = os.path.dirname(args.out_prefix)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    for book, h in an.seq.items():
+        name = '' if book is None else '-' + book_name(book)
+        write_hist(f'{args.out_prefix}{name}-seq.txt', h)
+    for book, h in an.edge.items():
+        name = '' if book is None else '-' + book_name(book)
+        write_hist(f'{args.out_prefix}{name}-edge.txt', h)
+
+    nseq = int(an.seq[None].sum())
+    nedge = int(an.edge[None].sum())
+    print(f'events: {an.nevents} (+ {an.niters} iterations), books: {len(an.last_key)}')
+    if nseq:
+        print(f'same price as the previous event: {100 * an.seq[None][0] / nseq:.2f}%')
+    if nedge:
+        print(f'at the best price: {100 * an.edge[None][0] / nedge:.2f}%')
+    for n in args.n:
+        h = an.depths[n]
+        total = h.sum()
+        if not total:
+            continue
+        _, nchunks = common_chunks(np.zeros(1, dtype=np.uint64), np.zeros(1, dtype=np.uint64), n, args.k)
+        mean = (h * np.arange(len(h))).sum() / total
+        dist = ' '.join(f'{d}:{100 * h[d] / total:.1f}%' for d in range(nchunks + 1) if h[d])
+        print(f'N={n}: cache depth (out of {nchunks}) mean={mean:.2f}  {dist}')
+
+
+if __name__ == '__main__':
+    main()
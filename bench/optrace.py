@@ -0,0 +1,118 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Text operation trace format.
+#
+# One operation per line, six whitespace-separated fields:
+#
+#   <timestamp> <op> <instrument> <side> <key> <arg>
+#
+# where:
+#  * <timestamp> is an integer (nanoseconds; may be zero if unknown);
+#  * <op> is one of:
+#     - "i": insert <key> with value <arg>;
+#     - "e": erase <key>;
+#     - "f": find <key>;
+#     - "r": replace the value of <key> with <arg>;
+#     - "t": iterate over <arg> best prices (<key> is ignored and should be 0);
+#  * <instrument> is a non-negative integer;
+#  * <side> is either "b" (bid: best price is the maximal one) or "a" (ask: best price is the minimal one);
+#  * <key> is a price (a non-negative integer);
+#  * <arg> is a non-negative integer (0 if not used by <op>).
+#
+# Empty lines and lines starting with "#" are ignored.
+#
+# The binary format (see "bintrace.h") holds the same fields in fixed-size records.
+
+import struct
+
+
+OPS = 'iefrt'
+SIDES = 'ba'
+
+BIN_MAGIC = b'GLTRACE1'
+BIN_HEADER = struct.Struct('<8sIIQQ')
+BIN_RECORD = struct.Struct('<QQIBBH')
+
+
+class Op:
+    __slots__ = ('ts', 'op', 'instrument', 'side', 'key', 'arg')
+
+    def __init__(self, ts, op, instrument, side, key, arg):
+        self.ts = ts
+        self.op = op
+        self.instrument = instrument
+        self.side = side
+        self.key = key
+        self.arg = arg
+
+    def book(self):
+        return self.instrument, self.side
+
+
+def parse_op(line):
+    words = line.split()
+    if len(words) != 6:
+        raise ValueError(f'expected 6 fields, got {len(words)}: {line!r}')
+    ts, op, instrument, side, key, arg = words
+    if op not in OPS:
+        raise ValueError(f'unknown operation "{op}"')
+    if side not in SIDES:
+        raise ValueError(f'unknown side "{side}"')
+    return Op(int(ts), op, int(instrument), side, int(key), int(arg))
+
+
+def format_op(op):
+    return f'{op.ts} {op.op} {op.instrument} {op.side} {op.key} {op.arg}'
+
+
+def read_text_trace(f):
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield parse_op(line)
+
+
+def write_text_trace(f, ops):
+    for op in ops:
+        print(format_op(op), file=f)
+
+
+def write_bin_trace(f, ops):
+    f.write(BIN_HEADER.pack(BIN_MAGIC, BIN_RECORD.size, 0, 0, 0))
+    nrecords = 0
+    ninstruments = 0
+    buf = []
+    for op in ops:
+        if not (0 <= op.instrument < (1 << 16)):
+            raise ValueError(f'instrument {op.instrument} does not fit into the binary format')
+        buf.append(BIN_RECORD.pack(op.ts, op.key, op.arg, ord(op.op), ord(op.side), op.instrument))
+        if len(buf) >= 4096:
+            f.write(b''.join(buf))
+            buf = []
+        nrecords += 1
+        ninstruments = max(ninstruments, op.instrument + 1)
+    f.write(b''.join(buf))
+    f.seek(0)
+    f.write(BIN_HEADER.pack(BIN_MAGIC, BIN_RECORD.size, ninstruments, nrecords, 0))
+
+
+def read_bin_trace(f):
+    data = f.read()
+    if len(data) < BIN_HEADER.size:
+        raise ValueError('not a binary trace: too short')
+    magic, record_size, _, nrecords, _ = BIN_HEADER.unpack_from(data)
+    if magic != BIN_MAGIC or record_size != BIN_RECORD.size:
+        raise ValueError('not a binary trace: bad header')
+    body = memoryview(data)[BIN_HEADER.size:]
+    if len(body) != nrecords * BIN_RECORD.size:
+        raise ValueError('binary trace is truncated')
+    for ts, key, arg, op, side, instrument in BIN_RECORD.iter_unpack(body):
+        op = chr(op)
+        side = chr(side)
+        if op not in OPS:
+            raise ValueError(f'unknown operation "{op}"')
+        if side not in SIDES:
+            raise ValueError(f'unknown side "{side}"')
+        yield Op(ts, op, instrument, side, key, arg)
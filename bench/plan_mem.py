@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Memory planner: how many nodes and bytes a glass instance (or a fleet of them) takes with a given configuration,
+# both in the worst case for a given number of elements and for the books of a text trace (see "optrace.py").
+# Generalizes "paper/calc_mem_and_maxcap.py".
+#
+# The structure sizes are derived the same way the C compiler lays out the structures on x86-64 (LP64).
+
+import argparse
+import itertools
+import sys
+
+import optrace
+
+
+# Unsigned integer type -> its width in bytes.
+UINT_TYPES = {
+    'uint8_t': 1,
+    'uint16_t': 2,
+    'uint32_t': 4,
+    'uint64_t': 8,
+}
+
+SIZEOF_POINTER = 8
+SIZEOF_SIZE_T = 8
+SIZEOF_INT = 4
+
+
+class Config:
+    def __init__(
+            self,
+            n=32,
+            size='uint16_t',
+            key='uint64_t',
+            k=50,
+            with_ssize=False,
+            with_cache=True,
+            cache_ways=1,
+            with_first_last_ptrs=True,
+            with_ht=True,
+            with_ht_prev_ptr=True,
+            with_ht_open=False,
+            with_arena=False,
+            with_snapshot=False,
+            with_counters=False,
+            counters_nbuckets=16,
+            with_counts=False,
+            count='uint32_t',
+            with_auto_shrink=False,
+            with_seqlock=False):
+        if n < 2 or n & (n - 1):
+            raise ValueError(f'GLASS_N must be a power of two >= 2, got {n}')
+        if k > UINT_TYPES[key] * 8:
+            raise ValueError(f'GLASS_K={k} does not fit into {key}')
+        if cache_ways < 1:
+            raise ValueError(f'GLASS_CACHE_WAYS must be positive, got {cache_ways}')
+        self.n = n
+        self.size = size
+        self.key = key
+        self.k = k
+        self.with_ssize = with_ssize
+        self.with_cache = with_cache
+        self.cache_ways = cache_ways
+        self.with_first_last_ptrs = with_first_last_ptrs
+        self.with_ht = with_ht
+        self.with_ht_prev_ptr = with_ht_prev_ptr
+        self.with_ht_open = with_ht_open
+        self.with_arena = with_arena
+        self.with_snapshot = with_snapshot
+        self.with_counters = with_counters
+        self.counters_nbuckets = counters_nbuckets
+        self.with_counts = with_counts
+        self.count = count
+        self.with_auto_shrink = with_auto_shrink
+        self.with_seqlock = with_seqlock
+
+    @property
+    def c(self):
+        return self.n.bit_length() - 1
+
+    @property
+    def nchunks(self):
+        return self.k // self.c + (1 if self.k % self.c else 0)
+
+    @property
+    def odd_chunk_width(self):
+        return self.k % self.c or self.c
+
+    @property
+    def sizeof_size(self):
+        return UINT_TYPES[self.size]
+
+    @property
+    def sizeof_key(self):
+        return UINT_TYPES[self.key]
+
+    # Mirrors GLASS__MAX_CAPACITY.
+    @property
+    def max_capacity(self):
+        bits = self.sizeof_size * 8
+        if self.with_ssize:
+            return 1 << (bits - 1)
+        return (1 << bits) - 2
+
+
+# Size and alignment of a structure with the given (size, alignment) fields.
+def layout(fields):
+    offset = 0
+    align = 1
+    for sz, al in fields:
+        offset = (offset + al - 1) // al * al + sz
+        align = max(align, al)
+    return (offset + align - 1) // align * align, align
+
+
+def field(sz):
+    return sz, sz
+
+
+def sizeof_mask(n):
+    for bits in [8, 16, 32, 64, 128]:
+        if n <= bits:
+            return bits // 8
+    raise ValueError(f'GLASS_N={n} is not supported by the planner')
+
+
+# @_Node
+def node_layout(cfg):
+    s = cfg.sizeof_size
+    fields = [
+        field(sizeof_mask(cfg.n)),  # mask
+        (s * cfg.n, s),             # children
+        field(s),                   # parent
+    ]
+    if cfg.with_counts:
+        c = UINT_TYPES[cfg.count]
+        fields.append((c * cfg.n, c))  # counts
+    if cfg.with_ht and not cfg.with_ht_open:
+        fields.append(field(s))     # ht_next_i
+        if cfg.with_ht_prev_ptr:
+            fields.append(field(s))  # ht_prev_i
+        fields.append(field(cfg.sizeof_key))  # ht_k
+    return layout(fields)
+
+
+def sizeof_node(cfg):
+    return node_layout(cfg)[0]
+
+
+# @Glass
+def sizeof_glass(cfg):
+    s = cfg.sizeof_size
+    fields = [
+        field(SIZEOF_POINTER),  # nodes
+        field(s),               # root
+        field(SIZEOF_SIZE_T),   # nodes_capacity
+        field(SIZEOF_SIZE_T),   # size
+        field(s),               # first_free_node
+    ]
+    if cfg.with_cache:
+        # 'cache', then the other 'cache_ways'.
+        cache = layout([(s * cfg.nchunks, s), field(cfg.sizeof_key), field(SIZEOF_INT)])
+        fields += [cache] * cfg.cache_ways
+    if cfg.with_first_last_ptrs:
+        it = layout([field(s), field(cfg.sizeof_key)])
+        fields += [it, it]
+    if cfg.with_ht and cfg.with_ht_open:
+        fields.append(layout([field(SIZEOF_SIZE_T), field(SIZEOF_SIZE_T), field(SIZEOF_POINTER)]))
+    elif cfg.with_ht:
+        fields.append(layout([field(s), field(SIZEOF_POINTER)]))
+    if cfg.with_arena:
+        fields.append(field(SIZEOF_POINTER))
+    if cfg.with_snapshot:
+        fields += [field(SIZEOF_POINTER), field(SIZEOF_SIZE_T)]
+    if cfg.with_counters:
+        nchannels = 11
+        fields.append((8 * nchannels * cfg.counters_nbuckets, 8))
+    if cfg.with_auto_shrink:
+        fields += [field(SIZEOF_SIZE_T), field(SIZEOF_INT)]  # nnodes_used, latency_critical
+    if cfg.with_seqlock:
+        fields += [field(8), field(SIZEOF_POINTER), field(SIZEOF_SIZE_T), field(SIZEOF_SIZE_T)]
+    return layout(fields)[0]
+
+
+# The maximum number of leaves that 'sz' elements can take.
+def size_to_max_leaves(cfg, sz):
+    if not sz:
+        return 0
+    if cfg.nchunks == 1:
+        return 1
+    cur = min(1 << cfg.odd_chunk_width, sz)
+    for _ in range(2, cfg.nchunks):
+        cur = min(cur << cfg.c, sz)
+    return cur
+
+
+# Mirrors @size_to_max_capacity: the maximum number of nodes that 'sz' elements can take.
+def size_to_max_capacity(cfg, sz):
+    if not sz:
+        return 0
+    cur = min(1 << cfg.odd_chunk_width, sz)
+    res = 1 + cur
+    for _ in range(2, cfg.nchunks):
+        if cur < sz:
+            cur = min(cur << cfg.c, sz)
+        res += cur
+    return res
+
+
+# The capacity of the nodes vector once it has had to hold 'nnodes' nodes (the vector is doubled starting from
+# 'prealloc', or from 1, and never shrinks by itself). None if it does not fit at all.
+def vector_capacity(cfg, nnodes, prealloc=0):
+    if nnodes > cfg.max_capacity:
+        return None
+    c = prealloc
+    while c < nnodes:
+        c = min(c * 2 if c else 1, cfg.max_capacity)
+    return c
+
+
+# Mirrors @_ht_policy_n_from_capacity: the number of hash table buckets for the given capacity.
+def ht_buckets(cfg, capacity):
+    if not capacity:
+        return 1
+    nbits = min(capacity.bit_length() - 1, max(cfg.sizeof_size * 8, SIZEOF_SIZE_T * 8 - 1))
+    return 1 << nbits
+
+
+# The number of slots of the open hash table (GLASS_WITH_HT_OPEN) once it has had to hold 'nleaves' leaves: it is
+# doubled to stay at most half full.
+def ht_open_slots(cfg, nleaves, prealloc=0):
+    n = ht_buckets(cfg, prealloc)
+    while n < 2 * nleaves:
+        n *= 2
+    return n
+
+
+# Total number of bytes taken by an instance whose nodes vector has the given capacity. With GLASS_WITH_HT_OPEN,
+# the table depends on the number of leaves instead; if it is not given, it is bounded by the capacity.
+def instance_bytes(cfg, capacity, nleaves=None, prealloc=0):
+    res = sizeof_glass(cfg) + capacity * sizeof_node(cfg)
+    if cfg.with_ht and cfg.with_ht_open:
+        slot = layout([field(cfg.sizeof_key), field(cfg.sizeof_size)])[0]
+        res += ht_open_slots(cfg, capacity if nleaves is None else nleaves, prealloc) * slot
+    elif cfg.with_ht:
+        res += ht_buckets(cfg, capacity) * cfg.sizeof_size
+    return res
+
+
+# Tracks the number of nodes that a set of keys takes: one node per distinct key prefix at each depth.
+class NodeCounter:
+    def __init__(self, cfg):
+        self.shifts = [(cfg.nchunks - d) * cfg.c for d in range(cfg.nchunks)]
+        self.refs = [{} for _ in self.shifts]
+        self.keys = set()
+        self.nnodes = 0
+
+    @property
+    def nleaves(self):
+        return len(self.refs[-1])
+
+    def insert(self, key):
+        if key in self.keys:
+            return
+        self.keys.add(key)
+        for refs, shift in zip(self.refs, self.shifts):
+            p = key >> shift
+            r = refs.get(p, 0)
+            if not r:
+                self.nnodes += 1
+            refs[p] = r + 1
+
+    def erase(self, key):
+        if key not in self.keys:
+            return
+        self.keys.remove(key)
+        for refs, shift in zip(self.refs, self.shifts):
+            p = key >> shift
+            r = refs[p] - 1
+            if not r:
+                del refs[p]
+                self.nnodes -= 1
+            else:
+                refs[p] = r
+
+
+class BookPeak:
+    def __init__(self):
+        self.size = 0
+        self.nnodes = 0
+        self.nleaves = 0
+        self.max_value = 0
+
+
+# Replays the trace; returns {book: BookPeak}.
+def trace_peaks(cfg, ops):
+    counters = {}
+    peaks = {}
+    for op in ops:
+        if op.op not in 'ier':
+            continue
+        if op.key >> cfg.k:
+            raise ValueError(f'key {op.key} does not fit into GLASS_K={cfg.k} bits')
+        book = op.book()
+        counter = counters.get(book)
+        if counter is None:
+            counter = counters[book] = NodeCounter(cfg)
+            peaks[book] = BookPeak()
+        peak = peaks[book]
+        if op.op == 'i':
+            counter.insert(op.key)
+            peak.size = max(peak.size, len(counter.keys))
+            peak.nnodes = max(peak.nnodes, counter.nnodes)
+            peak.nleaves = max(peak.nleaves, counter.nleaves)
+        elif op.op == 'e':
+            counter.erase(op.key)
+        if op.op != 'e':
+            peak.max_value = max(peak.max_value, op.arg)
+    return peaks
+
+
+# Values are stored as GLASS_SIZE too, so the type must also hold 'max_value'.
+def smallest_fitting_size(cfg, nnodes, max_value=0):
+    for size, nbytes in UINT_TYPES.items():
+        c = Config(**{**vars(cfg), 'size': size})
+        if nnodes <= c.max_capacity and max_value >> (nbytes * 8) == 0:
+            return size
+    return None
+
+
+def fmt_nbytes(x):
+    suffixes = 'bKMG'
+    for i, suffix in enumerate(suffixes):
+        is_last = i == len(suffixes) - 1
+        if x < 1024 or is_last:
+            return f'{x:.2f}{suffix}'
+        x /= 1024
+
+
+def parse_list(conv):
+    def parse(s):
+        return [conv(w) for w in s.split(',')]
+    return parse
+
+
+def parse_bool(s):
+    if s not in ('0', '1'):
+        raise argparse.ArgumentTypeError(f'expected 0 or 1, got {s!r}')
+    return s == '1'
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Plan the memory taken by glass instances.')
+    ap.add_argument('--n', type=parse_list(int), default=[16, 32, 64], help='GLASS_N values to consider')
+    ap.add_argument('--size', type=parse_list(str), default=['uint16_t', 'uint32_t'], help='GLASS_SIZE types')
+    ap.add_argument('--key', default='uint64_t')
+    ap.add_argument('--k', type=int, default=50)
+    ap.add_argument('--ssize', type=parse_bool, default=False)
+    ap.add_argument('--cache', type=parse_bool, default=True)
+    ap.add_argument('--cache-ways', type=int, default=1, help='GLASS_CACHE_WAYS')
+    ap.add_argument('--first-last-ptrs', type=parse_bool, default=True)
+    ap.add_argument('--ht', type=parse_bool, default=True)
+    ap.add_argument('--ht-prev-ptr', type=parse_bool, default=True)
+    ap.add_argument('--ht-open', type=parse_bool, default=False)
+    ap.add_argument('--counts', type=parse_bool, default=False)
+    ap.add_argument('--count', default='uint32_t', help='GLASS_COUNT type')
+    ap.add_argument('--arena', type=parse_bool, default=False)
+    ap.add_argument('--snapshot', type=parse_bool, default=False)
+    ap.add_argument('--counters', type=parse_bool, default=False)
+    ap.add_argument('--counters-nbuckets', type=int, default=16, help='GLASS_COUNTERS_NBUCKETS')
+    ap.add_argument('--auto-shrink', type=parse_bool, default=False)
+    ap.add_argument('--seqlock', type=parse_bool, default=False)
+    ap.add_argument('--prealloc', type=int, default=0, help='"prealloc" argument of @create')
+    ap.add_argument('--elems', type=int, default=None, help='plan for the worst case of this many elements per book')
+    ap.add_argument('--trace', default=None, help='plan for the books of this text trace')
+    ap.add_argument('--books', type=int, default=None, help='number of books in the fleet')
+    ap.add_argument(
+        '--max-value', type=int, default=0,
+        help='max value to be stored with --elems (values are GLASS_SIZE too); taken from the trace otherwise')
+    args = ap.parse_args()
+
+    if args.elems is None and args.trace is None:
+        ap.error('either --elems or --trace is required')
+
+    ops = None
+    if args.trace is not None:
+        with open(args.trace, 'r') as f:
+            ops = list(optrace.read_text_trace(f))
+
+    for size in args.size:
+        if size not in UINT_TYPES:
+            ap.error(f'unknown GLASS_SIZE type {size!r}')
+    if args.count not in UINT_TYPES:
+        ap.error(f'unknown GLASS_COUNT type {args.count!r}')
+
+    print(f'{"N":>3} {"SIZE":>8} {"node":>5} {"glass":>5}  {"case":<10} {"elems":>8} {"nodes":>9} '
+          f'{"capacity":>9} {"per book":>10} {"fleet":>10}  smallest SIZE')
+    for n, size in itertools.product(args.n, args.size):
+        try:
+            cfg = Config(
+                n=n, size=size, key=args.key, k=args.k, with_ssize=args.ssize, with_cache=args.cache,
+                cache_ways=args.cache_ways, with_first_last_ptrs=args.first_last_ptrs, with_ht=args.ht,
+                with_ht_prev_ptr=args.ht_prev_ptr, with_ht_open=args.ht_open, with_arena=args.arena,
+                with_snapshot=args.snapshot, with_counters=args.counters, counters_nbuckets=args.counters_nbuckets,
+                with_counts=args.counts, count=args.count, with_auto_shrink=args.auto_shrink,
+                with_seqlock=args.seqlock)
+        except ValueError as e:
+            print(f'plan_mem.py: {e}', file=sys.stderr)
+            sys.exit(1)
+
+        cases = []
+        if args.elems is not None:
+            nnodes = size_to_max_capacity(cfg, args.elems)
+            nleaves = size_to_max_leaves(cfg, args.elems)
+            cases.append(('worst', args.elems, nnodes, nleaves, args.max_value, [(nnodes, nleaves)] * (args.books or 1)))
+        if ops is not None:
+            peaks = trace_peaks(cfg, ops)
+            if peaks:
+                top = max(peaks.values(), key=lambda p: p.nnodes)
+                per_book = [(p.nnodes, p.nleaves) for p in peaks.values()]
+                if args.books is not None:
+                    # Scale the fleet by repeating the books of the trace.
+                    per_book = [per_book[i % len(per_book)] for i in range(args.books)]
+                max_value = max(p.max_value for p in peaks.values())
+                cases.append(('trace', top.size, top.nnodes, top.nleaves, max_value, per_book))
+
+        for case, elems, nnodes, nleaves, max_value, fleet_nodes in cases:
+            smallest = smallest_fitting_size(cfg, nnodes, max_value) or 'none'
+            capacity = vector_capacity(cfg, nnodes, args.prealloc)
+            if capacity is None:
+                per_book = fleet = capacity = 'N/A'
+            else:
+                per_book = fmt_nbytes(instance_bytes(cfg, capacity, nleaves, args.prealloc))
+                fleet = fmt_nbytes(sum(
+                    instance_bytes(cfg, vector_capacity(cfg, x, args.prealloc), y, args.prealloc)
+                    for x, y in fleet_nodes))
+            print(f'{n:>3} {size:>8} {sizeof_node(cfg):>5} {sizeof_glass(cfg):>5}  {case:<10} {elems:>8} '
+                  f'{nnodes:>9} {capacity:>9} {per_book:>10} {fleet:>10}  {smallest}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT_DIR)
+import ato  # noqa: E402
+
+
+# (output file name, workload, data kind)
+TESTS = [
+    ('br_SYNTH_INSERT.txt', 'INSERT', 'synth'),
+    ('br_SYNTH_ERASE.txt', 'ERASE', 'synth'),
+    ('br_SYNTH_FIND_E.txt', 'FIND_E', 'synth'),
+    ('br_SYNTH_FIND_NE.txt', 'FIND_NE', 'synth'),
+
+    ('br_DATA_all.txt', 'DATA', 'data_all'),
+    ('br_DATA_iter.txt', 'DATA', 'data_iter'),
+]
+
+
+# Total number of iterations, divided by the number of copies (see the "Graphs" section of the paper).
+ITERS_SYNTH = 2500
+ITERS_DATA = 7500
+
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def run(argv, stdout=None, stdin=None, cwd=None):
+    log('+ ' + ' '.join(shlex.quote(arg) for arg in argv))
+    subprocess.run(argv, stdout=stdout, stdin=stdin, cwd=cwd, check=True)
+
+
+def gen_headers():
+    for name in ['glass_prevnext', 'glass']:
+        text = ato.preprocess(os.path.join(ROOT_DIR, name + '.ato'), include_root=ROOT_DIR)
+        if ato.write_if_changed(os.path.join(ROOT_DIR, name + '.h'), text):
+            log(f'generated {name}.h')
+
+
+def build(args, build_dir):
+    exe = os.path.join(build_dir, 'bench')
+    run([
+        args.cxx,
+        *shlex.split(args.cxxflags),
+        '-o', exe,
+        os.path.join(BENCH_DIR, 'bench.cc'),
+        os.path.join(ROOT_DIR, 'common.c'),
+    ])
+    return exe
+
+
+def gen_data(args, build_dir):
+    gen = [sys.executable, os.path.join(BENCH_DIR, 'gen_data.py'), '--seed', str(args.seed)]
+
+    paths = {
+        'synth': os.path.join(build_dir, 'synth.txt'),
+        'data_all': os.path.join(build_dir, 'data_all.txt'),
+        'data_iter': os.path.join(build_dir, 'data_iter.txt'),
+    }
+
+    with open(paths['synth'], 'w') as f:
+        run([*gen, 'synth', '--nkeys', str(args.nkeys)], stdout=f)
+
+    if args.trace is None:
+        with open(paths['data_all'], 'w') as f:
+            run([*gen, 'book', '--nevents', str(args.nevents)], stdout=f)
+    else:
+        paths['data_all'] = args.trace
+
+    with open(paths['data_all'], 'r') as fin, open(paths['data_iter'], 'w') as fout:
+        run([*gen, 'amplify', '--factor', str(args.amplify), '--drop-finds'], stdin=fin, stdout=fout)
+
+    return paths
+
+
+def run_bench(exe, workload, ncopies, niters, data_path):
+    out = subprocess.run(
+        [exe, workload, str(ncopies), str(niters), data_path],
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True)
+    t_glass, t_map, t_slot_map = (int(w) for w in out.stdout.split())
+    return t_glass, t_map, t_slot_map
+
+
+def parse_copies(s):
+    if '..' in s:
+        lo, hi = s.split('..')
+        return list(range(int(lo), int(hi) + 1))
+    return [int(w) for w in s.split(',')]
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description='Build the benchmark and regenerate paper/bench/br_*.txt files.')
+    ap.add_argument('--out-dir', default=os.path.join(ROOT_DIR, 'paper', 'bench'))
+    ap.add_argument('--build-dir', default=os.path.join(BENCH_DIR, 'build'))
+    ap.add_argument('--cxx', default='g++')
+    ap.add_argument('--cxxflags', default='-std=gnu++17 -O3 -march=native -DNDEBUG')
+    ap.add_argument('--copies', type=parse_copies, default=parse_copies('1..32'))
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--nkeys', type=int, default=10000)
+    ap.add_argument('--nevents', type=int, default=100000)
+    ap.add_argument('--amplify', type=int, default=100)
+    ap.add_argument('--trace', default=None, help='text trace to use instead of the generated one')
+    ap.add_argument('--only', action='append', default=None, help='only produce this output file')
+    args = ap.parse_args()
+
+    os.makedirs(args.build_dir, exist_ok=True)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    gen_headers()
+    exe = build(args, args.build_dir)
+    data_paths = gen_data(args, args.build_dir)
+
+    for out_name, workload, data_kind in TESTS:
+        if args.only is not None and out_name not in args.only:
+            continue
+
+        total_iters = ITERS_SYNTH if data_kind == 'synth' else ITERS_DATA
+
+        with open(os.path.join(args.out_dir, out_name), 'w') as f:
+            for ncopies in args.copies:
+                niters = max(1, total_iters // ncopies)
+                t_glass, t_map, t_slot_map = run_bench(exe, workload, ncopies, niters, data_paths[data_kind])
+                line = f'{ncopies} {t_map / t_glass:.5f} {t_slot_map / t_glass:.5f}'
+                log(f'{out_name}: {line}')
+                print(line, file=f, flush=True)
+
+
+if __name__ == '__main__':
+    main()
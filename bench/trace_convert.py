@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Converts operation traces between the text format (see "optrace.py"), CSV, and the binary format (see
+# "bintrace.h").
+#
+# CSV input must have a header row naming (at least) the "ts", "op", "instrument", "side", "key" and "arg" columns;
+# their values are the same as in the text format.
+
+import argparse
+import csv
+import sys
+
+import optrace
+
+
+CSV_FIELDS = ['ts', 'op', 'instrument', 'side', 'key', 'arg']
+
+
+def read_csv_trace(f):
+    reader = csv.DictReader(f)
+    missing = [name for name in CSV_FIELDS if name not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'CSV header lacks columns: {", ".join(missing)}')
+    for row in reader:
+        yield optrace.parse_op(' '.join(row[name].strip() for name in CSV_FIELDS))
+
+
+def detect_format(path):
+    with open(path, 'rb') as f:
+        if f.read(len(optrace.BIN_MAGIC)) == optrace.BIN_MAGIC:
+            return 'bin'
+    return 'csv' if path.endswith('.csv') else 'text'
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Convert operation traces between text, CSV and binary formats.')
+    ap.add_argument('input')
+    ap.add_argument('output')
+    ap.add_argument('--from', dest='from_', choices=['auto', 'text', 'csv', 'bin'], default='auto')
+    ap.add_argument('--to', choices=['text', 'bin'], default='bin')
+    args = ap.parse_args()
+
+    fmt = detect_format(args.input) if args.from_ == 'auto' else args.from_
+
+    try:
+        if fmt == 'bin':
+            fin = open(args.input, 'rb')
+            ops = optrace.read_bin_trace(fin)
+        else:
+            fin = open(args.input, 'r', newline='' if fmt == 'csv' else None)
+            ops = read_csv_trace(fin) if fmt == 'csv' else optrace.read_text_trace(fin)
+
+        with fin:
+            if args.to == 'bin':
+                with open(args.output, 'wb') as fout:
+                    optrace.write_bin_trace(fout, ops)
+            else:
+                with open(args.output, 'w') as fout:
+                    optrace.write_text_trace(fout, ops)
+    except ValueError as e:
+        print(f'trace_convert.py: {e}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
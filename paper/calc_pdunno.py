@@ -3,12 +3,14 @@
 # (c) 2025 shdown
 # This code is licensed under MIT license (see LICENSE.MIT for details)
 
+import argparse
+import math
 import sys
 
 
 J_MIN, J_MAX = 1, 10
-n = 9210
-b = 1 << 15
+N = 9210
+B = 1 << 15
 
 
 def make_power_table(x, size):
@@ -29,38 +31,12 @@ def make_factorials(size):
     return res
 
 
-b_powers = make_power_table(b, n + 2)
-b_minus_one_powers = make_power_table(b - 1, n + 2)
-factorials = make_factorials(n + 2)
-
-
-def choice(n, k):
-    return factorials[n] // factorials[k] // factorials[n - k]
-
-
 class Fraction:
     def __init__(self, num, denom):
         self.num = num
         self.denom = denom
 
 
-def p_bucket(k):
-    res = Fraction(choice(n, k), 1)
-
-    res.num *= b_minus_one_powers[n - k]
-    res.denom *= b_powers[n]
-
-    return res
-
-
-def pq_bucket(k, J):
-    res = p_bucket(k)
-    if k > J:
-        res.num *= J
-        res.denom *= k
-    return res
-
-
 class KahanSummator:
     def __init__(self):
         self.s = 0.0
@@ -79,40 +55,153 @@ class KahanSummator:
 SUMMATOR = KahanSummator
 
 
-def p_dunno_plus(J):
-    summator = SUMMATOR()
-    for k in range(1, n + 1):
-        cur = pq_bucket(k, J)
-        summator.add_summand(cur.num / cur.denom)
-        if not (k & 255):
-            print(f'k={k}', file=sys.stderr)
-
-    res = summator.finalize()
-
-    pz_frac = p_bucket(0)
-    pz = pz_frac.num / pz_frac.denom
-
-    return 1.0 - res / (1.0 - pz)
-
-
-def p_dunno_minus(J):
-    summator = SUMMATOR()
-    for k in range(J + 1, n + 1):
-        cur = p_bucket(k)
-        summator.add_summand(cur.num / cur.denom)
-        if not (k & 255):
-            print(f'k={k}', file=sys.stderr)
-
-    return summator.finalize()
+# Exact big-integer computation of every term (slow).
+class Exact:
+    def __init__(self, n, b):
+        self.n = n
+        self.b_powers = make_power_table(b, n + 2)
+        self.b_minus_one_powers = make_power_table(b - 1, n + 2)
+        self.factorials = make_factorials(n + 2)
+
+    def choice(self, n, k):
+        return self.factorials[n] // self.factorials[k] // self.factorials[n - k]
+
+    def p_bucket(self, k):
+        n = self.n
+        res = Fraction(self.choice(n, k), 1)
+
+        res.num *= self.b_minus_one_powers[n - k]
+        res.denom *= self.b_powers[n]
+
+        return res
+
+    def pq_bucket(self, k, J):
+        res = self.p_bucket(k)
+        if k > J:
+            res.num *= J
+            res.denom *= k
+        return res
+
+    def p_dunno_plus(self, J):
+        summator = SUMMATOR()
+        for k in range(1, self.n + 1):
+            cur = self.pq_bucket(k, J)
+            summator.add_summand(cur.num / cur.denom)
+            if not (k & 255):
+                print(f'k={k}', file=sys.stderr)
+
+        res = summator.finalize()
+
+        pz_frac = self.p_bucket(0)
+        pz = pz_frac.num / pz_frac.denom
+
+        return 1.0 - res / (1.0 - pz)
+
+    def p_dunno_minus(self, J):
+        summator = SUMMATOR()
+        for k in range(J + 1, self.n + 1):
+            cur = self.p_bucket(k)
+            summator.add_summand(cur.num / cur.denom)
+            if not (k & 255):
+                print(f'k={k}', file=sys.stderr)
+
+        return summator.finalize()
+
+    # The same value as p_dunno_plus, summed in the form the fast computation uses (see Fast below), which has no
+    # cancellation; this is what the fast results are checked against.
+    def p_dunno_plus_stable(self, J):
+        summator = SUMMATOR()
+        for k in range(J + 1, self.n + 1):
+            cur = self.p_bucket(k)
+            cur.num *= k - J
+            cur.denom *= k
+            summator.add_summand(cur.num / cur.denom)
+            if not (k & 255):
+                print(f'k={k}', file=sys.stderr)
+
+        pz_frac = self.p_bucket(0)
+        one_minus_pz = (pz_frac.denom - pz_frac.num) / pz_frac.denom
+
+        return summator.finalize() / one_minus_pz
+
+    def compute(self, j_min, j_max, stable=False):
+        p_dunno_plus = self.p_dunno_plus_stable if stable else self.p_dunno_plus
+        return [(J, p_dunno_plus(J), self.p_dunno_minus(J)) for J in range(j_min, j_max + 1)]
+
+
+# Fast computation: all the terms are evaluated in log space as one NumPy array, and every J is computed from its
+# suffix sums.
+#
+# p_dunno_plus is rewritten as sum over k > J of p_bucket(k) * (1 - J/k), divided by (1 - p_bucket(0)), which is
+# equal to the original formula but does not subtract two numbers close to 1. The sum is S(J + 1) - J * T(J + 1),
+# where S and T are the suffix sums of p_bucket(k) and p_bucket(k) / k.
+class Fast:
+    def __init__(self, n, b):
+        import numpy as np
+
+        k = np.arange(n + 1, dtype=np.float64)
+        log_fact = np.array([math.lgamma(i + 1) for i in range(n + 1)])
+        # log(C(n, k) * (b - 1)^(n - k) / b^n)
+        log_p = log_fact[n] - log_fact - log_fact[::-1] + (n - k) * math.log1p(-1 / b) - k * math.log(b)
+        p = np.exp(log_p)
+        # Summed from the tail, so that the small terms are added first; one extra zero at the end for J = n.
+        self.n = n
+        self.suffix_p = np.append(np.cumsum(p[::-1])[::-1], 0.0)
+        self.suffix_p_over_k = np.append(np.cumsum((p[1:] / k[1:])[::-1])[::-1], 0.0)
+        self.one_minus_pz = -math.expm1(n * math.log1p(-1 / b))
+
+    def compute(self, j_min, j_max):
+        res = []
+        for J in range(j_min, j_max + 1):
+            i = min(J + 1, self.n + 1)
+            minus = float(self.suffix_p[i])
+            # suffix_p_over_k starts at k = 1.
+            plus = (minus - J * float(self.suffix_p_over_k[i - 1])) / self.one_minus_pz
+            res.append((J, plus, minus))
+        return res
+
+
+def check(exact, fast, rtol):
+    ok = True
+    for (J, p1, m1), (_, p2, m2) in zip(exact, fast):
+        for what, x, y in [('p', p1, p2), ('m', m1, m2)]:
+            good = abs(x - y) <= rtol * max(abs(x), abs(y))
+            ok = ok and good
+            print(f'{what} {J} exact={x!r} fast={y!r} {"ok" if good else "MISMATCH"}', file=sys.stderr)
+    return ok
 
 
 def main():
-    for J in range(J_MIN, J_MAX + 1):
-        p = p_dunno_plus(J)
-        m = p_dunno_minus(J)
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=N, help='number of elements')
+    ap.add_argument('--b', type=int, default=B, help='number of hash table buckets')
+    ap.add_argument('--j-min', type=int, default=J_MIN)
+    ap.add_argument('--j-max', type=int, default=J_MAX)
+    ap.add_argument('--fast', action='store_true', help='use the fast (NumPy, floating-point) computation')
+    ap.add_argument(
+        '--check', action='store_true',
+        help='compute both ways and compare (exits with 1 on a mismatch); prints the fast results')
+    ap.add_argument('--rtol', type=float, default=1e-9)
+    args = ap.parse_args()
+
+    if args.check:
+        exact = Exact(args.n, args.b).compute(args.j_min, args.j_max, stable=True)
+        res = Fast(args.n, args.b).compute(args.j_min, args.j_max)
+        ok = check(exact, res, args.rtol)
+    elif args.fast:
+        res = Fast(args.n, args.b).compute(args.j_min, args.j_max)
+        ok = True
+    else:
+        res = Exact(args.n, args.b).compute(args.j_min, args.j_max)
+        ok = True
+
+    for J, p, m in res:
         print('p', J, p)
         print('m', J, m)
 
+    if not ok:
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
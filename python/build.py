@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Builds the "glassmap" extension module (see "glassmap.c") for the running Python interpreter.
+#
+# The configuration is the one in "glass_def.h", with any macro overridden by "--define"; e.g.
+#
+#   ./build.py --define GLASS_N=64 --define GLASS_WITH_COUNTS=1
+#
+# The module is written to "--out-dir" (this directory by default), so that "import glassmap" works from there.
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import sysconfig
+
+import numpy
+
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(PYTHON_DIR)
+
+sys.path.insert(0, ROOT_DIR)
+import ato  # noqa: E402
+
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def run(argv, stdout=None, cwd=None):
+    log('+ ' + ' '.join(shlex.quote(arg) for arg in argv))
+    subprocess.run(argv, stdout=stdout, cwd=cwd, check=True)
+
+
+def gen_headers():
+    for name in ['glass_prevnext', 'glass']:
+        text = ato.preprocess(os.path.join(ROOT_DIR, name + '.ato'), include_root=ROOT_DIR)
+        if ato.write_if_changed(os.path.join(ROOT_DIR, name + '.h'), text):
+            log(f'generated {name}.h')
+
+
+def parse_define(s):
+    name, sep, value = s.partition('=')
+    if not name:
+        raise argparse.ArgumentTypeError(f'expected NAME[=VALUE], got {s!r}')
+    return f'-D{name}={value}' if sep else f'-D{name}'
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Build the glassmap extension module.')
+    ap.add_argument('--cc', default=sysconfig.get_config_var('CC') or 'cc')
+    ap.add_argument('--cflags', default='-std=gnu11 -O3 -march=native -DNDEBUG')
+    ap.add_argument(
+        '--define', '-D', type=parse_define, action='append', default=[],
+        help='NAME[=VALUE]: a configuration macro to pass to the compiler')
+    ap.add_argument('--out-dir', default=PYTHON_DIR)
+    args = ap.parse_args()
+
+    gen_headers()
+
+    out = os.path.join(args.out_dir, 'glassmap' + sysconfig.get_config_var('EXT_SUFFIX'))
+    os.makedirs(args.out_dir, exist_ok=True)
+    run([
+        *shlex.split(args.cc),
+        *shlex.split(args.cflags),
+        '-shared', '-fPIC', '-fvisibility=hidden',
+        f'-I{sysconfig.get_paths()["include"]}',
+        f'-I{numpy.get_include()}',
+        *args.define,
+        '-o', out,
+        os.path.join(PYTHON_DIR, 'glassmap.c'),
+        os.path.join(ROOT_DIR, 'common.c'),
+    ])
+    log(f'built {out}')
+
+
+if __name__ == '__main__':
+    main()
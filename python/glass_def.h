@@ -0,0 +1,38 @@
+// (c) 2025 shdown
+// This code is licensed under MIT license (see LICENSE.MIT for details)
+
+#pragma once
+
+#include "../common.h"
+
+// The configuration the "glassmap" module is built with. Any of these (as well as any optional configuration
+// macro) can be overridden with "build.py --define".
+
+#ifndef GLASS_N
+# define GLASS_N 32
+#endif
+
+#ifndef GLASS_SIZE
+# define GLASS_SIZE uint32_t
+#endif
+
+#ifndef GLASS_K
+# define GLASS_K 50
+#endif
+
+// The module passes keys as unsigned 64-bit integers.
+#define GLASS_KEY uint64_t
+
+#define GLASS_PREFIX glass
+
+// "glass.h" undefines all of the above, so the module takes what it needs beforehand.
+typedef GLASS_KEY glassmap_Key;
+typedef GLASS_SIZE glassmap_Value;
+enum { GLASSMAP_N = GLASS_N, GLASSMAP_K = GLASS_K };
+#if defined(GLASS_WITH_COUNTS) && GLASS_WITH_COUNTS
+# define GLASSMAP_WITH_COUNTS 1
+#else
+# define GLASSMAP_WITH_COUNTS 0
+#endif
+
+#include "../glass.h"
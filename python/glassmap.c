@@ -0,0 +1,869 @@
+// (c) 2025 shdown
+// This code is licensed under MIT license (see LICENSE.MIT for details)
+
+// The "glassmap" CPython extension module: the 'GlassMap' type, an ordered map from unsigned integer keys (less
+// than 2**K) to unsigned integer values (of the GLASS_SIZE type) backed by a single glass instance.
+//
+// Besides the mapping protocol, it has batch methods that take NumPy arrays of keys (and values) and return NumPy
+// arrays, so that replaying a trace does not create a Python object per element. Input arrays are converted with
+// the "safe" casting rule, so e.g. an int64 array of keys has to be converted to uint64 by the caller.
+//
+// See "build.py" for how to build it with a given configuration.
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+#include <numpy/arrayobject.h>
+
+#include "glass_def.h"
+
+#define MAX_KEY (~(uint64_t) 0 >> (64 - GLASSMAP_K))
+#define MAX_VALUE ((glassmap_Value) -1)
+
+// Keys of a batch are passed to glass in chunks of this size where glass needs an array of instance pointers.
+enum { FIND_CHUNK = 64 };
+
+static int value_typenum(void)
+{
+    switch (sizeof(glassmap_Value)) {
+    case 1: return NPY_UINT8;
+    case 2: return NPY_UINT16;
+    case 4: return NPY_UINT32;
+    default: return NPY_UINT64;
+    }
+}
+
+typedef struct {
+    PyObject_HEAD
+    glass_Glass g;
+    // Bumped by every modification, so that iterators can detect one.
+    uint64_t version;
+} GlassMapObject;
+
+typedef struct {
+    PyObject_HEAD
+    GlassMapObject *map;
+    glass_Iter it;
+    uint64_t version;
+    bool is_next;
+    bool items;
+} GlassMapIterObject;
+
+static PyTypeObject GlassMapType;
+static PyTypeObject GlassMapIterType;
+
+// Converts a Python integer to an unsigned one not greater than 'max'. Returns 0 on success, or -1 with an
+// exception set.
+static int parse_uint(PyObject *o, unsigned long long max, const char *what, unsigned long long *out)
+{
+    PyObject *i = PyNumber_Index(o);
+    if (!i) {
+        return -1;
+    }
+    unsigned long long v = PyLong_AsUnsignedLongLong(i);
+    Py_DECREF(i);
+    if (v == (unsigned long long) -1 && PyErr_Occurred()) {
+        return -1;
+    }
+    if (v > max) {
+        PyErr_Format(PyExc_OverflowError, "%s %llu is out of range (max %llu)", what, v, max);
+        return -1;
+    }
+    *out = v;
+    return 0;
+}
+
+// "O&" converters for PyArg_Parse*.
+
+static int key_converter(PyObject *o, void *p)
+{
+    unsigned long long v;
+    if (parse_uint(o, MAX_KEY, "key", &v) < 0) {
+        return 0;
+    }
+    *(glassmap_Key *) p = v;
+    return 1;
+}
+
+// Like 'key_converter', but any non-negative integer fits (for ends of ranges); too big ones become ULLONG_MAX.
+static int bound_converter(PyObject *o, void *p)
+{
+    PyObject *i = PyNumber_Index(o);
+    if (!i) {
+        return 0;
+    }
+    int overflow;
+    long long s = PyLong_AsLongLongAndOverflow(i, &overflow);
+    unsigned long long v = overflow > 0 ? PyLong_AsUnsignedLongLong(i) : (unsigned long long) s;
+    if (overflow > 0 && v == (unsigned long long) -1 && PyErr_Occurred()) {
+        PyErr_Clear();
+        v = ULLONG_MAX;
+    }
+    Py_DECREF(i);
+    if (s == -1 && !overflow && PyErr_Occurred()) {
+        return 0;
+    }
+    if (overflow < 0 || (!overflow && s < 0)) {
+        PyErr_SetString(PyExc_OverflowError, "bound must be non-negative");
+        return 0;
+    }
+    *(unsigned long long *) p = v;
+    return 1;
+}
+
+// Converts a Python integer to a key to be looked up. Returns 1 on success, 0 if it is an integer out of the key range
+// (so no map has it), or -1 with an exception set.
+static int parse_lookup_key(PyObject *o, glassmap_Key *out)
+{
+    PyObject *i = PyNumber_Index(o);
+    if (!i) {
+        return -1;
+    }
+    int overflow;
+    long long s = PyLong_AsLongLongAndOverflow(i, &overflow);
+    unsigned long long v = (unsigned long long) s;
+    bool too_big = false;
+    if (overflow > 0) {
+        v = PyLong_AsUnsignedLongLong(i);
+        if (v == (unsigned long long) -1 && PyErr_Occurred()) {
+            PyErr_Clear();
+            too_big = true;
+        }
+    }
+    Py_DECREF(i);
+    if (s == -1 && !overflow && PyErr_Occurred()) {
+        return -1;
+    }
+    if (too_big || overflow < 0 || (!overflow && s < 0) || v > MAX_KEY) {
+        return 0;
+    }
+    *out = v;
+    return 1;
+}
+
+static int value_converter(PyObject *o, void *p)
+{
+    unsigned long long v;
+    if (parse_uint(o, MAX_VALUE, "value", &v) < 0) {
+        return 0;
+    }
+    *(glassmap_Value *) p = v;
+    return 1;
+}
+
+// Returns a new reference to a one-dimensional C-contiguous array of type 'typenum' made of 'o', or NULL with an
+// exception set.
+static PyArrayObject *as_array(PyObject *o, int typenum)
+{
+    return (PyArrayObject *) PyArray_FROMANY(o, typenum, 1, 1, NPY_ARRAY_IN_ARRAY);
+}
+
+static PyArrayObject *as_keys_array(PyObject *o)
+{
+    PyArrayObject *a = as_array(o, NPY_UINT64);
+    if (!a) {
+        return NULL;
+    }
+    const glassmap_Key *keys = (const glassmap_Key *) PyArray_DATA(a);
+    npy_intp n = PyArray_SIZE(a);
+    for (npy_intp i = 0; i < n; ++i) {
+        if (keys[i] > MAX_KEY) {
+            PyErr_Format(
+                PyExc_OverflowError, "keys[%zd] = %llu is out of range (max %llu)",
+                (Py_ssize_t) i, (unsigned long long) keys[i], (unsigned long long) MAX_KEY);
+            Py_DECREF(a);
+            return NULL;
+        }
+    }
+    return a;
+}
+
+// Glass aborts if its nodes vector would need more than GLASS_SIZE can index; so that Python gets an exception
+// instead, insertions are refused unless the worst case for the resulting size still fits. Returns 0 if 'n' more
+// elements can be inserted, or -1 with an exception set.
+static int check_room(GlassMapObject *self, size_t n)
+{
+    size_t size = self->g.size;
+    if (size + n < size || glass_size_to_max_capacity(size + n) > glass_max_capacity()) {
+        PyErr_Format(
+            PyExc_OverflowError, "%zu more elements may not fit into a GlassMap holding %zu (GLASS_SIZE is too small)",
+            n, size);
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject *new_array(npy_intp n, int typenum)
+{
+    return PyArray_SimpleNew(1, &n, typenum);
+}
+
+static PyObject *make_item(glassmap_Key k, glassmap_Value v)
+{
+    return Py_BuildValue("(KK)", (unsigned long long) k, (unsigned long long) v);
+}
+
+static PyObject *item_or_none(GlassMapObject *self, glass_Iter it)
+{
+    if (glass_iter_is_end(it)) {
+        Py_RETURN_NONE;
+    }
+    return make_item(glass_iter_get_key(&self->g, it), glass_iter_get_value(&self->g, it));
+}
+
+static PyObject *GlassMap_new(PyTypeObject *type, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"prealloc", NULL};
+    Py_ssize_t prealloc = 0;
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|n:GlassMap", kwlist, &prealloc)) {
+        return NULL;
+    }
+    if (prealloc < 0 || (size_t) prealloc > glass_max_capacity()) {
+        PyErr_Format(PyExc_ValueError, "prealloc must be in [0; %zu]", glass_max_capacity());
+        return NULL;
+    }
+
+    GlassMapObject *self = (GlassMapObject *) type->tp_alloc(type, 0);
+    if (!self) {
+        return NULL;
+    }
+    glass_create(&self->g, prealloc);
+    self->version = 0;
+    return (PyObject *) self;
+}
+
+static void GlassMap_dealloc(GlassMapObject *self)
+{
+    glass_destroy(&self->g);
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+static PyObject *GlassMap_from_sorted(PyTypeObject *type, PyObject *args)
+{
+    PyObject *keys_obj;
+    PyObject *values_obj;
+    if (!PyArg_ParseTuple(args, "OO:from_sorted", &keys_obj, &values_obj)) {
+        return NULL;
+    }
+
+    PyObject *res = NULL;
+    PyArrayObject *ka = NULL;
+    PyArrayObject *va = NULL;
+    if (!(ka = as_keys_array(keys_obj)) || !(va = as_array(values_obj, value_typenum()))) {
+        goto done;
+    }
+    npy_intp n = PyArray_SIZE(ka);
+    if (PyArray_SIZE(va) != n) {
+        PyErr_SetString(PyExc_ValueError, "keys and values must have the same length");
+        goto done;
+    }
+    const glassmap_Key *keys = (const glassmap_Key *) PyArray_DATA(ka);
+    for (npy_intp i = 1; i < n; ++i) {
+        if (keys[i - 1] >= keys[i]) {
+            PyErr_Format(PyExc_ValueError, "keys must be strictly increasing (keys[%zd] >= keys[%zd])", i - 1, i);
+            goto done;
+        }
+    }
+
+    if (glass_size_to_max_capacity(n) > glass_max_capacity()) {
+        PyErr_Format(PyExc_OverflowError, "%zd elements may not fit into a GlassMap (GLASS_SIZE is too small)", n);
+        goto done;
+    }
+
+    GlassMapObject *self = (GlassMapObject *) type->tp_alloc(type, 0);
+    if (!self) {
+        goto done;
+    }
+    glass_create_from_sorted(&self->g, keys, (const glassmap_Value *) PyArray_DATA(va), n);
+    self->version = 0;
+    res = (PyObject *) self;
+
+done:
+    Py_XDECREF(ka);
+    Py_XDECREF(va);
+    return res;
+}
+
+static Py_ssize_t GlassMap_len(GlassMapObject *self)
+{
+    return self->g.size;
+}
+
+static int GlassMap_contains(GlassMapObject *self, PyObject *key)
+{
+    glassmap_Key k;
+    int r = parse_lookup_key(key, &k);
+    if (r <= 0) {
+        return r;
+    }
+    return !glass_iter_is_end(glass_find(&self->g, k));
+}
+
+static PyObject *GlassMap_getitem(GlassMapObject *self, PyObject *key)
+{
+    glassmap_Key k;
+    int r = parse_lookup_key(key, &k);
+    if (r < 0) {
+        return NULL;
+    }
+    glass_Iter it = r ? glass_find(&self->g, k) : glass_end();
+    if (glass_iter_is_end(it)) {
+        PyErr_SetObject(PyExc_KeyError, key);
+        return NULL;
+    }
+    return PyLong_FromUnsignedLongLong(glass_iter_get_value(&self->g, it));
+}
+
+static int GlassMap_setitem(GlassMapObject *self, PyObject *key, PyObject *value)
+{
+    glassmap_Key k;
+    if (!value) {
+        int r = parse_lookup_key(key, &k);
+        if (r < 0) {
+            return -1;
+        }
+        if (!r || !glass_erase(&self->g, k)) {
+            PyErr_SetObject(PyExc_KeyError, key);
+            return -1;
+        }
+        ++self->version;
+        return 0;
+    }
+    glassmap_Value v;
+    if (!key_converter(key, &k) || !value_converter(value, &v) || check_room(self, 1) < 0) {
+        return -1;
+    }
+    glass_insert(&self->g, k, v);
+    ++self->version;
+    return 0;
+}
+
+PyDoc_STRVAR(GlassMap_insert_doc,
+"insert(key, value) -> bool\n\nSets the value of 'key'. Returns True if the key was already there.");
+
+static PyObject *GlassMap_insert(GlassMapObject *self, PyObject *args)
+{
+    glassmap_Key k;
+    glassmap_Value v;
+    if (!PyArg_ParseTuple(args, "O&O&:insert", key_converter, &k, value_converter, &v) || check_room(self, 1) < 0) {
+        return NULL;
+    }
+    bool existed = glass_insert(&self->g, k, v);
+    ++self->version;
+    return PyBool_FromLong(existed);
+}
+
+PyDoc_STRVAR(GlassMap_erase_doc,
+"erase(key) -> bool\n\nErases 'key'. Returns True if it was there.");
+
+static PyObject *GlassMap_erase(GlassMapObject *self, PyObject *arg)
+{
+    glassmap_Key k;
+    int r = parse_lookup_key(arg, &k);
+    if (r < 0) {
+        return NULL;
+    }
+    if (!r || !glass_erase(&self->g, k)) {
+        Py_RETURN_FALSE;
+    }
+    ++self->version;
+    Py_RETURN_TRUE;
+}
+
+PyDoc_STRVAR(GlassMap_get_doc,
+"get(key, default=None)\n\nReturns the value of 'key', or 'default' if it is not there.");
+
+static PyObject *GlassMap_get(GlassMapObject *self, PyObject *args)
+{
+    PyObject *key;
+    PyObject *dflt = Py_None;
+    if (!PyArg_ParseTuple(args, "O|O:get", &key, &dflt)) {
+        return NULL;
+    }
+    glassmap_Key k;
+    int r = parse_lookup_key(key, &k);
+    if (r < 0) {
+        return NULL;
+    }
+    glass_Iter it = r ? glass_find(&self->g, k) : glass_end();
+    if (glass_iter_is_end(it)) {
+        Py_INCREF(dflt);
+        return dflt;
+    }
+    return PyLong_FromUnsignedLongLong(glass_iter_get_value(&self->g, it));
+}
+
+PyDoc_STRVAR(GlassMap_clear_doc,
+"clear(shrink_mem=False)\n\nErases all the elements; with 'shrink_mem', also frees the memory.");
+
+static PyObject *GlassMap_clear(GlassMapObject *self, PyObject *args)
+{
+    int shrink_mem = 0;
+    if (!PyArg_ParseTuple(args, "|p:clear", &shrink_mem)) {
+        return NULL;
+    }
+    glass_clear(&self->g, shrink_mem);
+    ++self->version;
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(GlassMap_first_doc,
+"first() -> (key, value) or None\n\nReturns the element with the smallest key.");
+
+static PyObject *GlassMap_first(GlassMapObject *self, PyObject *Py_UNUSED(ignored))
+{
+    return item_or_none(self, glass_begin(&self->g));
+}
+
+PyDoc_STRVAR(GlassMap_last_doc,
+"last() -> (key, value) or None\n\nReturns the element with the largest key.");
+
+static PyObject *GlassMap_last(GlassMapObject *self, PyObject *Py_UNUSED(ignored))
+{
+    return item_or_none(self, glass_last(&self->g));
+}
+
+PyDoc_STRVAR(GlassMap_find_next_doc,
+"find_next(key) -> (key, value) or None\n\nReturns the element with the smallest key greater than 'key'.");
+
+static PyObject *GlassMap_find_next(GlassMapObject *self, PyObject *arg)
+{
+    unsigned long long k;
+    if (!bound_converter(arg, &k)) {
+        return NULL;
+    }
+    if (k >= MAX_KEY) {
+        Py_RETURN_NONE;
+    }
+    return item_or_none(self, glass_find_next(&self->g, k));
+}
+
+PyDoc_STRVAR(GlassMap_find_prev_doc,
+"find_prev(key) -> (key, value) or None\n\nReturns the element with the largest key less than 'key'.");
+
+static PyObject *GlassMap_find_prev(GlassMapObject *self, PyObject *arg)
+{
+    unsigned long long k;
+    if (!bound_converter(arg, &k)) {
+        return NULL;
+    }
+    if (k > MAX_KEY) {
+        return item_or_none(self, glass_last(&self->g));
+    }
+    return item_or_none(self, glass_find_prev(&self->g, k));
+}
+
+PyDoc_STRVAR(GlassMap_insert_many_doc,
+"insert_many(keys, values) -> ndarray[bool]\n\n"
+"Inserts the elements in order, as 'insert' would. Returns an array telling for each one whether its key was\n"
+"already there.");
+
+static PyObject *GlassMap_insert_many(GlassMapObject *self, PyObject *args)
+{
+    PyObject *keys_obj;
+    PyObject *values_obj;
+    if (!PyArg_ParseTuple(args, "OO:insert_many", &keys_obj, &values_obj)) {
+        return NULL;
+    }
+
+    PyObject *res = NULL;
+    PyArrayObject *ka = NULL;
+    PyArrayObject *va = NULL;
+    if (!(ka = as_keys_array(keys_obj)) || !(va = as_array(values_obj, value_typenum()))) {
+        goto done;
+    }
+    npy_intp n = PyArray_SIZE(ka);
+    if (PyArray_SIZE(va) != n) {
+        PyErr_SetString(PyExc_ValueError, "keys and values must have the same length");
+        goto done;
+    }
+    if (check_room(self, n) < 0 || !(res = new_array(n, NPY_BOOL))) {
+        goto done;
+    }
+    glass_insert_batch(
+        &self->g,
+        (const glassmap_Key *) PyArray_DATA(ka),
+        (const glassmap_Value *) PyArray_DATA(va),
+        n,
+        (bool *) PyArray_DATA((PyArrayObject *) res));
+    ++self->version;
+
+done:
+    Py_XDECREF(ka);
+    Py_XDECREF(va);
+    return res;
+}
+
+PyDoc_STRVAR(GlassMap_erase_many_doc,
+"erase_many(keys) -> ndarray[bool]\n\nErases the keys. Returns an array telling for each one whether it was there.");
+
+static PyObject *GlassMap_erase_many(GlassMapObject *self, PyObject *arg)
+{
+    PyArrayObject *ka = as_keys_array(arg);
+    if (!ka) {
+        return NULL;
+    }
+    npy_intp n = PyArray_SIZE(ka);
+    PyObject *res = new_array(n, NPY_BOOL);
+    if (res) {
+        glass_erase_batch(
+            &self->g,
+            (const glassmap_Key *) PyArray_DATA(ka),
+            n,
+            (bool *) PyArray_DATA((PyArrayObject *) res));
+        ++self->version;
+    }
+    Py_DECREF(ka);
+    return res;
+}
+
+PyDoc_STRVAR(GlassMap_find_many_doc,
+"find_many(keys, default=0) -> (ndarray[bool], ndarray)\n\n"
+"Looks up the keys. Returns an array telling for each one whether it is there, and an array of the values\n"
+"('default' for the keys that are not there).");
+
+static PyObject *GlassMap_find_many(GlassMapObject *self, PyObject *args)
+{
+    PyObject *keys_obj;
+    glassmap_Value dflt = 0;
+    if (!PyArg_ParseTuple(args, "O|O&:find_many", &keys_obj, value_converter, &dflt)) {
+        return NULL;
+    }
+
+    PyArrayObject *ka = as_keys_array(keys_obj);
+    if (!ka) {
+        return NULL;
+    }
+    npy_intp n = PyArray_SIZE(ka);
+    PyObject *found = new_array(n, NPY_BOOL);
+    PyObject *values = new_array(n, value_typenum());
+    if (!found || !values) {
+        Py_DECREF(ka);
+        Py_XDECREF(found);
+        Py_XDECREF(values);
+        return NULL;
+    }
+
+    const glassmap_Key *keys = (const glassmap_Key *) PyArray_DATA(ka);
+    bool *found_out = (bool *) PyArray_DATA((PyArrayObject *) found);
+    glassmap_Value *values_out = (glassmap_Value *) PyArray_DATA((PyArrayObject *) values);
+
+    glass_Glass *gs[FIND_CHUNK];
+    for (int j = 0; j < FIND_CHUNK; ++j) {
+        gs[j] = &self->g;
+    }
+    glass_Iter its[FIND_CHUNK];
+    for (npy_intp lo = 0; lo < n; lo += FIND_CHUNK) {
+        size_t m = n - lo < FIND_CHUNK ? (size_t) (n - lo) : FIND_CHUNK;
+        glass_find_many(gs, keys + lo, m, its);
+        for (size_t j = 0; j < m; ++j) {
+            bool is_found = !glass_iter_is_end(its[j]);
+            found_out[lo + j] = is_found;
+            values_out[lo + j] = is_found ? glass_iter_get_value(&self->g, its[j]) : dflt;
+        }
+    }
+
+    Py_DECREF(ka);
+    return Py_BuildValue("(NN)", found, values);
+}
+
+// Returns a (keys, values) tuple of new arrays of length 'n', or NULL with an exception set.
+static PyObject *new_item_arrays(npy_intp n, glassmap_Key **keys_out, glassmap_Value **values_out)
+{
+    PyObject *keys = new_array(n, NPY_UINT64);
+    PyObject *values = new_array(n, value_typenum());
+    if (!keys || !values) {
+        Py_XDECREF(keys);
+        Py_XDECREF(values);
+        return NULL;
+    }
+    *keys_out = (glassmap_Key *) PyArray_DATA((PyArrayObject *) keys);
+    *values_out = (glassmap_Value *) PyArray_DATA((PyArrayObject *) values);
+    return Py_BuildValue("(NN)", keys, values);
+}
+
+PyDoc_STRVAR(GlassMap_range_doc,
+"range(lo, hi, max=None) -> (ndarray[uint64], ndarray)\n\n"
+"Returns the keys and the values of (at most 'max') elements with keys in [lo; hi], in ascending order.");
+
+static PyObject *GlassMap_range(GlassMapObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"lo", "hi", "max", NULL};
+    unsigned long long lo;
+    unsigned long long hi;
+    PyObject *max_obj = Py_None;
+    if (!PyArg_ParseTupleAndKeywords(
+            args, kwargs, "O&O&|O:range", kwlist, bound_converter, &lo, bound_converter, &hi, &max_obj))
+    {
+        return NULL;
+    }
+    size_t max = SIZE_MAX;
+    if (max_obj != Py_None) {
+        unsigned long long v;
+        if (parse_uint(max_obj, SIZE_MAX, "max", &v) < 0) {
+            return NULL;
+        }
+        max = v;
+    }
+    if (hi > MAX_KEY) {
+        hi = MAX_KEY;
+    }
+    if (lo > hi) {
+        max = 0;
+    }
+
+    // The first pass only counts, so that the arrays are allocated once with the exact length.
+    size_t n = max ? glass_copy_range(&self->g, lo, hi, NULL, NULL, max) : 0;
+    glassmap_Key *keys;
+    glassmap_Value *values;
+    PyObject *res = new_item_arrays(n, &keys, &values);
+    if (res && n) {
+        glass_copy_range(&self->g, lo, hi, keys, values, n);
+    }
+    return res;
+}
+
+PyDoc_STRVAR(GlassMap_top_doc,
+"top(n, from_last=False) -> (ndarray[uint64], ndarray)\n\n"
+"Returns the keys and the values of (at most 'n') first elements in ascending order or, if 'from_last' is true,\n"
+"last elements in descending order.");
+
+static PyObject *GlassMap_top(GlassMapObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"n", "from_last", NULL};
+    Py_ssize_t n;
+    int from_last = 0;
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "n|p:top", kwlist, &n, &from_last)) {
+        return NULL;
+    }
+    if (n < 0) {
+        PyErr_SetString(PyExc_ValueError, "n must be non-negative");
+        return NULL;
+    }
+    if ((size_t) n > self->g.size) {
+        n = self->g.size;
+    }
+    glassmap_Key *keys;
+    glassmap_Value *values;
+    PyObject *res = new_item_arrays(n, &keys, &values);
+    if (res && n) {
+        glass_copy_top_n(&self->g, n, from_last, keys, values);
+    }
+    return res;
+}
+
+PyDoc_STRVAR(GlassMap_erase_range_doc,
+"erase_range(lo, hi) -> int\n\nErases all the elements with keys in [lo; hi]. Returns the number of them.");
+
+static PyObject *GlassMap_erase_range(GlassMapObject *self, PyObject *args)
+{
+    unsigned long long lo;
+    unsigned long long hi;
+    if (!PyArg_ParseTuple(args, "O&O&:erase_range", bound_converter, &lo, bound_converter, &hi)) {
+        return NULL;
+    }
+    size_t n = lo > MAX_KEY ? 0 : glass_erase_range(&self->g, lo, hi);
+    ++self->version;
+    return PyLong_FromSize_t(n);
+}
+
+#if GLASSMAP_WITH_COUNTS
+PyDoc_STRVAR(GlassMap_rank_doc,
+"rank(key) -> int\n\nReturns the number of elements with keys less than 'key'.");
+
+static PyObject *GlassMap_rank(GlassMapObject *self, PyObject *arg)
+{
+    unsigned long long k;
+    if (!bound_converter(arg, &k)) {
+        return NULL;
+    }
+    return PyLong_FromSize_t(glass_rank(&self->g, k));
+}
+
+PyDoc_STRVAR(GlassMap_select_doc,
+"select(i) -> (key, value)\n\nReturns the element with the i-th smallest key; negative 'i' counts from the end.");
+
+static PyObject *GlassMap_select(GlassMapObject *self, PyObject *arg)
+{
+    Py_ssize_t i = PyNumber_AsSsize_t(arg, PyExc_IndexError);
+    if (i == -1 && PyErr_Occurred()) {
+        return NULL;
+    }
+    Py_ssize_t size = self->g.size;
+    if (i < 0) {
+        i += size;
+    }
+    if (i < 0 || i >= size) {
+        PyErr_SetString(PyExc_IndexError, "GlassMap index out of range");
+        return NULL;
+    }
+    return item_or_none(self, glass_select(&self->g, i));
+}
+#endif
+
+static PyObject *new_iter(GlassMapObject *map, bool is_next, bool items)
+{
+    GlassMapIterObject *it = PyObject_New(GlassMapIterObject, &GlassMapIterType);
+    if (!it) {
+        return NULL;
+    }
+    Py_INCREF(map);
+    it->map = map;
+    it->it = is_next ? glass_begin(&map->g) : glass_last(&map->g);
+    it->version = map->version;
+    it->is_next = is_next;
+    it->items = items;
+    return (PyObject *) it;
+}
+
+static PyObject *GlassMap_iter(GlassMapObject *self)
+{
+    return new_iter(self, true, false);
+}
+
+PyDoc_STRVAR(GlassMap_reversed_doc, "Returns an iterator over the keys in descending order.");
+
+static PyObject *GlassMap_reversed(GlassMapObject *self, PyObject *Py_UNUSED(ignored))
+{
+    return new_iter(self, false, false);
+}
+
+PyDoc_STRVAR(GlassMap_items_doc,
+"items(reverse=False)\n\nReturns an iterator over (key, value) pairs in ascending (or descending) order of keys.");
+
+static PyObject *GlassMap_items(GlassMapObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"reverse", NULL};
+    int reverse = 0;
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|p:items", kwlist, &reverse)) {
+        return NULL;
+    }
+    return new_iter(self, !reverse, true);
+}
+
+static void GlassMapIter_dealloc(GlassMapIterObject *self)
+{
+    Py_DECREF(self->map);
+    PyObject_Free(self);
+}
+
+static PyObject *GlassMapIter_next(GlassMapIterObject *self)
+{
+    GlassMapObject *map = self->map;
+    if (map->version != self->version) {
+        PyErr_SetString(PyExc_RuntimeError, "GlassMap changed during iteration");
+        return NULL;
+    }
+    glass_Iter it = self->it;
+    if (glass_iter_is_end(it)) {
+        return NULL;
+    }
+    glassmap_Key k = glass_iter_get_key(&map->g, it);
+    PyObject *res = self->items
+        ? make_item(k, glass_iter_get_value(&map->g, it))
+        : PyLong_FromUnsignedLongLong(k);
+    self->it = self->is_next ? glass_iter_next(&map->g, it) : glass_iter_prev(&map->g, it);
+    return res;
+}
+
+static PyMethodDef GlassMap_methods[] = {
+    {"from_sorted", (PyCFunction) GlassMap_from_sorted, METH_VARARGS | METH_CLASS,
+     "from_sorted(keys, values) -> GlassMap\n\nBuilds a map from strictly increasing keys."},
+    {"insert", (PyCFunction) GlassMap_insert, METH_VARARGS, GlassMap_insert_doc},
+    {"erase", (PyCFunction) GlassMap_erase, METH_O, GlassMap_erase_doc},
+    {"get", (PyCFunction) GlassMap_get, METH_VARARGS, GlassMap_get_doc},
+    {"clear", (PyCFunction) GlassMap_clear, METH_VARARGS, GlassMap_clear_doc},
+    {"first", (PyCFunction) GlassMap_first, METH_NOARGS, GlassMap_first_doc},
+    {"last", (PyCFunction) GlassMap_last, METH_NOARGS, GlassMap_last_doc},
+    {"find_next", (PyCFunction) GlassMap_find_next, METH_O, GlassMap_find_next_doc},
+    {"find_prev", (PyCFunction) GlassMap_find_prev, METH_O, GlassMap_find_prev_doc},
+    {"insert_many", (PyCFunction) GlassMap_insert_many, METH_VARARGS, GlassMap_insert_many_doc},
+    {"erase_many", (PyCFunction) GlassMap_erase_many, METH_O, GlassMap_erase_many_doc},
+    {"find_many", (PyCFunction) GlassMap_find_many, METH_VARARGS, GlassMap_find_many_doc},
+    {"range", (PyCFunction) (void (*)(void)) GlassMap_range, METH_VARARGS | METH_KEYWORDS, GlassMap_range_doc},
+    {"top", (PyCFunction) (void (*)(void)) GlassMap_top, METH_VARARGS | METH_KEYWORDS, GlassMap_top_doc},
+    {"erase_range", (PyCFunction) GlassMap_erase_range, METH_VARARGS, GlassMap_erase_range_doc},
+#if GLASSMAP_WITH_COUNTS
+    {"rank", (PyCFunction) GlassMap_rank, METH_O, GlassMap_rank_doc},
+    {"select", (PyCFunction) GlassMap_select, METH_O, GlassMap_select_doc},
+#endif
+    {"items", (PyCFunction) (void (*)(void)) GlassMap_items, METH_VARARGS | METH_KEYWORDS, GlassMap_items_doc},
+    {"__reversed__", (PyCFunction) GlassMap_reversed, METH_NOARGS, GlassMap_reversed_doc},
+    {NULL, NULL, 0, NULL},
+};
+
+static PyMappingMethods GlassMap_as_mapping = {
+    .mp_length = (lenfunc) GlassMap_len,
+    .mp_subscript = (binaryfunc) GlassMap_getitem,
+    .mp_ass_subscript = (objobjargproc) GlassMap_setitem,
+};
+
+static PySequenceMethods GlassMap_as_sequence = {
+    .sq_contains = (objobjproc) GlassMap_contains,
+};
+
+static PyTypeObject GlassMapType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "glassmap.GlassMap",
+    .tp_doc = PyDoc_STR(
+        "GlassMap(prealloc=0)\n\n"
+        "An ordered map from integer keys in [0; MAX_KEY] to integer values of VALUE_DTYPE."),
+    .tp_basicsize = sizeof(GlassMapObject),
+    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
+    .tp_new = GlassMap_new,
+    .tp_dealloc = (destructor) GlassMap_dealloc,
+    .tp_as_mapping = &GlassMap_as_mapping,
+    .tp_as_sequence = &GlassMap_as_sequence,
+    .tp_iter = (getiterfunc) GlassMap_iter,
+    .tp_methods = GlassMap_methods,
+};
+
+static PyTypeObject GlassMapIterType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "glassmap.GlassMapIterator",
+    .tp_basicsize = sizeof(GlassMapIterObject),
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_dealloc = (destructor) GlassMapIter_dealloc,
+    .tp_iter = PyObject_SelfIter,
+    .tp_iternext = (iternextfunc) GlassMapIter_next,
+};
+
+static struct PyModuleDef glassmap_module = {
+    PyModuleDef_HEAD_INIT,
+    .m_name = "glassmap",
+    .m_doc = "Ordered integer maps backed by glass.",
+    .m_size = -1,
+};
+
+PyMODINIT_FUNC PyInit_glassmap(void)
+{
+    import_array();
+
+    if (PyType_Ready(&GlassMapType) < 0 || PyType_Ready(&GlassMapIterType) < 0) {
+        return NULL;
+    }
+
+    PyObject *m = PyModule_Create(&glassmap_module);
+    if (!m) {
+        return NULL;
+    }
+    Py_INCREF(&GlassMapType);
+    if (PyModule_AddObject(m, "GlassMap", (PyObject *) &GlassMapType) < 0) {
+        Py_DECREF(&GlassMapType);
+        goto fail;
+    }
+    if (PyModule_AddIntConstant(m, "N", GLASSMAP_N) < 0 ||
+        PyModule_AddIntConstant(m, "K", GLASSMAP_K) < 0 ||
+        PyModule_AddObject(m, "MAX_KEY", PyLong_FromUnsignedLongLong(MAX_KEY)) < 0 ||
+        PyModule_AddObject(m, "VALUE_DTYPE", (PyObject *) PyArray_DescrFromType(value_typenum())) < 0 ||
+        PyModule_AddObject(m, "WITH_COUNTS", PyBool_FromLong(GLASSMAP_WITH_COUNTS)) < 0)
+    {
+        goto fail;
+    }
+    return m;
+
+fail:
+    Py_DECREF(m);
+    return NULL;
+}
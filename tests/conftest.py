@@ -0,0 +1,95 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Shared helpers: the tests build small C programs against headers generated into a temporary directory, so that
+# the tree itself is left untouched.
+
+import os
+import shlex
+import subprocess
+import sys
+
+import pytest
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+
+sys.path.insert(0, ROOT_DIR)
+import ato  # noqa: E402
+
+
+CC = os.environ.get('CC', 'cc')
+CFLAGS = os.environ.get('CFLAGS', '-std=gnu11 -O1 -g -Wall -Wextra')
+
+
+def gen_headers(out_dir):
+    for name in ['glass_prevnext', 'glass']:
+        text = ato.preprocess(os.path.join(ROOT_DIR, name + '.ato'), include_root=ROOT_DIR, use_cache=False)
+        with open(os.path.join(out_dir, name + '.h'), 'w') as f:
+            f.write(text)
+
+
+def glass_prelude(defines):
+    lines = ['#include "common.h"', '#define GLASS_PREFIX glass']
+    for name, value in defines.items():
+        lines.append(f'#define {name} {value}')
+    lines.append('#include "glass.h"')
+    return '\n'.join(lines) + '\n'
+
+
+def compile_c(src_path, exe_path, include_dirs, extra_flags=(), check=True):
+    argv = [
+        *shlex.split(CC),
+        *shlex.split(CFLAGS),
+        *extra_flags,
+        *[f'-I{d}' for d in include_dirs],
+        '-o', exe_path,
+        src_path,
+        os.path.join(ROOT_DIR, 'common.c'),
+    ]
+    return subprocess.run(argv, check=check, capture_output=not check, text=True)
+
+
+def _has_generic_builtins(tmp_dir):
+    src = os.path.join(tmp_dir, 'probe.c')
+    with open(src, 'w') as f:
+        f.write('int main(void) { return __builtin_popcountg(3u) + __builtin_ctzg(1u, 0) + __builtin_clzg(1u, 0); }\n')
+    argv = [*shlex.split(CC), '-o', os.path.join(tmp_dir, 'probe'), src]
+    return subprocess.run(argv, capture_output=True).returncode == 0
+
+
+@pytest.fixture(scope='session')
+def base_defines(tmp_path_factory):
+    """The configuration the tests start from: with GLASS_N = 8 and the compat shim if the compiler is too old for
+    __builtin_popcountg and friends."""
+    defines = {
+        'GLASS_SIZE': 'uint32_t',
+        'GLASS_KEY': 'uint64_t',
+        'GLASS_K': 50,
+    }
+    if _has_generic_builtins(str(tmp_path_factory.mktemp('probe'))):
+        defines['GLASS_N'] = 32
+    else:
+        defines['GLASS_N'] = 8
+        defines['GLASS_WITH_COMPAT_SHIM'] = 1
+    return defines
+
+
+@pytest.fixture(scope='session')
+def headers_dir(tmp_path_factory):
+    d = tmp_path_factory.mktemp('headers')
+    gen_headers(str(d))
+    return str(d)
+
+
+@pytest.fixture
+def build_glass(headers_dir, tmp_path):
+    """Returns a function that compiles 'source' with the given configuration macros and returns the executable."""
+    def build(source, defines, name='prog'):
+        src = tmp_path / (name + '.c')
+        src.write_text(glass_prelude(defines) + source)
+        exe = str(tmp_path / name)
+        compile_c(str(src), exe, [headers_dir, ROOT_DIR])
+        return exe
+    return build
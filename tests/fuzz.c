@@ -0,0 +1,1121 @@
+// (c) 2025 shdown
+// This code is licensed under MIT license (see LICENSE.MIT for details)
+
+// A differential fuzzer: applies random operations to a few glass instances and to a trivially correct model of
+// each (a sorted array of elements), and checks that every result agrees with the model.
+//
+// The configuration is given with -D on the command line, e.g.:
+//
+//   ./ato.py glass_prevnext.ato > glass_prevnext.h && ./ato.py glass.ato > glass.h
+//   cc -std=gnu11 -O1 -g -fsanitize=address,undefined -pthread -I. -o fuzz tests/fuzz.c common.c
+//       -DGLASS_N=32 -DGLASS_SIZE=uint32_t -DGLASS_KEY=uint64_t -DGLASS_K=50 -DGLASS_CACHE_WAYS=2
+//   ./fuzz [SEED [NSTEPS]]
+//
+// On a mismatch, it prints the seed, the step and the failed check, and exits with status 1. With
+// GLASS_WITH_SEQLOCK, a reader thread also walks instance 0 with the '@seq_*' functions while it is being modified.
+//
+// "test_fuzz.py" runs it in a number of configurations.
+
+#include "common.h"
+
+#define GLASS_PREFIX glass
+
+// "glass.h" undefines the configuration macros, so the fuzzer takes what it needs beforehand.
+typedef GLASS_KEY fuzz_Key;
+typedef GLASS_SIZE fuzz_Value;
+enum { FUZZ_K = GLASS_K };
+
+#if defined(GLASS_WITH_COUNTS) && GLASS_WITH_COUNTS
+# define FUZZ_WITH_COUNTS 1
+#else
+# define FUZZ_WITH_COUNTS 0
+#endif
+
+#if defined(GLASS_WITH_ARENA) && GLASS_WITH_ARENA
+# define FUZZ_WITH_ARENA 1
+#else
+# define FUZZ_WITH_ARENA 0
+#endif
+
+#if defined(GLASS_WITH_SNAPSHOT) && GLASS_WITH_SNAPSHOT
+# define FUZZ_WITH_SNAPSHOT 1
+#else
+# define FUZZ_WITH_SNAPSHOT 0
+#endif
+
+#if defined(GLASS_WITH_SEQLOCK) && GLASS_WITH_SEQLOCK
+# define FUZZ_WITH_SEQLOCK 1
+#else
+# define FUZZ_WITH_SEQLOCK 0
+#endif
+
+#if defined(GLASS_WITH_AUTO_SHRINK) && GLASS_WITH_AUTO_SHRINK
+# define FUZZ_WITH_AUTO_SHRINK 1
+#else
+# define FUZZ_WITH_AUTO_SHRINK 0
+#endif
+
+#include "glass.h"
+
+#if FUZZ_WITH_SEQLOCK
+# include <stdatomic.h>
+#endif
+
+#define FUZZ_MAX_KEY ((fuzz_Key) (~(uint64_t) 0 >> (64 - FUZZ_K)))
+
+enum {
+    // Number of instances.
+    NG = 3,
+    MAX_BATCH = 48,
+    // Upper bound for the number of elements in an instance; lowered for small GLASS_SIZE types (see
+    // 'pick_max_live').
+    MAX_LIVE = 1500,
+    MAX_COPY = 64,
+};
+
+static uint64_t seed;
+static long step;
+static const char *op_name = "init";
+
+static void fail(int line, const char *what)
+{
+    fprintf(stderr, "FAIL: seed %" PRIu64 ", step %ld, op %s: line %d: %s\n", seed, step, op_name, line, what);
+    exit(1);
+}
+
+#define CHECK(Cond_) \
+    do { \
+        if (!(Cond_)) { \
+            fail(__LINE__, #Cond_); \
+        } \
+    } while (0)
+
+// splitmix64
+static uint64_t rnd_next(uint64_t *state)
+{
+    uint64_t z = (*state += 0x9E3779B97F4A7C15u);
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9u;
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBu;
+    return z ^ (z >> 31);
+}
+
+static uint64_t rng_state;
+
+static uint64_t rnd(void)
+{
+    return rnd_next(&rng_state);
+}
+
+static uint64_t rnd_below(uint64_t n)
+{
+    return rnd() % n;
+}
+
+// The model: elements sorted by key.
+typedef struct {
+    fuzz_Key *keys;
+    fuzz_Value *vals;
+    size_t n;
+    size_t cap;
+} Model;
+
+// Returns the index of the first element with key not less than 'k'.
+static size_t model_lower(const Model *m, fuzz_Key k)
+{
+    size_t lo = 0;
+    size_t hi = m->n;
+    while (lo < hi) {
+        size_t mid = lo + (hi - lo) / 2;
+        if (m->keys[mid] < k) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        }
+    }
+    return lo;
+}
+
+// Returns the index of the first element with key greater than 'k'.
+static size_t model_upper(const Model *m, fuzz_Key k)
+{
+    return k >= FUZZ_MAX_KEY ? m->n : model_lower(m, k + 1);
+}
+
+static bool model_has(const Model *m, fuzz_Key k, size_t *pos)
+{
+    size_t i = model_lower(m, k);
+    *pos = i;
+    return i < m->n && m->keys[i] == k;
+}
+
+// Returns true if the key was already there.
+static bool model_insert(Model *m, fuzz_Key k, fuzz_Value v)
+{
+    size_t i;
+    if (model_has(m, k, &i)) {
+        m->vals[i] = v;
+        return true;
+    }
+    if (m->n == m->cap) {
+        m->cap = m->cap ? m->cap * 2 : 64;
+        m->keys = (fuzz_Key *) realloc_or_die(m->keys, m->cap, sizeof(fuzz_Key));
+        m->vals = (fuzz_Value *) realloc_or_die(m->vals, m->cap, sizeof(fuzz_Value));
+    }
+    memmove(&m->keys[i + 1], &m->keys[i], (m->n - i) * sizeof(fuzz_Key));
+    memmove(&m->vals[i + 1], &m->vals[i], (m->n - i) * sizeof(fuzz_Value));
+    m->keys[i] = k;
+    m->vals[i] = v;
+    ++m->n;
+    return false;
+}
+
+static void model_erase_at(Model *m, size_t a, size_t b)
+{
+    memmove(&m->keys[a], &m->keys[b], (m->n - b) * sizeof(fuzz_Key));
+    memmove(&m->vals[a], &m->vals[b], (m->n - b) * sizeof(fuzz_Value));
+    m->n -= b - a;
+}
+
+// Returns true if the key was there.
+static bool model_erase(Model *m, fuzz_Key k)
+{
+    size_t i;
+    if (!model_has(m, k, &i)) {
+        return false;
+    }
+    model_erase_at(m, i, i + 1);
+    return true;
+}
+
+static size_t model_erase_range(Model *m, fuzz_Key lo, fuzz_Key hi)
+{
+    if (lo > hi) {
+        return 0;
+    }
+    size_t a = model_lower(m, lo);
+    size_t b = model_upper(m, hi);
+    if (a >= b) {
+        return 0;
+    }
+    model_erase_at(m, a, b);
+    return b - a;
+}
+
+static glass_Glass gs[NG];
+static Model models[NG];
+static size_t max_live;
+static fuzz_Key cluster_base;
+
+#if FUZZ_WITH_ARENA
+static glass_Arena arena;
+#endif
+
+#if FUZZ_WITH_AUTO_SHRINK
+static int latency_critical[NG];
+#endif
+
+// Whether the reader thread walks instance 'gi'; if so, its values are always 'vmix' of their keys, and it is never
+// re-created.
+static bool reader_watches(int gi)
+{
+    return FUZZ_WITH_SEQLOCK && gi == 0;
+}
+
+static fuzz_Value vmix(fuzz_Key k)
+{
+    return (fuzz_Value) (((uint64_t) k * 0x9E3779B97F4A7C15u) >> 17);
+}
+
+static fuzz_Value gen_value(int gi, fuzz_Key k)
+{
+    if (reader_watches(gi)) {
+        return vmix(k);
+    }
+    return (fuzz_Value) rnd();
+}
+
+// Keys are drawn from a few regions, so that both sparse paths and densely filled leaves get exercised.
+static fuzz_Key gen_key(const Model *m)
+{
+    fuzz_Key k;
+    switch (rnd_below(6)) {
+    case 0:
+        k = (fuzz_Key) rnd();
+        break;
+    case 1:
+        k = (fuzz_Key) rnd_below(1024);
+        break;
+    case 2:
+        k = FUZZ_MAX_KEY - (fuzz_Key) rnd_below(1024);
+        break;
+    case 3:
+        k = cluster_base + (fuzz_Key) rnd_below(1 << 16);
+        break;
+    default:
+        if (!m->n) {
+            k = (fuzz_Key) rnd_below(1024);
+            break;
+        }
+        k = m->keys[rnd_below(m->n)];
+        fuzz_Key d = (fuzz_Key) rnd_below(64);
+        if (rnd() & 1) {
+            k = k > FUZZ_MAX_KEY - d ? FUZZ_MAX_KEY : k + d;
+        } else {
+            k = k < d ? 0 : k - d;
+        }
+        break;
+    }
+    return k & FUZZ_MAX_KEY;
+}
+
+// Mostly a key that is there.
+static fuzz_Key gen_present_key(const Model *m)
+{
+    if (m->n && rnd_below(4)) {
+        return m->keys[rnd_below(m->n)];
+    }
+    return gen_key(m);
+}
+
+static bool has_room(int gi, size_t extra)
+{
+    return models[gi].n + extra <= max_live;
+}
+
+// Every instance must be able to hold 'max_live' elements (and, in an arena, all of them at once, with the doubling
+// of the number of nodes each one takes from it).
+static size_t pick_max_live(void)
+{
+    size_t cap = glass_max_capacity();
+#if FUZZ_WITH_ARENA
+    cap /= 2 * NG;
+#endif
+    size_t n = MAX_LIVE;
+    while (n && glass_size_to_max_capacity(n + MAX_BATCH) > cap) {
+        n /= 2;
+    }
+    return n;
+}
+
+// A valid iterator of instance 'gi', to be used as a hint for key 'k'.
+static glass_Iter random_iter(int gi, fuzz_Key k)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    switch (rnd_below(6)) {
+    case 0:
+        return glass_end();
+    case 1:
+        return glass_begin(g);
+    case 2:
+        return glass_last(g);
+    case 3:
+        return m->n ? glass_find(g, m->keys[rnd_below(m->n)]) : glass_end();
+    case 4:
+        return glass_find(g, k);
+    default:
+        return glass_find_next(g, gen_key(m));
+    }
+}
+
+// Checks that 'it' points to the element 'pos' of the model of instance 'gi', or is the end iterator if 'pos' is
+// SIZE_MAX.
+static void check_iter(int gi, glass_Iter it, size_t pos)
+{
+    if (pos == SIZE_MAX) {
+        CHECK(glass_iter_is_end(it));
+        return;
+    }
+    CHECK(pos < models[gi].n);
+    CHECK(!glass_iter_is_end(it));
+    CHECK(glass_iter_get_key(&gs[gi], it) == models[gi].keys[pos]);
+    CHECK(glass_iter_get_value(&gs[gi], it) == models[gi].vals[pos]);
+}
+
+static size_t pos_or_none(const Model *m, size_t pos)
+{
+    return pos < m->n ? pos : SIZE_MAX;
+}
+
+static void check_full(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+
+    CHECK(g->size == m->n);
+
+    size_t i = 0;
+    for (glass_Iter it = glass_begin(g); !glass_iter_is_end(it); it = glass_iter_next(g, it)) {
+        check_iter(gi, it, i++);
+    }
+    CHECK(i == m->n);
+
+    for (glass_Iter it = glass_last(g); !glass_iter_is_end(it); it = glass_iter_prev(g, it)) {
+        CHECK(i > 0);
+        check_iter(gi, it, --i);
+    }
+    CHECK(i == 0);
+
+#if FUZZ_WITH_AUTO_SHRINK
+    CHECK(g->nnodes_used == glass__count_nodes(g));
+#endif
+}
+
+static void op_insert(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    if (!has_room(gi, 1)) {
+        return;
+    }
+    fuzz_Key k = gen_key(m);
+    fuzz_Value v = gen_value(gi, k);
+    bool existed;
+    // With the reader thread watching, the value must not be assigned after the element shows up.
+    switch (rnd_below(reader_watches(gi) ? 2 : 3)) {
+    case 0:
+        op_name = "insert";
+        existed = glass_insert(g, k, v);
+        break;
+    case 1:
+        op_name = "insert_with_hint";
+        existed = glass_insert_with_hint(g, k, v, random_iter(gi, k));
+        break;
+    default: {
+        op_name = "insert_or_find";
+        bool inserted;
+        glass_Iter it = rnd() & 1
+            ? glass_insert_or_find(g, k, &inserted)
+            : glass_insert_or_find_with_hint(g, k, &inserted, random_iter(gi, k));
+        CHECK(!glass_iter_is_end(it));
+        CHECK(glass_iter_get_key(g, it) == k);
+        glass_iter_assign(g, it, v);
+        existed = !inserted;
+        break;
+    }
+    }
+    CHECK(existed == model_insert(m, k, v));
+}
+
+static void op_erase(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key k = gen_present_key(m);
+    bool erased;
+    switch (rnd_below(3)) {
+    case 0:
+        op_name = "erase";
+        erased = glass_erase(g, k);
+        break;
+    case 1:
+        op_name = "erase_with_hint";
+        erased = glass_erase_with_hint(g, k, random_iter(gi, k));
+        break;
+    default: {
+        op_name = "erase_by_iter";
+        glass_Iter it = glass_find(g, k);
+        erased = !glass_iter_is_end(it);
+        if (erased) {
+            glass_erase_by_iter(g, it);
+        }
+        break;
+    }
+    }
+    CHECK(erased == model_erase(m, k));
+}
+
+static void op_find(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key k = gen_present_key(m);
+    glass_Iter it;
+    if (rnd() & 1) {
+        op_name = "find";
+        it = glass_find(g, k);
+    } else {
+        op_name = "find_with_hint";
+        it = glass_find_with_hint(g, k, random_iter(gi, k));
+    }
+    size_t pos;
+    check_iter(gi, it, model_has(m, k, &pos) ? pos : SIZE_MAX);
+}
+
+static void op_replace(int gi)
+{
+    op_name = "replace";
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key k = gen_present_key(m);
+    fuzz_Value v = gen_value(gi, k);
+    bool replaced = rnd() & 1 ? glass_replace(g, k, v) : glass_replace_with_hint(g, k, v, random_iter(gi, k));
+    size_t pos;
+    bool has = model_has(m, k, &pos);
+    CHECK(replaced == has);
+    if (has) {
+        m->vals[pos] = v;
+    }
+}
+
+// find_next/find_prev (or their FAR versions), followed by a short walk.
+static void op_next_prev(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key k = gen_key(m);
+    bool is_next = rnd() & 1;
+    bool far = rnd() & 1;
+    glass_Iter it;
+    size_t pos;
+    if (is_next) {
+        op_name = far ? "find_next_FAR" : "find_next";
+        it = far ? glass_find_next_FAR(g, k) : glass_find_next(g, k);
+        pos = model_upper(m, k);
+    } else {
+        op_name = far ? "find_prev_FAR" : "find_prev";
+        it = far ? glass_find_prev_FAR(g, k) : glass_find_prev(g, k);
+        pos = model_lower(m, k) - 1;
+    }
+    pos = pos_or_none(m, pos);
+    check_iter(gi, it, pos);
+
+    op_name = "iter_next/iter_prev";
+    for (int nsteps = rnd_below(8); nsteps && pos != SIZE_MAX; --nsteps) {
+        bool fwd = rnd() & 1;
+        far = rnd() & 1;
+        if (fwd) {
+            it = far ? glass_iter_next_FAR(g, it) : glass_iter_next(g, it);
+            pos = pos_or_none(m, pos + 1);
+        } else {
+            it = far ? glass_iter_prev_FAR(g, it) : glass_iter_prev(g, it);
+            pos = pos_or_none(m, pos - 1);
+        }
+        check_iter(gi, it, pos);
+    }
+}
+
+static void op_first_last(int gi)
+{
+    op_name = "begin/last";
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    check_iter(gi, glass_begin(g), pos_or_none(m, 0));
+    check_iter(gi, glass_last(g), pos_or_none(m, m->n - 1));
+}
+
+static void op_copy(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key keys[MAX_COPY];
+    fuzz_Value vals[MAX_COPY];
+    size_t max = rnd_below(MAX_COPY + 1);
+
+    if (rnd() & 1) {
+        op_name = "copy_range";
+        fuzz_Key lo = gen_key(m);
+        fuzz_Key hi = rnd() & 1 ? gen_key(m) : lo + (fuzz_Key) rnd_below(1 << 12);
+        if (hi < lo && rnd() & 1) {
+            hi = FUZZ_MAX_KEY;
+        }
+        size_t n = glass_copy_range(g, lo, hi, keys, vals, max);
+        size_t a = model_lower(m, lo);
+        size_t b = lo > hi ? a : model_upper(m, hi);
+        size_t expected = b - a < max ? b - a : max;
+        CHECK(n == expected);
+        for (size_t i = 0; i < n; ++i) {
+            CHECK(keys[i] == m->keys[a + i]);
+            CHECK(vals[i] == m->vals[a + i]);
+        }
+    } else {
+        op_name = "copy_top_n";
+        bool from_last = rnd() & 1;
+        size_t n = glass_copy_top_n(g, max, from_last, keys, vals);
+        size_t expected = m->n < max ? m->n : max;
+        CHECK(n == expected);
+        for (size_t i = 0; i < n; ++i) {
+            size_t j = from_last ? m->n - 1 - i : i;
+            CHECK(keys[i] == m->keys[j]);
+            CHECK(vals[i] == m->vals[j]);
+        }
+    }
+}
+
+static void op_erase_range(int gi)
+{
+    op_name = "erase_range";
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key lo = gen_key(m);
+    fuzz_Key hi;
+    switch (rnd_below(5)) {
+    case 0:
+        hi = gen_key(m);
+        break;
+    case 1:
+        // Beyond the largest possible key.
+        hi = (fuzz_Key) -1;
+        break;
+    case 2:
+        hi = lo + (fuzz_Key) rnd_below(1 << 20);
+        break;
+    default:
+        hi = lo + (fuzz_Key) rnd_below(16);
+        break;
+    }
+    if (hi < lo && rnd() & 1) {
+        hi = FUZZ_MAX_KEY;
+    }
+    size_t n = glass_erase_range(g, lo, hi);
+    CHECK(n == model_erase_range(m, lo, hi));
+}
+
+static void op_batch(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key keys[MAX_BATCH];
+    fuzz_Value vals[MAX_BATCH];
+    bool out[MAX_BATCH];
+    bool is_insert = rnd() & 1;
+    size_t n = rnd_below(MAX_BATCH + 1);
+    if (is_insert && !has_room(gi, n)) {
+        return;
+    }
+    for (size_t i = 0; i < n; ++i) {
+        // Some keys are repeated within the batch.
+        keys[i] = i && !rnd_below(4) ? keys[rnd_below(i)] : is_insert ? gen_key(m) : gen_present_key(m);
+        vals[i] = gen_value(gi, keys[i]);
+    }
+    bool *out_or_null = rnd_below(4) ? out : NULL;
+
+    if (is_insert) {
+        op_name = "insert_batch";
+        glass_insert_batch(g, keys, vals, n, out_or_null);
+        for (size_t i = 0; i < n; ++i) {
+            bool existed = model_insert(m, keys[i], vals[i]);
+            CHECK(!out_or_null || out[i] == existed);
+        }
+    } else {
+        op_name = "erase_batch";
+        glass_erase_batch(g, keys, n, out_or_null);
+        for (size_t i = 0; i < n; ++i) {
+            bool erased = model_erase(m, keys[i]);
+            CHECK(!out_or_null || out[i] == erased);
+        }
+    }
+}
+
+// Looks keys up in all the instances at once; 'gi' is not used.
+static void op_find_many(int gi)
+{
+    (void) gi;
+    op_name = "find_many";
+    enum { MAX_N = 40 };
+    glass_Glass *ptrs[MAX_N];
+    fuzz_Key keys[MAX_N];
+    glass_Iter out[MAX_N];
+    int which[MAX_N];
+    size_t n = rnd_below(MAX_N + 1);
+    for (size_t i = 0; i < n; ++i) {
+        which[i] = rnd_below(NG);
+        ptrs[i] = &gs[which[i]];
+        keys[i] = gen_present_key(&models[which[i]]);
+    }
+    glass_find_many(ptrs, keys, n, out);
+    for (size_t i = 0; i < n; ++i) {
+        size_t pos;
+        check_iter(which[i], out[i], model_has(&models[which[i]], keys[i], &pos) ? pos : SIZE_MAX);
+    }
+}
+
+// The model of a merge cursor: 'pos[j]' is the index of the next element of instance 'which[j]' to be emitted
+// (plus one when going backwards).
+typedef struct {
+    size_t n;
+    int which[NG];
+    size_t pos[NG];
+    bool is_next;
+} MergeModel;
+
+static bool merge_model_peek(const MergeModel *mm, size_t j, fuzz_Key *k)
+{
+    const Model *m = &models[mm->which[j]];
+    if (mm->is_next) {
+        if (mm->pos[j] >= m->n) {
+            return false;
+        }
+        *k = m->keys[mm->pos[j]];
+    } else {
+        if (!mm->pos[j]) {
+            return false;
+        }
+        *k = m->keys[mm->pos[j] - 1];
+    }
+    return true;
+}
+
+static bool merge_model_next(MergeModel *mm, fuzz_Key *k_out)
+{
+    bool found = false;
+    fuzz_Key best = 0;
+    for (size_t j = 0; j < mm->n; ++j) {
+        fuzz_Key k;
+        if (merge_model_peek(mm, j, &k) && (!found || (mm->is_next ? k < best : k > best))) {
+            best = k;
+            found = true;
+        }
+    }
+    if (found) {
+        *k_out = best;
+    }
+    return found;
+}
+
+// Moves past 'k'; returns the number of instances that had it.
+static size_t merge_model_advance(MergeModel *mm, fuzz_Key k)
+{
+    size_t nhits = 0;
+    for (size_t j = 0; j < mm->n; ++j) {
+        fuzz_Key kj;
+        if (merge_model_peek(mm, j, &kj) && kj == k) {
+            mm->pos[j] += mm->is_next ? 1 : -1;
+            ++nhits;
+        }
+    }
+    return nhits;
+}
+
+// Merges a random subset of the instances; 'gi' is not used.
+static void op_merge(int gi)
+{
+    (void) gi;
+    op_name = "merge";
+    MergeModel mm = {.n = 1 + rnd_below(NG), .is_next = rnd() & 1};
+    int perm[NG];
+    for (int j = 0; j < NG; ++j) {
+        perm[j] = j;
+    }
+    for (int j = NG - 1; j > 0; --j) {
+        int t = rnd_below(j + 1);
+        int tmp = perm[j];
+        perm[j] = perm[t];
+        perm[t] = tmp;
+    }
+    glass_Glass *ptrs[NG];
+    for (size_t j = 0; j < mm.n; ++j) {
+        mm.which[j] = perm[j];
+        ptrs[j] = &gs[perm[j]];
+        mm.pos[j] = mm.is_next ? 0 : models[perm[j]].n;
+    }
+
+    glass_Merge mc;
+    glass_merge_begin(&mc, ptrs, mm.n, mm.is_next);
+    for (;;) {
+        if (!rnd_below(8)) {
+            const Model *m = &models[mm.which[rnd_below(mm.n)]];
+            fuzz_Key k = gen_key(m);
+            glass_merge_skip_to(&mc, k);
+            for (size_t j = 0; j < mm.n; ++j) {
+                const Model *mj = &models[mm.which[j]];
+                if (mm.is_next) {
+                    size_t p = model_lower(mj, k);
+                    if (mm.pos[j] < p) {
+                        mm.pos[j] = p;
+                    }
+                } else {
+                    size_t p = model_upper(mj, k);
+                    if (mm.pos[j] > p) {
+                        mm.pos[j] = p;
+                    }
+                }
+            }
+        }
+
+        if (!rnd_below(8)) {
+            enum { MAX_COPY_KEYS = 8 };
+            fuzz_Key keys[MAX_COPY_KEYS];
+            size_t nhits[MAX_COPY_KEYS];
+            size_t max = rnd_below(MAX_COPY_KEYS + 1);
+            size_t n = glass_merge_copy(&mc, max, keys, nhits);
+            size_t i = 0;
+            fuzz_Key k;
+            for (; i < max && merge_model_next(&mm, &k); ++i) {
+                CHECK(i < n);
+                CHECK(keys[i] == k);
+                CHECK(nhits[i] == merge_model_advance(&mm, k));
+            }
+            CHECK(n == i);
+            if (n < max) {
+                break;
+            }
+            continue;
+        }
+
+        fuzz_Key k;
+        fuzz_Key expected;
+        bool got = glass_merge_next(&mc, &k);
+        CHECK(got == merge_model_next(&mm, &expected));
+        if (!got) {
+            break;
+        }
+        CHECK(k == expected);
+        CHECK(mc.nhits == merge_model_advance(&mm, k));
+        for (size_t i = 0; i < mc.nhits; ++i) {
+            size_t j = mc.hits[i];
+            CHECK(j < mm.n);
+            size_t pos;
+            CHECK(model_has(&models[mm.which[j]], k, &pos));
+            check_iter(mm.which[j], mc.its[j], pos);
+        }
+    }
+    glass_merge_destroy(&mc);
+}
+
+static void op_clear(int gi)
+{
+    op_name = "clear";
+    glass_clear(&gs[gi], rnd() & 1);
+    models[gi].n = 0;
+    check_full(gi);
+}
+
+static void op_compact(int gi)
+{
+    op_name = "compact";
+    glass_compact(&gs[gi], rnd() & 1);
+    check_full(gi);
+}
+
+// Re-creates the instance from its elements.
+static void op_rebuild(int gi)
+{
+    if (reader_watches(gi)) {
+        return;
+    }
+    op_name = "create_from_sorted";
+    Model *m = &models[gi];
+#if FUZZ_WITH_AUTO_SHRINK
+    latency_critical[gi] = 0;
+#endif
+    glass_destroy(&gs[gi]);
+    glass_create_from_sorted(&gs[gi], m->keys, m->vals, m->n);
+    check_full(gi);
+}
+
+#if FUZZ_WITH_SNAPSHOT
+// Writes a snapshot of the instance, then maps it back: read-only first, to check it, and then writable, so that
+// the rest of the run goes on with the mapping.
+static void op_snapshot(int gi)
+{
+    if (reader_watches(gi)) {
+        return;
+    }
+    glass_Glass *g = &gs[gi];
+    const char *dir = getenv("TMPDIR");
+    char path[4096];
+    snprintf(path, sizeof(path), "%s/glass_fuzz_XXXXXX", dir ? dir : "/tmp");
+    int fd = mkstemp(path);
+    CHECK(fd >= 0);
+
+    op_name = "snapshot_write";
+#if FUZZ_WITH_ARENA
+    if (g->arena) {
+        // Instances that live in an arena can not be snapshotted.
+        CHECK(glass_snapshot_write(g, fd) < 0 && errno == EINVAL);
+        close(fd);
+        unlink(path);
+        return;
+    }
+#endif
+    CHECK(glass_snapshot_write(g, fd) == 0);
+    close(fd);
+    glass_destroy(g);
+#if FUZZ_WITH_AUTO_SHRINK
+    latency_critical[gi] = 0;
+#endif
+
+    op_name = "snapshot_map (read-only)";
+    CHECK(glass_snapshot_map(g, path, false) == 0);
+    check_full(gi);
+    glass_destroy(g);
+
+    op_name = "snapshot_map";
+    CHECK(glass_snapshot_map(g, path, true) == 0);
+    unlink(path);
+    check_full(gi);
+}
+#endif
+
+#if FUZZ_WITH_COUNTS
+static void op_rank_select(int gi)
+{
+    glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    if (rnd() & 1) {
+        op_name = "rank";
+        fuzz_Key k = rnd_below(16) ? gen_key(m) : (fuzz_Key) -1;
+        CHECK(glass_rank(g, k) == model_lower(m, k));
+    } else {
+        op_name = "select";
+        size_t i = rnd_below(m->n + 2);
+        check_iter(gi, glass_select(g, i), pos_or_none(m, i));
+    }
+}
+#endif
+
+#if FUZZ_WITH_SEQLOCK
+static void op_seq(int gi)
+{
+    const glass_Glass *g = &gs[gi];
+    Model *m = &models[gi];
+    fuzz_Key k = gen_present_key(m);
+    fuzz_Key k_out;
+    fuzz_Value v;
+    size_t pos;
+    switch (rnd_below(4)) {
+    case 0: {
+        op_name = "seq_find";
+        bool found = glass_seq_find(g, k, &v);
+        CHECK(found == model_has(m, k, &pos));
+        CHECK(!found || v == m->vals[pos]);
+        break;
+    }
+    case 1: {
+        bool from_last = rnd() & 1;
+        op_name = from_last ? "seq_last" : "seq_first";
+        bool found = from_last ? glass_seq_last(g, &k_out, &v) : glass_seq_first(g, &k_out, &v);
+        CHECK(found == (m->n != 0));
+        pos = from_last ? m->n - 1 : 0;
+        CHECK(!found || (k_out == m->keys[pos] && v == m->vals[pos]));
+        break;
+    }
+    case 2: {
+        bool is_next = rnd() & 1;
+        op_name = is_next ? "seq_find_next" : "seq_find_prev";
+        bool found = is_next ? glass_seq_find_next(g, k, &k_out, &v) : glass_seq_find_prev(g, k, &k_out, &v);
+        pos = pos_or_none(m, is_next ? model_upper(m, k) : model_lower(m, k) - 1);
+        CHECK(found == (pos != SIZE_MAX));
+        CHECK(!found || (k_out == m->keys[pos] && v == m->vals[pos]));
+        break;
+    }
+    default: {
+        fuzz_Key keys[MAX_COPY];
+        fuzz_Value vals[MAX_COPY];
+        size_t max = rnd_below(MAX_COPY + 1);
+        if (rnd() & 1) {
+            op_name = "seq_copy_range";
+            fuzz_Key hi = k + (fuzz_Key) rnd_below(1 << 12);
+            if (hi < k) {
+                hi = FUZZ_MAX_KEY;
+            }
+            size_t n = glass_seq_copy_range(g, k, hi, keys, vals, max);
+            size_t a = model_lower(m, k);
+            size_t b = model_upper(m, hi);
+            CHECK(n == (b - a < max ? b - a : max));
+            for (size_t i = 0; i < n; ++i) {
+                CHECK(keys[i] == m->keys[a + i] && vals[i] == m->vals[a + i]);
+            }
+        } else {
+            op_name = "seq_copy_top_n";
+            bool from_last = rnd() & 1;
+            size_t n = glass_seq_copy_top_n(g, max, from_last, keys, vals);
+            CHECK(n == (m->n < max ? m->n : max));
+            for (size_t i = 0; i < n; ++i) {
+                size_t j = from_last ? m->n - 1 - i : i;
+                CHECK(keys[i] == m->keys[j] && vals[i] == m->vals[j]);
+            }
+        }
+        break;
+    }
+    }
+}
+#endif
+
+#if FUZZ_WITH_AUTO_SHRINK
+static void op_latency_critical(int gi)
+{
+    op_name = "latency_critical";
+    if (latency_critical[gi] < 3 && rnd() & 1) {
+        glass_latency_critical_begin(&gs[gi]);
+        ++latency_critical[gi];
+    } else if (latency_critical[gi]) {
+        glass_latency_critical_end(&gs[gi]);
+        --latency_critical[gi];
+    }
+}
+#endif
+
+static void op_check_full(int gi)
+{
+    op_name = "check_full";
+    check_full(gi);
+}
+
+#if FUZZ_WITH_SEQLOCK
+// The reader thread: looks up keys of instance 0 (whose values are 'vmix' of their keys) with the '@seq_*'
+// functions. The writer pauses it to call '@seq_reclaim'.
+enum { READER_RUN, READER_PAUSE_REQUESTED, READER_PAUSED };
+
+static atomic_int reader_state;
+static atomic_bool reader_stop;
+static pthread_t reader_thread;
+
+static void *reader_main(void *arg)
+{
+    (void) arg;
+    uint64_t state = seed ^ 0x5DEECE66Du;
+    const glass_Glass *g = &gs[0];
+    while (!atomic_load(&reader_stop)) {
+        if (atomic_load(&reader_state) == READER_PAUSE_REQUESTED) {
+            atomic_store(&reader_state, READER_PAUSED);
+            while (atomic_load(&reader_state) == READER_PAUSED) {
+            }
+            continue;
+        }
+        uint64_t r = rnd_next(&state);
+        fuzz_Key k = (r & 1 ? cluster_base + (fuzz_Key) ((r >> 1) % (1 << 16)) : (fuzz_Key) ((r >> 1) % 1024));
+        k &= FUZZ_MAX_KEY;
+        fuzz_Value v;
+        if (glass_seq_find(g, k, &v) && v != vmix(k)) {
+            fail(__LINE__, "reader: seq_find returned a wrong value");
+        }
+
+        fuzz_Key keys[MAX_COPY];
+        fuzz_Value vals[MAX_COPY];
+        fuzz_Key hi = k + 4096 < k ? FUZZ_MAX_KEY : k + 4096;
+        size_t n = glass_seq_copy_range(g, k, hi, keys, vals, MAX_COPY);
+        for (size_t i = 0; i < n; ++i) {
+            if (keys[i] < k || keys[i] > hi || (i && keys[i] <= keys[i - 1]) || vals[i] != vmix(keys[i])) {
+                fail(__LINE__, "reader: seq_copy_range returned a wrong element");
+            }
+        }
+    }
+    return NULL;
+}
+
+static void reclaim(void)
+{
+    atomic_store(&reader_state, READER_PAUSE_REQUESTED);
+    while (atomic_load(&reader_state) != READER_PAUSED) {
+    }
+    for (int gi = 0; gi < NG; ++gi) {
+        glass_seq_reclaim(&gs[gi]);
+    }
+    atomic_store(&reader_state, READER_RUN);
+}
+#endif
+
+// The operations, with their relative frequencies.
+static const struct {
+    void (*func)(int gi);
+    int weight;
+} OPS[] = {
+    {op_insert, 30},
+    {op_erase, 15},
+    {op_find, 13},
+    {op_replace, 4},
+    {op_next_prev, 7},
+    {op_first_last, 2},
+    {op_copy, 4},
+    {op_erase_range, 3},
+    {op_batch, 5},
+    {op_find_many, 3},
+    {op_merge, 1},
+    {op_clear, 1},
+    {op_rebuild, 1},
+    {op_compact, 2},
+#if FUZZ_WITH_SNAPSHOT
+    {op_snapshot, 1},
+#endif
+#if FUZZ_WITH_COUNTS
+    {op_rank_select, 3},
+#endif
+#if FUZZ_WITH_SEQLOCK
+    {op_seq, 3},
+#endif
+#if FUZZ_WITH_AUTO_SHRINK
+    {op_latency_critical, 2},
+#endif
+    {op_check_full, 4},
+};
+
+static void random_op(void)
+{
+    int total = 0;
+    for (size_t i = 0; i < sizeof(OPS) / sizeof(OPS[0]); ++i) {
+        total += OPS[i].weight;
+    }
+    int r = rnd_below(total);
+    for (size_t i = 0; ; ++i) {
+        if ((r -= OPS[i].weight) < 0) {
+            OPS[i].func(rnd_below(NG));
+            return;
+        }
+    }
+}
+
+int main(int argc, char **argv)
+{
+    seed = argc > 1 ? strtoull(argv[1], NULL, 10) : 1;
+    long nsteps = argc > 2 ? strtol(argv[2], NULL, 10) : 100000;
+    rng_state = seed;
+    cluster_base = (fuzz_Key) rnd() & FUZZ_MAX_KEY;
+    max_live = pick_max_live();
+    CHECK(max_live > 0);
+
+#if FUZZ_WITH_ARENA
+    glass_arena_create(&arena, glass_max_capacity() < (size_t) 1 << 20 ? glass_max_capacity() : (size_t) 1 << 20);
+    for (int gi = 0; gi < NG; ++gi) {
+        glass_create_in_arena(&gs[gi], &arena, rnd_below(64));
+    }
+#else
+    for (int gi = 0; gi < NG; ++gi) {
+        glass_create(&gs[gi], rnd_below(64));
+    }
+#endif
+
+#if FUZZ_WITH_SEQLOCK
+    if (pthread_create(&reader_thread, NULL, reader_main, NULL)) {
+        fail(__LINE__, "pthread_create");
+    }
+#endif
+
+    for (step = 0; step < nsteps; ++step) {
+        random_op();
+#if FUZZ_WITH_SEQLOCK
+        if (!(step & 255)) {
+            reclaim();
+        }
+#endif
+    }
+
+    op_name = "final check";
+    for (int gi = 0; gi < NG; ++gi) {
+#if FUZZ_WITH_AUTO_SHRINK
+        for (; latency_critical[gi]; --latency_critical[gi]) {
+            glass_latency_critical_end(&gs[gi]);
+        }
+#endif
+        check_full(gi);
+    }
+
+#if FUZZ_WITH_SEQLOCK
+    atomic_store(&reader_stop, true);
+    atomic_store(&reader_state, READER_RUN);
+    pthread_join(reader_thread, NULL);
+#endif
+
+    for (int gi = 0; gi < NG; ++gi) {
+        glass_destroy(&gs[gi]);
+        free(models[gi].keys);
+        free(models[gi].vals);
+    }
+#if FUZZ_WITH_ARENA
+    glass_arena_destroy(&arena);
+#endif
+
+    printf("ok: seed %" PRIu64 ", %ld steps\n", seed, nsteps);
+    return 0;
+}
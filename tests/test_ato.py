@@ -0,0 +1,240 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR, ato, compile_c, glass_prelude
+
+
+def test_cached_output_is_the_same(tmp_path):
+    path = os.path.join(ROOT_DIR, 'glass.ato')
+    cache_dir = str(tmp_path / 'cache')
+    expected = ato.preprocess(path, include_root=ROOT_DIR, use_cache=False)
+    assert ato.preprocess(path, include_root=ROOT_DIR, cache_dir=cache_dir) == expected
+    assert ato.preprocess(path, include_root=ROOT_DIR, cache_dir=cache_dir) == expected
+
+
+def test_cache_entry_is_used(tmp_path):
+    path = os.path.join(ROOT_DIR, 'glass_prevnext.ato')
+    cache_dir = tmp_path / 'cache'
+    ato.preprocess(path, include_root=ROOT_DIR, cache_dir=str(cache_dir))
+    (entry_path,) = cache_dir.iterdir()
+
+    entry = json.loads(entry_path.read_text())
+    entry['output'] = 'from the cache'
+    entry_path.write_text(json.dumps(entry))
+    assert ato.preprocess(path, include_root=ROOT_DIR, cache_dir=str(cache_dir)) == 'from the cache'
+
+
+def test_changed_include_is_a_miss(tmp_path):
+    (tmp_path / 'main.ato').write_text('@@project T\n\n@@include part.inc\n')
+    (tmp_path / 'part.inc').write_text('int @x = 1;\n')
+    path = str(tmp_path / 'main.ato')
+    cache_dir = str(tmp_path / 'cache')
+    assert 'T_NAME(x) = 1;' in ato.preprocess(path, include_root=str(tmp_path), cache_dir=cache_dir)
+
+    (tmp_path / 'part.inc').write_text('int @x = 2;\n')
+    assert 'T_NAME(x) = 2;' in ato.preprocess(path, include_root=str(tmp_path), cache_dir=cache_dir)
+
+
+@pytest.mark.parametrize('entry', [
+    '{"output": "x"}',
+    '{"deps": [["a"]], "output": "x"}',
+    '{"deps": 5, "output": "x"}',
+    '{"deps": [], "output": 5}',
+    '[]',
+    '{"deps": [',
+])
+def test_malformed_cache_entry_is_a_miss(tmp_path, entry):
+    path = os.path.join(ROOT_DIR, 'glass_prevnext.ato')
+    cache_dir = tmp_path / 'cache'
+    expected = ato.preprocess(path, include_root=ROOT_DIR, cache_dir=str(cache_dir))
+    (entry_path,) = cache_dir.iterdir()
+
+    entry_path.write_text(entry)
+    assert ato.preprocess(path, include_root=ROOT_DIR, cache_dir=str(cache_dir)) == expected
+    # The entry has been rewritten.
+    assert entry_path.read_text() != entry
+
+
+def test_write_if_changed(tmp_path):
+    path = str(tmp_path / 'out.h')
+    ato.write_if_changed(path, 'a\n')
+    os.utime(path, (0, 0))
+    ato.write_if_changed(path, 'a\n')
+    assert os.stat(path).st_mtime == 0
+    ato.write_if_changed(path, 'b\n')
+    assert os.stat(path).st_mtime != 0
+    with open(path) as f:
+        assert f.read() == 'b\n'
+
+
+SMOKE_PROG = r'''
+int main(void)
+{
+    glass_Glass g;
+    glass_create(&g, 0);
+    for (uint64_t k = 0; k < 1000; ++k) {
+        glass_insert(&g, k * 7, (uint32_t) k);
+    }
+    uint64_t sum = 0;
+    for (glass_Iter it = glass_begin(&g); !glass_iter_is_end(it); it = glass_iter_next(&g, it)) {
+        sum += glass_iter_get_key(&g, it);
+    }
+    printf("%" PRIu64 "\n", sum);
+    glass_destroy(&g);
+    return 0;
+}
+'''
+
+
+def gen_specialized(out_dir, defines):
+    text = ato.preprocess(os.path.join(ROOT_DIR, 'glass_prevnext.ato'), include_root=ROOT_DIR, use_cache=False)
+    (out_dir / 'glass_prevnext.h').write_text(text)
+    text = ato.preprocess(
+        os.path.join(ROOT_DIR, 'glass.ato'), include_root=ROOT_DIR, defines=defines, use_cache=False)
+    (out_dir / 'glass.h').write_text(text)
+
+
+def build_specialized(tmp_path, defines, includer_defines, check=True):
+    gen_specialized(tmp_path, {k: str(v) for k, v in defines.items()})
+    src = tmp_path / 'prog.c'
+    # The whole configuration, GLASS_PREFIX included, comes with the specialized header.
+    src.write_text(glass_prelude(includer_defines).replace('#define GLASS_PREFIX glass\n', '') + SMOKE_PROG)
+    exe = str(tmp_path / 'prog')
+    proc = compile_c(str(src), exe, [str(tmp_path), ROOT_DIR], check=check)
+    return exe if check else proc
+
+
+def test_specialized_header_works(tmp_path, base_defines):
+    exe = build_specialized(tmp_path, {**base_defines, 'GLASS_PREFIX': 'glass', 'GLASS_WITH_HT': 0}, {})
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    assert int(out) == 7 * 999 * 1000 // 2
+
+
+def test_specialized_header_rejects_given_macros(tmp_path, base_defines):
+    defines = {**base_defines, 'GLASS_PREFIX': 'glass', 'GLASS_WITH_HT': 0}
+    proc = build_specialized(tmp_path, defines, {'GLASS_WITH_HT': 0}, check=False)
+    assert proc.returncode != 0
+    assert 'specialized for GLASS_WITH_HT=0;' in proc.stderr
+
+
+@pytest.mark.parametrize('name', ['GLASS_WITH_HT', 'GLASS_WITH_ASSERTS', 'GLASS_WITH_COMPAT_SHIM'])
+def test_specialized_header_rejects_config_macros(tmp_path, base_defines, name):
+    defines = {**base_defines, 'GLASS_PREFIX': 'glass'}
+    defines.pop(name, None)
+    proc = build_specialized(tmp_path, defines, {name: 0}, check=False)
+    assert proc.returncode != 0
+    assert f'specialized for the default {name};' in proc.stderr
+
+
+# A deterministic workload that prints a digest of everything it has seen; it does not depend on the configuration
+# (other than the key and value types), so it can be built against headers generated in different ways.
+DIGEST_PROG = r'''
+static uint64_t digest = 14695981039346656037u;
+
+static void feed(uint64_t x)
+{
+    digest = (digest ^ x) * 1099511628211u;
+}
+
+static void feed_iter(glass_Glass *g, glass_Iter it)
+{
+    if (glass_iter_is_end(it)) {
+        feed(~(uint64_t) 0);
+    } else {
+        feed(glass_iter_get_key(g, it));
+        feed(glass_iter_get_value(g, it));
+    }
+}
+
+int main(void)
+{
+    glass_Glass g;
+    glass_create(&g, 0);
+    uint64_t state = 1;
+    for (int i = 0; i < 200000; ++i) {
+        state = state * 6364136223846793005u + 1442695040888963407u;
+        uint64_t r = state >> 33;
+        uint64_t k = (r >> 4) % 5000;
+        switch (r % 8) {
+        case 0: case 1: case 2:
+            feed(glass_insert(&g, k, (uint32_t) r));
+            break;
+        case 3: case 4:
+            feed(glass_erase(&g, k));
+            break;
+        case 5:
+            feed_iter(&g, glass_find(&g, k));
+            break;
+        case 6:
+            feed_iter(&g, r & 1 ? glass_find_next(&g, k) : glass_find_prev(&g, k));
+            break;
+        default:
+            feed(glass_erase_range(&g, k, k + (r >> 20) % 16));
+            break;
+        }
+    }
+    for (glass_Iter it = glass_begin(&g); !glass_iter_is_end(it); it = glass_iter_next(&g, it)) {
+        feed_iter(&g, it);
+    }
+    feed(g.size);
+    printf("%" PRIu64 "\n", digest);
+    glass_destroy(&g);
+    return 0;
+}
+'''
+
+
+@pytest.mark.parametrize('config', [
+    {},
+    {'GLASS_WITH_HT_OPEN': 1, 'GLASS_CACHE_WAYS': 2, 'GLASS_WITH_COUNTS': 1},
+    {'GLASS_WITH_HT': 0, 'GLASS_WITH_FIRST_LAST_PTRS': 0, 'GLASS_WITH_SSIZE': 1, 'GLASS_SSIZE': 'int32_t'},
+], ids=['default', 'ht_open', 'no_ht'])
+def test_manifest_variants_agree(tmp_path, base_defines, config):
+    # The same configuration three ways: given by the includer, prepended by the manifest, and pruned.
+    defines = {**base_defines, **config}
+    pruned_defines = {'GLASS_PREFIX': 'glass', **defines}
+    manifest = {
+        'include_root': ROOT_DIR,
+        'variants': [
+            {'input': os.path.join(ROOT_DIR, 'glass_prevnext.ato'), 'output': 'glass_prevnext.h'},
+            {'input': os.path.join(ROOT_DIR, 'glass.ato'), 'output': 'plain/glass.h'},
+            {'input': os.path.join(ROOT_DIR, 'glass.ato'), 'output': 'defined/glass.h', 'defines': pruned_defines},
+            {
+                'input': os.path.join(ROOT_DIR, 'glass.ato'),
+                'output': 'pruned/glass.h',
+                'defines': pruned_defines,
+                'prune': True,
+            },
+        ],
+    }
+    for name in ['plain', 'defined', 'pruned']:
+        (tmp_path / name).mkdir()
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text(json.dumps(manifest))
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT_DIR, 'ato.py'), '--manifest', str(manifest_path), '--no-cache'],
+        check=True)
+
+    pruned_text = (tmp_path / 'pruned' / 'glass.h').read_text()
+    assert len(pruned_text) < len((tmp_path / 'plain' / 'glass.h').read_text())
+
+    preludes = {
+        'plain': glass_prelude(defines),
+        'defined': '#include "common.h"\n#include "glass.h"\n',
+        'pruned': '#include "common.h"\n#include "glass.h"\n',
+    }
+    outputs = {}
+    for name, prelude in preludes.items():
+        src = tmp_path / name / 'prog.c'
+        src.write_text(prelude + DIGEST_PROG)
+        exe = str(tmp_path / name / 'prog')
+        compile_c(str(src), exe, [str(tmp_path / name), str(tmp_path), ROOT_DIR])
+        outputs[name] = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    assert outputs['plain'] == outputs['defined'] == outputs['pruned']
@@ -0,0 +1,52 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import subprocess
+
+import pytest
+
+
+HT_LOOKUP_PROG = r'''
+int main(void)
+{
+    glass_Glass g;
+    glass_create(&g, 0);
+    // A single leaf: no hash table probe can be long enough to give up.
+    for (uint64_t k = 0; k < 8; ++k) {
+        glass_insert(&g, k, (uint32_t) k);
+    }
+
+    glass_stats_reset(&g);
+    for (uint64_t j = 1; j <= 10; ++j) {
+        if (!glass_iter_is_end(glass_find(&g, (j << 40) + j * 12345))) {
+            return 1;
+        }
+    }
+    glass_Stats s;
+    glass_stats_snapshot(&g, &s);
+    for (int b = 0; b < 3; ++b) {
+        printf("%" PRIu64 "\n", s.counters[glass__CHANNEL_HT_LOOKUP][b]);
+    }
+
+    glass_destroy(&g);
+    return 0;
+}
+'''
+
+
+@pytest.mark.parametrize('ssize', [0, 1])
+@pytest.mark.parametrize('ht_open', [0, 1])
+def test_ht_lookup_absent_keys(build_glass, base_defines, ssize, ht_open):
+    defines = {
+        **base_defines,
+        'GLASS_WITH_HT': 1,
+        'GLASS_WITH_HT_OPEN': ht_open,
+        'GLASS_WITH_COUNTERS': 1,
+        'GLASS_WITH_SSIZE': ssize,
+    }
+    if ssize:
+        defines['GLASS_SSIZE'] = 'int32_t'
+    exe = build_glass(HT_LOOKUP_PROG, defines)
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    # Bucket 0 is "the key is not present", bucket 1 is "don't know".
+    assert [int(x) for x in out.split()] == [10, 0, 0]
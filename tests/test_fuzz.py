@@ -0,0 +1,88 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+# Runs the differential fuzzer ("fuzz.c") in a number of configurations. FUZZ_STEPS and FUZZ_SEEDS override the
+# defaults, e.g. 'FUZZ_STEPS=1000000 FUZZ_SEEDS=1,2,3,4 python -m pytest tests/test_fuzz.py'.
+
+import functools
+import os
+import subprocess
+
+import pytest
+
+from conftest import TESTS_DIR, compile_c
+
+
+STEPS = int(os.environ.get('FUZZ_STEPS', '10000'))
+SEEDS = [int(s) for s in os.environ.get('FUZZ_SEEDS', '1,2').split(',')]
+
+CONFIGS = {
+    'default': {},
+    'ssize': {'GLASS_WITH_SSIZE': 1, 'GLASS_SSIZE': 'int32_t'},
+    'trash_encoding': {'GLASS_WITH_TRASH_ENCODING': 1},
+    'no_add_node_multiple': {'GLASS_WITH_ADD_NODE_MULTIPLE': 0},
+    'no_cache': {'GLASS_WITH_CACHE': 0},
+    'cache_ways': {'GLASS_CACHE_WAYS': 3},
+    'no_cache_no_ht': {'GLASS_WITH_CACHE': 0, 'GLASS_WITH_HT': 0},
+    'no_first_last_ptrs': {'GLASS_WITH_FIRST_LAST_PTRS': 0},
+    'eager_first_last_ptrs': {'GLASS_WITH_FIRST_LAST_PTRS_LAZY': 0},
+    'no_ht': {'GLASS_WITH_HT': 0},
+    'no_ht_prev_ptr': {'GLASS_WITH_HT_PREV_PTR': 0},
+    'ht_health_checks': {'GLASS_WITH_HT_HEALTH_CHECKS': 1},
+    'ht_open': {'GLASS_WITH_HT_OPEN': 1, 'GLASS_WITH_HT_HEALTH_CHECKS': 1},
+    'ht_open_snapshot': {'GLASS_WITH_HT_OPEN': 1, 'GLASS_WITH_HT_HEALTH_CHECKS': 1, 'GLASS_WITH_SNAPSHOT': 1},
+    'asserts': {'GLASS_WITH_ASSERTS': 1},
+    'uint16_size': {'GLASS_SIZE': 'uint16_t'},
+    'small_k': {'GLASS_K': 20},
+    'counters': {'GLASS_WITH_COUNTERS': 1},
+    'counts': {'GLASS_WITH_COUNTS': 1, 'GLASS_WITH_ASSERTS': 1},
+    'arena': {'GLASS_WITH_ARENA': 1},
+    'snapshot': {'GLASS_WITH_SNAPSHOT': 1},
+    'snapshot_no_ht': {'GLASS_WITH_SNAPSHOT': 1, 'GLASS_WITH_HT': 0},
+    'seqlock': {'GLASS_WITH_SEQLOCK': 1},
+    'auto_shrink': {'GLASS_WITH_AUTO_SHRINK': 1, 'GLASS_AUTO_SHRINK_MIN_CAPACITY': 4},
+    'everything': {
+        'GLASS_WITH_SSIZE': 1,
+        'GLASS_SSIZE': 'int32_t',
+        'GLASS_CACHE_WAYS': 2,
+        'GLASS_WITH_COUNTS': 1,
+        'GLASS_WITH_ARENA': 1,
+        'GLASS_WITH_SNAPSHOT': 1,
+        'GLASS_WITH_SEQLOCK': 1,
+        'GLASS_WITH_AUTO_SHRINK': 1,
+    },
+}
+
+
+@functools.lru_cache(maxsize=None)
+def sanitizer_flags(tmp_dir):
+    """Returns the sanitizer flags if the compiler (and its runtime) supports them, otherwise nothing."""
+    src = os.path.join(tmp_dir, 'probe.c')
+    with open(src, 'w') as f:
+        f.write('int main(void) { return 0; }\n')
+    flags = ('-fsanitize=address,undefined', '-fno-sanitize-recover=undefined')
+    exe = os.path.join(tmp_dir, 'probe')
+    if compile_c(src, exe, [], extra_flags=flags, check=False).returncode:
+        return ()
+    if subprocess.run([exe], capture_output=True).returncode:
+        return ()
+    return flags
+
+
+@pytest.fixture(scope='module')
+def sanitizers(tmp_path_factory):
+    return sanitizer_flags(str(tmp_path_factory.mktemp('sanitizers')))
+
+
+@pytest.mark.parametrize('config', CONFIGS)
+def test_fuzz(tmp_path, headers_dir, base_defines, sanitizers, config):
+    defines = {**base_defines, **CONFIGS[config]}
+    exe = str(tmp_path / 'fuzz')
+    compile_c(
+        os.path.join(TESTS_DIR, 'fuzz.c'),
+        exe,
+        [headers_dir, os.path.dirname(TESTS_DIR)],
+        extra_flags=['-pthread', *sanitizers, *(f'-D{name}={value}' for name, value in defines.items())])
+    for seed in SEEDS:
+        proc = subprocess.run([exe, str(seed), str(STEPS)], capture_output=True, text=True, timeout=600)
+        assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,239 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import importlib.util
+import os
+import random
+import shlex
+import shutil
+import subprocess
+import sysconfig
+
+import pytest
+
+from conftest import CC, ROOT_DIR, gen_headers
+
+numpy = pytest.importorskip('numpy')
+
+
+def build_glassmap(root, defines):
+    # The module is built the way "python/build.py" does it, but against headers generated into a temporary copy
+    # of the layout it expects ("python/glass_def.h" includes "../glass.h").
+    gen_headers(str(root))
+    shutil.copy(os.path.join(ROOT_DIR, 'common.h'), root)
+    os.mkdir(root / 'python')
+    for name in ['glassmap.c', 'glass_def.h']:
+        shutil.copy(os.path.join(ROOT_DIR, 'python', name), root / 'python')
+
+    out = str(root / ('glassmap' + sysconfig.get_config_var('EXT_SUFFIX')))
+    subprocess.run([
+        *shlex.split(CC),
+        '-std=gnu11', '-O2', '-DNDEBUG',
+        '-shared', '-fPIC', '-fvisibility=hidden',
+        f'-I{sysconfig.get_paths()["include"]}',
+        f'-I{numpy.get_include()}',
+        f'-I{ROOT_DIR}',
+        *(f'-D{name}={value}' for name, value in defines.items()),
+        '-o', out,
+        str(root / 'python' / 'glassmap.c'),
+        os.path.join(ROOT_DIR, 'common.c'),
+    ], check=True)
+
+    spec = importlib.util.spec_from_file_location('glassmap', out)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def module_defines(base_defines, **extra):
+    defines = {name: base_defines[name] for name in ['GLASS_N', 'GLASS_WITH_COMPAT_SHIM'] if name in base_defines}
+    return {**defines, **extra}
+
+
+@pytest.fixture(scope='module')
+def glassmap(tmp_path_factory, base_defines):
+    return build_glassmap(tmp_path_factory.mktemp('glassmap'), module_defines(base_defines))
+
+
+@pytest.fixture(scope='module')
+def glassmap_counts(tmp_path_factory, base_defines):
+    return build_glassmap(
+        tmp_path_factory.mktemp('glassmap_counts'), module_defines(base_defines, GLASS_WITH_COUNTS=1))
+
+
+OUT_OF_RANGE_KEYS = [
+    pytest.param(lambda gm: -1, id='-1'),
+    pytest.param(lambda gm: -2**70, id='-2**70'),
+    pytest.param(lambda gm: gm.MAX_KEY + 1, id='MAX_KEY+1'),
+    pytest.param(lambda gm: 2**64, id='2**64'),
+    pytest.param(lambda gm: 2**100, id='2**100'),
+]
+
+
+@pytest.mark.parametrize('make_key', OUT_OF_RANGE_KEYS)
+def test_out_of_range_keys_are_absent(glassmap, make_key):
+    key = make_key(glassmap)
+    m = glassmap.GlassMap()
+    m[0] = 1
+    m[glassmap.MAX_KEY] = 2
+
+    assert key not in m
+    with pytest.raises(KeyError):
+        m[key]
+    with pytest.raises(KeyError):
+        del m[key]
+    assert m.get(key, 42) == 42
+    assert m.erase(key) is False
+    with pytest.raises(OverflowError):
+        m[key] = 3
+    assert len(m) == 2
+
+
+def test_non_integer_keys(glassmap):
+    m = glassmap.GlassMap()
+    with pytest.raises(TypeError):
+        'a' in m
+    with pytest.raises(TypeError):
+        m[1.5]
+
+
+def test_in_range_keys(glassmap):
+    m = glassmap.GlassMap()
+    m[glassmap.MAX_KEY] = 7
+    assert glassmap.MAX_KEY in m
+    assert m[glassmap.MAX_KEY] == 7
+    assert 0 not in m
+    with pytest.raises(KeyError):
+        m[0]
+
+
+def test_erase_of_absent_key_keeps_iterators(glassmap):
+    m = glassmap.GlassMap()
+    m[1] = 10
+    m[2] = 20
+    it = iter(m)
+    assert next(it) == 1
+    assert m.erase(3) is False
+    assert m.erase(-1) is False
+    assert next(it) == 2
+    assert m.erase(1) is True
+    with pytest.raises(RuntimeError):
+        next(it)
+
+
+class Model:
+    """What a map should contain: a dict, with the keys sorted on demand."""
+
+    def __init__(self):
+        self.d = {}
+
+    def keys(self):
+        return sorted(self.d)
+
+    def items(self):
+        return [(k, self.d[k]) for k in self.keys()]
+
+
+def check_same(m, model):
+    assert len(m) == len(model.d)
+    assert list(m) == model.keys()
+    assert list(reversed(m)) == model.keys()[::-1]
+    assert list(m.items()) == model.items()
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('module_name', ['glassmap', 'glassmap_counts'])
+def test_differential(request, module_name, seed):
+    gm = request.getfixturevalue(module_name)
+    rng = random.Random(seed)
+    value_max = numpy.iinfo(gm.VALUE_DTYPE).max
+
+    # Mostly small keys, so that they collide, plus a few near the largest one.
+    def gen_key():
+        if rng.random() < 0.1:
+            return gm.MAX_KEY - rng.randrange(64)
+        return rng.randrange(2000)
+
+    def gen_keys(n):
+        return numpy.array([gen_key() for _ in range(n)], dtype=numpy.uint64)
+
+    def gen_values(n):
+        return numpy.array([rng.randint(0, value_max) for _ in range(n)], dtype=gm.VALUE_DTYPE)
+
+    m = gm.GlassMap()
+    model = Model()
+    for step in range(1500):
+        op = rng.randrange(12)
+        k = gen_key()
+        if op == 0:
+            v = rng.randint(0, value_max)
+            assert m.insert(k, v) == (k in model.d)
+            model.d[k] = v
+        elif op == 1:
+            v = rng.randint(0, value_max)
+            m[k] = v
+            model.d[k] = v
+        elif op == 2:
+            assert m.erase(k) == (model.d.pop(k, None) is not None)
+        elif op == 3:
+            assert (k in m) == (k in model.d)
+            assert m.get(k) == model.d.get(k)
+        elif op == 4:
+            keys = gen_keys(rng.randrange(40))
+            values = gen_values(len(keys))
+            existed = []
+            for kk, vv in zip(keys.tolist(), values.tolist()):
+                existed.append(kk in model.d)
+                model.d[kk] = vv
+            assert m.insert_many(keys, values).tolist() == existed
+        elif op == 5:
+            keys = gen_keys(rng.randrange(40))
+            erased = [model.d.pop(kk, None) is not None for kk in keys.tolist()]
+            assert m.erase_many(keys).tolist() == erased
+        elif op == 6:
+            keys = gen_keys(rng.randrange(40))
+            found, values = m.find_many(keys, 7)
+            assert found.tolist() == [kk in model.d for kk in keys.tolist()]
+            assert values.tolist() == [model.d.get(kk, 7) for kk in keys.tolist()]
+        elif op == 7:
+            lo, hi = sorted([gen_key(), gen_key()])
+            max_ = rng.choice([None, 0, 1, 10])
+            expected = [(kk, vv) for kk, vv in model.items() if lo <= kk <= hi][:max_]
+            keys, values = m.range(lo, hi, max_)
+            assert list(zip(keys.tolist(), values.tolist())) == expected
+        elif op == 8:
+            n = rng.randrange(20)
+            from_last = rng.random() < 0.5
+            items = model.items()
+            expected = (items[::-1] if from_last else items)[:n]
+            keys, values = m.top(n, from_last=from_last)
+            assert list(zip(keys.tolist(), values.tolist())) == expected
+        elif op == 9:
+            lo = gen_key()
+            hi = lo + rng.randrange(100)
+            doomed = [kk for kk in model.d if lo <= kk <= hi]
+            for kk in doomed:
+                del model.d[kk]
+            assert m.erase_range(lo, hi) == len(doomed)
+        elif op == 10:
+            keys = model.keys()
+            nxt = [kk for kk in keys if kk > k]
+            prv = [kk for kk in keys if kk < k]
+            assert m.find_next(k) == ((nxt[0], model.d[nxt[0]]) if nxt else None)
+            assert m.find_prev(k) == ((prv[-1], model.d[prv[-1]]) if prv else None)
+            assert m.first() == (model.items()[0] if keys else None)
+            assert m.last() == (model.items()[-1] if keys else None)
+        elif module_name == 'glassmap_counts':
+            keys = model.keys()
+            assert m.rank(k) == sum(kk < k for kk in keys)
+            if keys:
+                i = rng.randrange(-len(keys), len(keys))
+                assert m.select(i) == (keys[i], model.d[keys[i]])
+        if step % 100 == 0:
+            check_same(m, model)
+            if rng.random() < 0.3:
+                items = model.items()
+                m = gm.GlassMap.from_sorted(
+                    numpy.array([kk for kk, _ in items], dtype=numpy.uint64),
+                    numpy.array([vv for _, vv in items], dtype=gm.VALUE_DTYPE))
+    check_same(m, model)
@@ -0,0 +1,83 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import subprocess
+
+import pytest
+
+
+# Builds the path of 'A' (kept as a hint), then caches the path of a far key 'B', then inserts next to 'A' through
+# the hint, which is deeper than the part of the path the cache has. Then looks up keys all along the path of 'A'.
+DEEP_HINT_PROG = r'''
+int main(void)
+{
+    enum { A = 0x12345, B = (uint64_t) 1 << 45 };
+    glass_Glass g;
+    glass_create(&g, 0);
+    glass_insert(&g, A, 1);
+    glass_Iter hint = glass_find(&g, A);
+    glass_insert(&g, B, 2);
+    glass_insert_with_hint(&g, A + 1, 3, hint);
+
+    int bad = 0;
+    for (int shift = 0; shift < 40; ++shift) {
+        uint64_t k = A ^ ((uint64_t) 1 << shift);
+        glass_insert(&g, k, 100 + shift);
+        glass_Iter it = glass_find(&g, k);
+        bad += glass_iter_is_end(it) || glass_iter_get_value(&g, it) != (uint32_t) (100 + shift);
+    }
+    size_t n = 0;
+    for (glass_Iter it = glass_begin(&g); !glass_iter_is_end(it); it = glass_iter_next(&g, it)) {
+        ++n;
+    }
+    printf("%d %zu %zu\n", bad, n, (size_t) g.size);
+    glass_destroy(&g);
+    return 0;
+}
+'''
+
+
+@pytest.mark.parametrize('cache', [0, 1])
+def test_insert_through_deep_hint(build_glass, base_defines, cache):
+    exe = build_glass(DEEP_HINT_PROG, {**base_defines, 'GLASS_WITH_CACHE': cache, 'GLASS_WITH_HT': 0})
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    assert out.split() == ['0', '43', '43']
+
+
+# Uses a hint that points to the very key being looked up.
+SAME_KEY_HINT_PROG = r'''
+int main(void)
+{
+    glass_Glass g;
+    glass_create(&g, 0);
+    for (uint64_t k = 0; k < 100; ++k) {
+        glass_insert(&g, k * 3, (uint32_t) k);
+    }
+    int bad = 0;
+    for (uint64_t k = 0; k < 100; ++k) {
+        glass_Iter hint = glass_find(&g, k * 3);
+        glass_Iter it = glass_find_with_hint(&g, k * 3, hint);
+        bad += glass_iter_is_end(it) || glass_iter_get_value(&g, it) != (uint32_t) k;
+        bad += !glass_insert_with_hint(&g, k * 3, (uint32_t) k + 1000, hint);
+        bad += !glass_replace_with_hint(&g, k * 3, (uint32_t) k + 2000, glass_find(&g, k * 3));
+    }
+    for (uint64_t k = 0; k < 100; k += 2) {
+        bad += !glass_erase_with_hint(&g, k * 3, glass_find(&g, k * 3));
+    }
+    size_t n = 0;
+    for (glass_Iter it = glass_begin(&g); !glass_iter_is_end(it); it = glass_iter_next(&g, it)) {
+        bad += glass_iter_get_value(&g, it) != glass_iter_get_key(&g, it) / 3 + 2000;
+        ++n;
+    }
+    printf("%d %zu %zu\n", bad, n, (size_t) g.size);
+    glass_destroy(&g);
+    return 0;
+}
+'''
+
+
+@pytest.mark.parametrize('cache', [0, 1])
+def test_hint_equal_to_key(build_glass, base_defines, cache):
+    exe = build_glass(SAME_KEY_HINT_PROG, {**base_defines, 'GLASS_WITH_CACHE': cache, 'GLASS_WITH_HT': 0})
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    assert out.split() == ['0', '50', '50']
@@ -0,0 +1,34 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import subprocess
+
+
+# Fills 64 leaves with their first keys, which leaves the open table exactly half full, then adds more keys to the
+# same leaves, which must not add slots, and so must not grow the table either.
+LEAF_KEYS_PROG = r'''
+int main(void)
+{
+    glass_Glass g;
+    glass_create(&g, 0);
+    for (uint64_t leaf = 0; leaf < 64; ++leaf) {
+        glass_insert(&g, leaf * 64, (uint32_t) leaf);
+    }
+    size_t n_before = g.ht.mask + (size_t) 1;
+    for (uint64_t leaf = 0; leaf < 64; ++leaf) {
+        for (uint64_t j = 1; j < 4; ++j) {
+            glass_insert(&g, leaf * 64 + j, (uint32_t) j);
+        }
+    }
+    printf("%zu %zu %zu\n", (size_t) g.ht.nused, n_before, g.ht.mask + (size_t) 1);
+    glass_destroy(&g);
+    return 0;
+}
+'''
+
+
+def test_keys_of_existing_leaves_do_not_grow_table(build_glass, base_defines):
+    defines = {**base_defines, 'GLASS_WITH_HT': 1, 'GLASS_WITH_HT_OPEN': 1, 'GLASS_WITH_HT_HEALTH_CHECKS': 1}
+    exe = build_glass(LEAF_KEYS_PROG, defines)
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    assert out.split() == ['64', '128', '128']
@@ -0,0 +1,34 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import os
+import random
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR
+
+pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bench'))
+import locality  # noqa: E402
+
+
+@pytest.mark.parametrize('is_bid', [False, True])
+def test_book_state(is_bid):
+    rng = random.Random(1)
+    state = locality.BookState(is_bid)
+    live = set()
+    # A long trace over few prices: the heap must not grow with the trace.
+    for _ in range(20000):
+        key = rng.randrange(1000, 1040)
+        if rng.random() < 0.5:
+            state.insert(key)
+            live.add(key)
+        else:
+            state.erase(key)
+            live.discard(key)
+        expected = (max(live) if is_bid else min(live)) if live else None
+        assert state.best() == expected
+        assert len(state.heap) <= 2 * 40 + 1
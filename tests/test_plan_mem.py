@@ -0,0 +1,50 @@
+# (c) 2025 shdown
+# This code is licensed under MIT license (see LICENSE.MIT for details)
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR
+
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bench'))
+import plan_mem  # noqa: E402
+
+
+SIZEOF_PROG = r'''
+int main(void)
+{
+    printf("%zu %zu\n", sizeof(glass_Glass), sizeof(glass__Node));
+    return 0;
+}
+'''
+
+# (configuration macro, value, plan_mem.Config argument, value)
+OPTIONS = [
+    ('GLASS_CACHE_WAYS', 4, 'cache_ways', 4),
+    ('GLASS_WITH_HT_OPEN', 1, 'with_ht_open', True),
+    ('GLASS_WITH_ARENA', 1, 'with_arena', True),
+    ('GLASS_WITH_SNAPSHOT', 1, 'with_snapshot', True),
+    ('GLASS_WITH_COUNTERS', 1, 'with_counters', True),
+    ('GLASS_WITH_AUTO_SHRINK', 1, 'with_auto_shrink', True),
+    ('GLASS_WITH_SEQLOCK', 1, 'with_seqlock', True),
+    ('GLASS_WITH_COUNTS', 1, 'with_counts', True),
+]
+
+
+@pytest.mark.parametrize('size', ['uint16_t', 'uint32_t'])
+@pytest.mark.parametrize('option', [None, *OPTIONS], ids=lambda o: o[0] if o else 'default')
+def test_sizes_match_compiler(build_glass, base_defines, size, option):
+    defines = {**base_defines, 'GLASS_SIZE': size}
+    kwargs = {}
+    if option is not None:
+        macro, macro_value, arg, arg_value = option
+        defines[macro] = macro_value
+        kwargs[arg] = arg_value
+    cfg = plan_mem.Config(n=defines['GLASS_N'], size=size, k=defines['GLASS_K'], **kwargs)
+
+    exe = build_glass(SIZEOF_PROG, defines)
+    out = subprocess.run([exe], check=True, capture_output=True, text=True).stdout
+    assert [int(x) for x in out.split()] == [plan_mem.sizeof_glass(cfg), plan_mem.sizeof_node(cfg)]